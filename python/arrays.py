@@ -0,0 +1,292 @@
+import math
+import operator as python_operator
+
+from values import number_add, number_multiply, number_subtract
+
+# NumPy is optional. Without it arrays are plain lists of numbers and every operation loops in Python, which
+# gives the same results, only slower. It is listed in requirements-optional.txt.
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Array values when NumPy isn't installed
+class NumberArray(list):
+    pass
+
+
+array_types = (numpy.ndarray, NumberArray) if numpy is not None else (NumberArray,)
+
+# Binary operators that work element-wise on arrays. Comparisons give arrays of 1.0 and 0.0, which are floats
+# whatever the elements compared.
+elementwise_operators = {
+    number_add, number_subtract, number_multiply, python_operator.truediv,
+    python_operator.eq, python_operator.gt, python_operator.lt, python_operator.ge, python_operator.le,
+}
+
+# The elements of an array are either all ints or all floats. Arrays of ints stay ints through + - *, powers,
+# UwUCima and UnUSuelo, like numbers do, as long as every element is below INTEGER_ELEMENT_LIMIT, which keeps
+# them within NumPy's int64. Past it, and after anything else, the elements are floats.
+INTEGER_ELEMENT_LIMIT = 2 ** 63
+integer_operators = {number_add, number_subtract, number_multiply}
+
+
+def is_array(value) -> bool:
+    return isinstance(value, array_types)
+
+
+def create_array(numbers: list) -> NumberArray:
+    if all(is_integer_element(number) for number in numbers):
+        return integer_array(numbers)
+
+    return float_array(numbers)
+
+
+def is_integer_element(number) -> bool:
+    return type(number) is int and -INTEGER_ELEMENT_LIMIT < number < INTEGER_ELEMENT_LIMIT
+
+
+def integer_array(numbers):
+    if numpy is not None:
+        return numpy.array(numbers, dtype = numpy.int64)
+
+    return NumberArray(numbers)
+
+
+def float_array(numbers):
+    if numpy is not None:
+        return numpy.array(numbers, dtype = numpy.float64)
+
+    return NumberArray(float(number) for number in numbers)
+
+
+# Whether a number is an int that can be an element, or an array is one of ints
+def is_integer_operand(value) -> bool:
+    if numpy is not None and isinstance(value, numpy.ndarray):
+        return value.dtype == numpy.int64
+
+    if isinstance(value, NumberArray):
+        return all(type(number) is int for number in value)
+
+    return is_integer_element(value)
+
+
+# The largest absolute value of an operand, 0 for an empty array
+def operand_bound(value) -> int:
+    if not is_array(value):
+        return abs(value)
+    if len(value) == 0:
+        return 0
+
+    return int(numpy.max(numpy.abs(value))) if numpy is not None else max(abs(number) for number in value)
+
+
+# The elements of an array as a list of Python numbers
+def array_list(array) -> list:
+    return array.tolist() if numpy is not None and isinstance(array, numpy.ndarray) else list(array)
+
+
+# The numbers from start up to, but not including, end in steps of one
+def number_range(start: float, end: float) -> NumberArray:
+    count = max(0, math.ceil(end - start))
+    if is_integer_element(start) and is_integer_element(start + count):
+        if numpy is not None:
+            return numpy.arange(start, start + count, dtype = numpy.int64)
+
+        return NumberArray(range(start, start + count))
+
+    if numpy is not None:
+        return numpy.arange(start, end, dtype = numpy.float64)
+
+    return NumberArray(float(start + index) for index in range(count))
+
+
+def array_length(array) -> int:
+    return len(array)
+
+
+# Applies operator to every pair of elements, or to every element and a number
+def elementwise(operator, left, right):
+    check_lengths(left, right)
+    if operator in integer_operators and is_integer_operand(left) and is_integer_operand(right):
+        if numpy is not None and integer_result_fits(operator, left, right):
+            return operator(left, right)
+        if (result := exact_integer_array(operator, left, right)) is not None:
+            return result
+
+    if numpy is not None:
+        with numpy.errstate(all = "ignore"):
+            result = operator(numpy.asarray(left, dtype = numpy.float64), right)
+
+        return result.astype(numpy.float64, copy = False)
+
+    if operator is python_operator.truediv:
+        operator = divide
+
+    return NumberArray(float(operator(left_number, right_number)) for left_number, right_number in float_pairs(left, right))
+
+
+# Whether int64 arithmetic can't overflow, judging by the largest operands. When it might, the exact results
+# decide instead, see exact_integer_array.
+def integer_result_fits(operator, left, right) -> bool:
+    if operator is number_multiply:
+        return operand_bound(left) * operand_bound(right) < INTEGER_ELEMENT_LIMIT
+
+    return operand_bound(left) + operand_bound(right) < INTEGER_ELEMENT_LIMIT
+
+
+# The results of operator on the elements as Python ints, None if any of them can't be an element
+def exact_integer_array(operator, left, right):
+    left = NumberArray(array_list(left)) if is_array(left) else left
+    right = NumberArray(array_list(right)) if is_array(right) else right
+    results = [operator(left_number, right_number) for left_number, right_number in pairs(left, right)]
+    if not all(is_integer_element(result) for result in results):
+        return None
+
+    return integer_array(results)
+
+
+def pairs(left, right):
+    if is_array(left) and is_array(right):
+        return zip(left, right)
+    elif is_array(left):
+        return ((left_number, right) for left_number in left)
+
+    return ((left, right_number) for right_number in right)
+
+
+# The pairs with ints made floats first, as NumPy does
+def float_pairs(left, right):
+    return ((float(left_number), float(right_number)) for left_number, right_number in pairs(left, right))
+
+
+# Powers of ints with exponents of 0 or more stay ints, like number_power
+def array_power(base, exponent):
+    check_lengths(base, exponent)
+    if is_integer_operand(base) and is_integer_operand(exponent) and not has_negative(exponent):
+        # int64 can't overflow while the bits of the base times the exponent stay below those of the limit
+        if numpy is not None and operand_bound(base).bit_length() * operand_bound(exponent) < INTEGER_ELEMENT_LIMIT.bit_length() - 1:
+            return numpy.power(base, exponent)
+        if (result := exact_integer_array(integer_power, base, exponent)) is not None:
+            return result
+
+    if numpy is not None:
+        with numpy.errstate(all = "ignore"):
+            return numpy.power(numpy.asarray(base, dtype = numpy.float64), exponent)
+
+    return NumberArray(power(base_number, exponent_number) for base_number, exponent_number in float_pairs(base, exponent))
+
+
+def has_negative(value) -> bool:
+    if not is_array(value):
+        return value < 0
+
+    return len(value) > 0 and min(array_list(value)) < 0
+
+
+# Checked before NumPy sees the arrays, so mismatched lengths fail the same way with and without it rather than
+# with NumPy's broadcasting error
+def check_lengths(left, right):
+    if is_array(left) and is_array(right) and len(left) != len(right):
+        raise ValueError(f'Array lengths do not match. Got {len(left)} and {len(right)}.')
+
+
+def array_absolute(array):
+    if numpy is not None:
+        return numpy.abs(array)
+
+    return NumberArray(abs(number) for number in array)
+
+
+# Like math.ceil and math.floor the results are ints, unless one of them can't be an element
+def array_ceiling(array):
+    if is_integer_operand(array):
+        return array
+    if numpy is not None:
+        return rounded_array(numpy.ceil(array))
+
+    return rounded_array(NumberArray(float(math.ceil(number)) if math.isfinite(number) else number for number in array))
+
+
+def array_floor(array):
+    if is_integer_operand(array):
+        return array
+    if numpy is not None:
+        return rounded_array(numpy.floor(array))
+
+    return rounded_array(NumberArray(float(math.floor(number)) if math.isfinite(number) else number for number in array))
+
+
+# Whole floats made ints when every one of them can be an element
+def rounded_array(array):
+    if numpy is not None:
+        if numpy.all(numpy.abs(array) < INTEGER_ELEMENT_LIMIT):
+            return array.astype(numpy.int64)
+
+        return array
+
+    if all(abs(number) < INTEGER_ELEMENT_LIMIT for number in array):
+        return NumberArray(int(number) for number in array)
+
+    return array
+
+
+# Sums of ints are exact, NumPy only adds them as int64 when that can't overflow
+def array_sum(array) -> float:
+    if numpy is not None:
+        if array.dtype != numpy.int64:
+            return float(numpy.sum(array))
+        if operand_bound(array) * len(array) < INTEGER_ELEMENT_LIMIT:
+            return int(numpy.sum(array))
+
+        return sum(array.tolist())
+
+    return sum(array)
+
+
+# Both return None for an empty array
+def array_maximum(array) -> float | None:
+    if len(array) == 0:
+        return None
+
+    return numpy.max(array).item() if numpy is not None else max(array)
+
+
+def array_minimum(array) -> float | None:
+    if len(array) == 0:
+        return None
+
+    return numpy.min(array).item() if numpy is not None else min(array)
+
+
+# Arrays print like their literals, e.g. "[1 2 3]" or "[1.0 2.5 3.0]"
+def array_string(array) -> str:
+    return "[" + " ".join(str(number) for number in array_list(array)) + "]"
+
+
+# Division and powers follow IEEE 754 like NumPy does, instead of raising
+def divide(dividend: float, divisor: float) -> float:
+    if divisor != 0:
+        return dividend / divisor
+    if dividend == 0 or dividend != dividend:
+        return math.nan
+
+    return math.copysign(math.inf, dividend) * math.copysign(1.0, divisor)
+
+
+# None without computing the power when it has too many bits to be an element
+def integer_power(base: int, exponent: int) -> int | None:
+    if (abs(base).bit_length() - 1) * exponent >= INTEGER_ELEMENT_LIMIT.bit_length():
+        return None
+
+    return base ** exponent
+
+
+def power(base: float, exponent: float) -> float:
+    try:
+        return math.pow(base, exponent)
+    except ValueError:
+        return math.nan
+    except OverflowError:
+        return math.inf
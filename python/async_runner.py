@@ -0,0 +1,112 @@
+import asyncio
+from io import StringIO
+
+from iterative_evaluator import IterativeEvaluator
+from program_cache import ProgramCache
+from runner import Runner
+
+DEFAULT_YIELD_INTERVAL = 1000
+
+
+# Runs a program inside an asyncio event loop without blocking it. Evaluation is done by an IterativeEvaluator,
+# which suspends every yield_interval evaluated nodes; the runner then passes the output written so far on to
+# the output stream, checks the budgets and gives the other tasks of the loop their turn before going on. Many
+# programs can interleave on one loop this way, and cancelling the task running one stops it at its next
+# suspension.
+#   output_stream: anything with a write method and a drain coroutine, like asyncio.StreamWriter. Output is
+#                  encoded with encoding first if one is given, StreamWriter takes bytes.
+#   time_limit: seconds of wall-clock time the program may take, waiting for other tasks included.
+#   instruction_limit: number of nodes the program may evaluate, see evaluated_node_count.
+# A program that goes over a budget is stopped with a fatal error, like one that fails. Both budgets are
+# checked at suspensions, so the instruction limit is exact but the time limit may be overrun by up to
+# yield_interval nodes. Tokenizing, parsing and resolving happen before the first node is evaluated and are
+# not interrupted.
+class AsyncRunner:
+    def __init__(self, code: str, output_stream, encoding: str | None = None,
+                 yield_interval: int = DEFAULT_YIELD_INTERVAL, time_limit: float | None = None,
+                 instruction_limit: int | None = None, cache: ProgramCache | None = None,
+                 diagnostic_destination = None, optimization_level: int = 0, memoization_size: int = 0):
+        if yield_interval < 1:
+            raise ValueError("The yield interval must be at least 1.")
+
+        self.output_stream = output_stream
+        self.encoding = encoding
+        self.yield_interval = yield_interval
+        self.time_limit = time_limit
+        self.instruction_limit = instruction_limit
+        self.output_buffer = StringIO()
+        self.runner = Runner(code, self.output_buffer, evaluator_class = IterativeEvaluator, cache = cache,
+                             diagnostic_destination = diagnostic_destination, optimization_level = optimization_level,
+                             memoization_size = memoization_size)
+        # Nodes evaluated by the last run_code, counting the node a budget stopped the program at
+        self.evaluated_node_count = 0
+        self.error: str | None = None
+
+    # Returns 1 if the code can't be parsed or stops on a fatal error, budgets included, like Runner.run_code
+    async def run_code(self):
+        self.error = None
+        resolved_code = self.runner.resolve_code()
+        if resolved_code is None:
+            await self.write_output()
+            return 1
+
+        expressions, resolver = resolved_code
+        evaluator = IterativeEvaluator(expressions, self.output_buffer, self.runner.memoization_size)
+        evaluator.allocate_slots(resolver.slot_count)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.time_limit if self.time_limit is not None else None
+        interval = self.next_interval(0)
+        evaluated_node_count = 0
+        steps = evaluator.process_steps(interval)
+        try:
+            for _ in steps:
+                evaluated_node_count += interval
+                if self.instruction_limit is not None and evaluated_node_count > self.instruction_limit:
+                    self.stop(evaluator, f'Instruction limit of {self.instruction_limit} nodes exceeded.')
+                    break
+                if deadline is not None and loop.time() > deadline:
+                    self.stop(evaluator, f'Time limit of {self.time_limit}s exceeded.')
+                    break
+
+                interval = evaluator.yield_interval = self.next_interval(evaluated_node_count)
+                await self.write_output()
+                await asyncio.sleep(0)
+            else:
+                evaluated_node_count += interval - evaluator.countdown
+        finally:
+            # Runs the cleanup of the evaluator, which writes the unfinished line, even when the task is cancelled
+            steps.close()
+            self.evaluated_node_count = evaluated_node_count
+            if self.error is None and evaluator.error is not None:
+                self.error = evaluator.error.message
+
+        await self.write_output()
+        if self.error is not None:
+            return 1
+
+    # Nodes to evaluate before the next suspension, no more than the instruction limit leaves plus the one
+    # that goes over it
+    def next_interval(self, evaluated_node_count: int) -> int:
+        if self.instruction_limit is None:
+            return self.yield_interval
+
+        return min(self.yield_interval, self.instruction_limit - evaluated_node_count + 1)
+
+    def stop(self, evaluator: IterativeEvaluator, message: str):
+        self.error = message
+        # Ends the line of a print statement the program was stopped in the middle of
+        if evaluator.line:
+            evaluator.write_line("\n")
+
+        print(f'FATAL ERROR: {message}', file = self.output_buffer)
+
+    async def write_output(self):
+        text = self.output_buffer.getvalue()
+        if not text:
+            return
+
+        self.output_buffer.seek(0)
+        self.output_buffer.truncate()
+        self.output_stream.write(text.encode(self.encoding) if self.encoding is not None else text)
+        await self.output_stream.drain()
@@ -0,0 +1,89 @@
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from io import StringIO
+
+from evaluator import Evaluator
+from runner import Runner
+
+SCRIPT_FILE_EXTENSION = ".uwupp"
+
+
+class BatchResult:
+    def __init__(self, path: str, output: str, exit_code: int, elapsed_seconds: float,
+                 warnings: list[str], error: str | None = None):
+        self.path = path
+        self.output = output
+        self.exit_code = exit_code
+        self.elapsed_seconds = elapsed_seconds
+        self.warnings = warnings
+        # Set when the interpreter itself crashed on the script; language level errors are part of the output, and
+        # a FATAL ERROR the script stopped on also makes its exit code 1
+        self.error = error
+
+
+# Runs every script in its own Runner and Evaluator with captured output. Scripts are spread across a pool
+# of worker processes, and results always come back in the order the scripts were given in.
+class BatchRunner:
+    def __init__(self, paths: list[str], worker_count: int | None = None, evaluator_class: type[Evaluator] = Evaluator,
+                 optimization_level: int = 0):
+        self.paths = paths
+        self.worker_count = worker_count if worker_count is not None else (os.cpu_count() or 1)
+        self.evaluator_class = evaluator_class
+        self.optimization_level = optimization_level
+
+    def process(self) -> list[BatchResult]:
+        arguments = [(path, self.evaluator_class, self.optimization_level) for path in self.paths]
+        if self.worker_count <= 1 or len(arguments) <= 1:
+            return [run_script(*script_arguments) for script_arguments in arguments]
+
+        # Small scripts finish in well under a millisecond, so they are sent to the workers in chunks to keep
+        # the cost of inter-process communication from dominating
+        chunk_size = max(1, len(arguments) // (self.worker_count * 4))
+        with ProcessPoolExecutor(max_workers = self.worker_count) as executor:
+            return list(executor.map(run_script_arguments, arguments, chunksize = chunk_size))
+
+
+def run_script_arguments(arguments: tuple) -> BatchResult:
+    return run_script(*arguments)
+
+
+def run_script(path: str, evaluator_class: type[Evaluator] = Evaluator, optimization_level: int = 0) -> BatchResult:
+    output_destination = StringIO()
+    start_time = time.perf_counter()
+
+    try:
+        with open(path) as file:
+            code = file.read()
+
+        runner = Runner(code, output_destination, evaluator_class = evaluator_class,
+                        optimization_level = optimization_level)
+        exit_code = runner.run_code() or 0
+        warnings = [diagnostic.message for diagnostic in runner.diagnostics]
+        error = None
+    except Exception as exception:
+        exit_code = 1
+        warnings = []
+        error = "".join(traceback.format_exception_only(exception)).strip()
+
+    return BatchResult(path, output_destination.getvalue(), exit_code, time.perf_counter() - start_time, warnings, error)
+
+
+# A directory is searched recursively for script files. Any other path is read as a manifest listing one
+# script per line, relative to the manifest; blank lines and lines starting with "#" are skipped.
+def script_paths(path: str) -> list[str]:
+    if os.path.isdir(path):
+        paths = []
+        for directory, directory_names, filenames in os.walk(path):
+            directory_names.sort()
+            paths += [os.path.join(directory, filename) for filename in sorted(filenames)
+                      if filename.endswith(SCRIPT_FILE_EXTENSION)]
+
+        return paths
+
+    manifest_directory = os.path.dirname(path)
+    with open(path) as manifest:
+        lines = [line.strip() for line in manifest]
+
+    return [os.path.join(manifest_directory, line) for line in lines if line and not line.startswith("#")]
@@ -0,0 +1,54 @@
+# Usage (from the python directory): python -m benchmarks.array_aggregation [sample count] [runs]
+# Aggregates the same samples once as scalar arguments of the built-ins and once as a single array value.
+import sys
+import time
+from io import StringIO
+
+from arrays import numpy
+from benchmarks.evaluator_backends import parse
+from evaluator import Evaluator
+
+AGGREGATES = ["TwTSuma", "EwEMedia", "UwUMaximo", "UnUMinimo"]
+
+
+def scalar_program(sample_count: int) -> str:
+    samples = " ".join(str(index % 1000) for index in range(sample_count))
+    return "".join(f'impwimir {aggregate} {samples}\n' for aggregate in AGGREGATES)
+
+
+def array_program(sample_count: int) -> str:
+    lines = [f'samples = (UwURango 0 {sample_count}) - (UnUSuelo ((UwURango 0 {sample_count}) / 1000)) * 1000']
+    lines += [f'impwimir {aggregate} samples' for aggregate in AGGREGATES]
+    return "\n".join(lines) + "\n"
+
+
+def time_program(code: str, runs: int) -> tuple[float, float, str]:
+    start = time.perf_counter()
+    expressions = parse(code)
+    parse_time = time.perf_counter() - start
+
+    output_destination = StringIO()
+    start = time.perf_counter()
+    for _ in range(runs):
+        Evaluator(expressions, output_destination).process()
+
+    return parse_time, (time.perf_counter() - start) / runs, output_destination.getvalue()
+
+
+def main():
+    sample_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    scalar_parse_time, scalar_time, scalar_output = time_program(scalar_program(sample_count), runs)
+    array_parse_time, array_time, array_output = time_program(array_program(sample_count), runs)
+    if scalar_output != array_output:
+        print("warning: scalar and array aggregates differ", file = sys.stderr)
+
+    print(f'{sample_count} samples, {len(AGGREGATES)} aggregates, arrays backed by {"NumPy" if numpy is not None else "Python lists"}')
+    print(f'{"":<10}{"parse":>12}{"evaluate":>12}')
+    print(f'{"scalars":<10}{scalar_parse_time:>11.3f}s{scalar_time:>11.3f}s')
+    print(f'{"array":<10}{array_parse_time:>11.3f}s{array_time:>11.3f}s  {scalar_time / array_time:.1f}x')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# Usage (from the python directory): python -m benchmarks.async_runner [long program count] [short program count]
+# Runs long programs and short ones together on one event loop and reports how long the short ones take from
+# start to finish, for several yield intervals, along with what suspending costs the long ones.
+import asyncio
+import sys
+import time
+from io import StringIO
+
+from async_runner import AsyncRunner
+from iterative_evaluator import IterativeEvaluator
+from runner import Runner
+
+LONG_PROGRAM = """i = 0
+total = 0
+mientras i <= 20000 {
+    total = total + i * 2
+    i = i + 1
+}
+impwimir total
+"""
+SHORT_PROGRAM = """x = TwTSuma 1 2 3
+impwimir x * 2
+"""
+YIELD_INTERVALS = [100, 1_000, 10_000, 1_000_000_000]
+
+
+class NullStream:
+    def write(self, text: str):
+        pass
+
+    async def drain(self):
+        pass
+
+
+async def serve(long_program_count: int, short_program_count: int, yield_interval: int) -> tuple[float, list[float]]:
+    latencies = []
+    start = time.perf_counter()
+
+    # Latency counts from when the program arrives, however long the loop takes to get to it
+    async def run_short_program(delay: float):
+        await asyncio.sleep(delay)
+        await AsyncRunner(SHORT_PROGRAM, NullStream(), yield_interval = yield_interval).run_code()
+        latencies.append(time.perf_counter() - start - delay)
+
+    long_programs = [AsyncRunner(LONG_PROGRAM, NullStream(), yield_interval = yield_interval).run_code()
+                     for _ in range(long_program_count)]
+    # The short programs arrive spread over the first 100ms, while the long ones are running
+    short_programs = [run_short_program(index * 0.1 / short_program_count) for index in range(short_program_count)]
+    await asyncio.gather(*long_programs, *short_programs)
+    return time.perf_counter() - start, sorted(latencies)
+
+
+def main():
+    long_program_count = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    short_program_count = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    start = time.perf_counter()
+    for _ in range(long_program_count):
+        Runner(LONG_PROGRAM, StringIO(), evaluator_class = IterativeEvaluator).run_code()
+    blocking_time = time.perf_counter() - start
+
+    print(f'{long_program_count} long programs, {short_program_count} short ones; '
+          f'{blocking_time:.3f}s for the long ones run one after the other without suspending')
+    for yield_interval in YIELD_INTERVALS:
+        total_time, latencies = asyncio.run(serve(long_program_count, short_program_count, yield_interval))
+        median = latencies[len(latencies) // 2]
+        p99 = latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)]
+        print(f'yield every {yield_interval:>10} nodes: {total_time:.3f}s in total '
+              f'({total_time / blocking_time:.2f}x), short programs median {median * 1000:8.2f}ms, '
+              f'p99 {p99 * 1000:8.2f}ms')
+
+
+if __name__ == "__main__":
+    sys.exit(main())
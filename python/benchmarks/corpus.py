@@ -0,0 +1,113 @@
+# Usage (from the python directory): python -m benchmarks.corpus [statement count] [seed]
+# Writes a synthetic program to stdout. The same statement count and seed always give the same program.
+import random
+import sys
+
+# Read by every kind of statement and never assigned again, so values stay bounded however long the program is
+INPUT_VARIABLES = {"p": 3, "q": 7, "r": 11}
+BUILT_INS = ["TwTSuma", "UwUMaximo", "UnUMinimo", "EwEMedia"]
+WORDS = ["uwu", "owo", "nya", "chiquito", "gatito", "ronroneo", "bigotes", "patita", "michi", "siesta"]
+
+ARITHMETIC_DEPTH = 24
+CHAIN_LENGTH = 16
+BUILT_IN_ARGUMENT_COUNT = 32
+STRING_LENGTHS = (200, 4_000)
+COMMENT_WORD_COUNTS = (2, 12)
+
+
+# Builds programs out of the statement kinds that stress different parts of the interpreter:
+#   arithmetic: deeply nested operations, for the parser's precedence handling and the evaluator's recursion.
+#   chain: "si" / "sino" chains nested CHAIN_LENGTH deep, for block parsing and branching. Some of the lines
+#          opening and closing blocks end in a trailing comment.
+#   built-in: calls with many arguments to the aggregate built-ins.
+#   string: long string literals, for the tokenizer's literal scanning and for output.
+#   comment: runs of "//" comment lines mixed with empty and indented lines, for the tokenizer to skip over.
+# A comment takes the line end after it along, so trailing comments only follow braces: after any other
+# statement the next line would be read as part of it.
+class CorpusGenerator:
+    def __init__(self, seed: int = 0):
+        self.random = random.Random(seed)
+
+    def program(self, statement_count: int) -> str:
+        lines = [f'{name} = {value}' for name, value in INPUT_VARIABLES.items()]
+        lines += ["t = 0", "s = 0", "g = nya"]
+        kinds = [self.arithmetic, self.chain, self.built_in, self.string, self.comment]
+        for index in range(statement_count):
+            lines.append(kinds[index % len(kinds)]())
+
+        lines.append('impwimir "t = " t ", s = " s ", g = " g')
+        return "\n".join(lines) + "\n"
+
+    def arithmetic(self) -> str:
+        return f't = {self.arithmetic_expression(ARITHMETIC_DEPTH)}'
+
+    # Divisors are always leaves, so there is never a division by zero
+    def arithmetic_expression(self, depth: int) -> str:
+        if depth == 0:
+            return self.leaf()
+
+        operator = self.random.choice("+-*/")
+        if operator == "/":
+            return f'({self.arithmetic_expression(depth - 1)} / {self.leaf()})'
+
+        if self.random.random() < 0.5:
+            return f'({self.arithmetic_expression(depth - 1)} {operator} {self.leaf()})'
+
+        return f'({self.leaf()} {operator} {self.arithmetic_expression(depth - 1)})'
+
+    def leaf(self) -> str:
+        if self.random.random() < 0.5:
+            return self.random.choice(list(INPUT_VARIABLES))
+
+        return str(self.random.randint(1, 9))
+
+    def chain(self) -> str:
+        thresholds = sorted(self.random.sample(range(1, 1000), CHAIN_LENGTH), reverse = True)
+        lines = []
+        for depth, threshold in enumerate(thresholds):
+            indentation = "    " * depth
+            lines.append(f'{indentation}si (owoValorTotal t) >= {threshold} {{{self.trailing_comment()}')
+            lines.append(f'{indentation}    g = {depth}')
+            lines.append(f'{indentation}}} sino {{{self.trailing_comment()}')
+
+        lines.append("    " * CHAIN_LENGTH + "g = nya")
+        for depth in reversed(range(CHAIN_LENGTH)):
+            lines.append("    " * depth + "}" + self.trailing_comment())
+
+        return "\n".join(lines)
+
+    def built_in(self) -> str:
+        arguments = " ".join(self.leaf() for _ in range(BUILT_IN_ARGUMENT_COUNT))
+        return f's = {self.random.choice(BUILT_INS)} {arguments}'
+
+    def string(self) -> str:
+        length = self.random.randint(*STRING_LENGTHS)
+        words = []
+        while sum(len(word) + 1 for word in words) < length:
+            words.append(self.random.choice(WORDS))
+
+        return f'impwimir "{" ".join(words)}"'
+
+    def comment(self) -> str:
+        lines = []
+        for _ in range(self.random.randint(1, 4)):
+            indentation = "    " * self.random.randint(0, 3)
+            lines.append(indentation + self.comment_text() if self.random.random() < 0.75 else indentation)
+
+        return "\n".join(lines)
+
+    def trailing_comment(self) -> str:
+        return " " + self.comment_text() if self.random.random() < 0.25 else ""
+
+    def comment_text(self) -> str:
+        return "// " + " ".join(self.random.choice(WORDS) for _ in range(self.random.randint(*COMMENT_WORD_COUNTS)))
+
+
+def main():
+    statement_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    sys.stdout.write(CorpusGenerator(seed).program(statement_count))
+
+
+if __name__ == "__main__":
+    main()
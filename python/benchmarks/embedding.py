@@ -0,0 +1,98 @@
+# Usage (from the python directory): python -m benchmarks.embedding [request count] [threads]
+import sys
+import threading
+import time
+from io import StringIO
+
+from closure_compiler import ClosureEvaluator
+from embedding import Program
+from evaluator import Evaluator
+from runner import Runner
+from unboxed import UnboxedEvaluator
+from vm import BytecodeEvaluator
+
+# A small request handler: the kind of program an embedding application runs over and over with new inputs
+REQUEST_PROGRAM = """total = 0
+i = 0
+mientras cantidad - 1 >= i {
+    total = total + TwTPotencia (precio * i) 2
+    i = i + 1
+}
+si total >= limite {
+    impwimir "sobre el limite: " total
+} sino {
+    impwimir "total: " total
+}
+total
+"""
+
+
+def request_inputs(index: int) -> dict[str, float]:
+    return {"cantidad": index % 10 + 5, "precio": index % 7 + 0.5, "limite": 1000}
+
+
+# Every request tokenizes, parses and resolves the program again, as running it through Runner does
+def time_runner(evaluator_class: type[Evaluator], request_count: int) -> tuple[float, list[str]]:
+    outputs = []
+    start = time.perf_counter()
+    for index in range(request_count):
+        inputs = "".join(f'{name} = {value}\n' for name, value in request_inputs(index).items())
+        output_destination = StringIO()
+        Runner(inputs + REQUEST_PROGRAM, output_destination, evaluator_class = evaluator_class).run_code()
+        outputs.append(output_destination.getvalue())
+
+    return time.perf_counter() - start, outputs
+
+
+def time_interpreter(program: Program, request_count: int) -> tuple[float, list[str]]:
+    interpreter = program.interpreter()
+    start = time.perf_counter()
+    outputs = [interpreter.run(request_inputs(index)).output for index in range(request_count)]
+    return time.perf_counter() - start, outputs
+
+
+def time_pool(program: Program, request_count: int, thread_count: int) -> tuple[float, list[str]]:
+    pool = program.pool(thread_count)
+    outputs: list[str | None] = [None] * request_count
+
+    def serve(first_index: int):
+        for index in range(first_index, request_count, thread_count):
+            outputs[index] = pool.run(request_inputs(index)).output
+
+    threads = [threading.Thread(target = serve, args = (index,)) for index in range(thread_count)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return time.perf_counter() - start, outputs
+
+
+def main():
+    request_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    thread_count = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    print(f'{request_count} requests, {thread_count} threads for the pool')
+    for evaluator_class in (Evaluator, ClosureEvaluator, UnboxedEvaluator, BytecodeEvaluator):
+        runner_time, runner_outputs = time_runner(evaluator_class, request_count)
+
+        start = time.perf_counter()
+        program = Program.compile(REQUEST_PROGRAM, evaluator_class).value
+        compile_time = time.perf_counter() - start
+
+        interpreter_time, interpreter_outputs = time_interpreter(program, request_count)
+        pool_time, pool_outputs = time_pool(program, request_count, thread_count)
+        if interpreter_outputs != runner_outputs or pool_outputs != runner_outputs:
+            print(f'Output mismatch between Runner and Interpreter with {evaluator_class.__name__}.')
+            return 1
+
+        name = evaluator_class.__name__
+        print(f'{name:<18} Runner {runner_time / request_count * 1e6:>8.1f}us/request, '
+              f'Interpreter {interpreter_time / request_count * 1e6:>8.1f}us/request '
+              f'(+ {compile_time * 1e3:.2f}ms compiling once, {runner_time / interpreter_time:.2f}x), '
+              f'pool {pool_time / request_count * 1e6:>8.1f}us/request')
+
+
+if __name__ == "__main__":
+    sys.exit(main())
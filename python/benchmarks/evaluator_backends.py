@@ -0,0 +1,108 @@
+# Usage (from the python directory): python -m benchmarks.evaluator_backends [statement count] [runs]
+import sys
+import time
+from io import StringIO
+
+from closure_compiler import ClosureEvaluator
+from evaluator import Evaluator
+from iterative_evaluator import IterativeEvaluator
+from parser import Parser
+from tokenizer import Tokenizer
+from unboxed import UnboxedEvaluator
+from vm import BytecodeCompiler, VirtualMachine
+
+
+def arithmetic_program(statement_count: int) -> str:
+    lines = ["p = 1", "q = 2", "r = 3"]
+    for index in range(statement_count):
+        match index % 4:
+            case 0:
+                lines.append(f'p = (p + {index % 7 + 1}) * 2 - q / 4 + r * r')
+            case 1:
+                lines.append("q = TwTSuma p q r 1 2 3 - UwUMaximo p q r")
+            case 2:
+                lines.append("r = owoValorTotal (r - p) / (q + 1) + TwTPotencia 2 3")
+            case 3:
+                lines.append("si p >= q {\n    p = p / 1000\n} sino {\n    q = q / 1000\n}")
+
+    lines.append('impwimir "p = " p ", q = " q ", r = " r')
+    return "\n".join(lines) + "\n"
+
+
+def parse(code: str) -> list:
+    tokens = map(lambda t: t.value, Tokenizer(code).process())
+    return [result.value for result in Parser(tokens).process()]
+
+
+def time_tree_walker(expressions: list, runs: int, evaluator_class: type[Evaluator] = Evaluator,
+                     memoization_size: int = 0) -> tuple[float, str]:
+    output_destination = StringIO()
+    start = time.perf_counter()
+    for _ in range(runs):
+        evaluator_class(expressions, output_destination, memoization_size).process()
+
+    return time.perf_counter() - start, output_destination.getvalue()
+
+
+def time_closures(evaluator_class: type[ClosureEvaluator], expressions: list, runs: int,
+                  memoization_size: int = 0) -> tuple[float, float, str]:
+    output_destination = StringIO()
+    evaluator = evaluator_class(expressions, output_destination, memoization_size)
+
+    start = time.perf_counter()
+    compiled_expressions = [evaluator.compiler.compile(expression) for expression in expressions]
+    compile_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        evaluator.variables.clear()
+        evaluator.process_compiled(compiled_expressions)
+
+    return compile_time, time.perf_counter() - start, output_destination.getvalue()
+
+
+def time_virtual_machine(expressions: list, runs: int, memoization_size: int = 0) -> tuple[float, float, str]:
+    output_destination = StringIO()
+
+    start = time.perf_counter()
+    program = BytecodeCompiler().compile_program(expressions)
+    compile_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        VirtualMachine(program, output_destination, memoization_size).run()
+
+    return compile_time, time.perf_counter() - start, output_destination.getvalue()
+
+
+def main():
+    statement_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    expressions = parse(arithmetic_program(statement_count))
+
+    tree_time, tree_output = time_tree_walker(expressions, runs)
+    iterative_time, iterative_output = time_tree_walker(expressions, runs, IterativeEvaluator)
+    compiled_backends = {
+        "ClosureEvaluator": time_closures(ClosureEvaluator, expressions, runs),
+        "UnboxedEvaluator": time_closures(UnboxedEvaluator, expressions, runs),
+        "VirtualMachine":   time_virtual_machine(expressions, runs),
+    }
+
+    print(f'{statement_count} statements, {runs} runs')
+    print(f'{"Evaluator":<18} {tree_time:>8.4f}s')
+    if iterative_output != tree_output:
+        print("Output mismatch between Evaluator and IterativeEvaluator.")
+        return 1
+
+    print(f'{"IterativeEvaluator":<18} {iterative_time:>8.4f}s, {tree_time / iterative_time:.2f}x run')
+    for name, (compile_time, run_time, output) in compiled_backends.items():
+        if output != tree_output:
+            print(f'Output mismatch between Evaluator and {name}.')
+            return 1
+
+        print(f'{name:<18} {run_time:>8.4f}s (+ {compile_time:.4f}s compiling once), '
+              f'{tree_time / run_time:.2f}x run, {tree_time / (run_time + compile_time):.2f}x including compilation')
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+# Usage (from the python directory): python -m benchmarks.function_calls [n] [runs]
+# Computes fibonacci n with the naive doubly recursive function, on every backend, without and with memoization.
+# Without it the run time is dominated by the cost of a call; with it every fibonacci number is computed once.
+import sys
+
+from benchmarks.evaluator_backends import parse, time_closures, time_tree_walker, time_virtual_machine
+from closure_compiler import ClosureEvaluator
+from iterative_evaluator import IterativeEvaluator
+from unboxed import UnboxedEvaluator
+
+MEMOIZATION_SIZE = 128
+
+
+def fibonacci_program(n: int) -> str:
+    return ("funcion fib n {\n"
+            "    si n <= 1 {\n"
+            "        n\n"
+            "    } sino {\n"
+            "        (fib n - 1) + (fib n - 2)\n"
+            "    }\n"
+            "}\n"
+            f'impwimir fib {n}\n')
+
+
+def call_count(n: int) -> int:
+    previous, current = 1, 1
+    for _ in range(n):
+        previous, current = current, previous + current + 1
+
+    return previous
+
+
+def time_backends(expressions: list, runs: int, memoization_size: int) -> dict[str, tuple[float, str]]:
+    timings = {}
+    timings["tree"] = time_tree_walker(expressions, runs, memoization_size = memoization_size)
+    timings["iterative"] = time_tree_walker(expressions, runs, IterativeEvaluator, memoization_size)
+    for name, evaluator_class in [("closure", ClosureEvaluator), ("unboxed", UnboxedEvaluator)]:
+        compile_time, run_time, output = time_closures(evaluator_class, expressions, runs, memoization_size)
+        timings[name] = (compile_time + run_time, output)
+
+    compile_time, run_time, output = time_virtual_machine(expressions, runs, memoization_size)
+    timings["vm"] = (compile_time + run_time, output)
+    return timings
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    expressions = parse(fibonacci_program(n))
+    plain_timings = time_backends(expressions, runs, 0)
+    memoized_timings = time_backends(expressions, runs, MEMOIZATION_SIZE)
+
+    print(f'fib {n}, {call_count(n)} calls without memoization, {runs} runs')
+    print(f'{"":<12}{"plain":>12}{"calls/s":>12}{"memoized":>12}{"speedup":>10}')
+    for name, (plain_time, plain_output) in plain_timings.items():
+        memoized_time, memoized_output = memoized_timings[name]
+        if memoized_output != plain_output:
+            print(f'warning: {name} output differs with memoization', file = sys.stderr)
+
+        calls_per_second = call_count(n) * runs / plain_time
+        print(f'{name:<12}{plain_time:>11.3f}s{calls_per_second:>12.0f}{memoized_time:>11.4f}s{plain_time / memoized_time:>9.0f}x')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# Usage (from the python directory): python -m benchmarks.loop_unrolling [iteration count] [runs]
+# Runs the same computation written as a "mientras" loop and as the unrolled statements scripts used to generate.
+# The loop is also run ended by a flag its body sets to "ño", which must stop it like a false comparison does.
+import sys
+import time
+from io import StringIO
+
+from benchmarks.evaluator_backends import parse, time_closures, time_tree_walker, time_virtual_machine
+from closure_compiler import ClosureEvaluator
+from iterative_evaluator import IterativeEvaluator
+from unboxed import UnboxedEvaluator
+
+LOOP_BODY = ["total = total + i * 2 - total / 1000", "i = i + 1"]
+
+
+def loop_program(iteration_count: int) -> str:
+    body = "\n".join(f'    {statement}' for statement in LOOP_BODY)
+    return f'i = 0\ntotal = 0\nmientras i <= {iteration_count - 1} {{\n{body}\n}}\nimpwimir total i\n'
+
+
+def flag_loop_program(iteration_count: int) -> str:
+    body = "\n".join(f'    {statement}' for statement in LOOP_BODY)
+    return (f'i = 0\ntotal = 0\nseguir = chi\nmientras seguir {{\n{body}\n'
+            f'    si i >= {iteration_count} {{\n        seguir = ño\n    }}\n}}\nimpwimir total i\n')
+
+
+def unrolled_program(iteration_count: int) -> str:
+    body = "".join(f'{statement}\n' for statement in LOOP_BODY)
+    return "i = 0\ntotal = 0\n" + body * iteration_count + "impwimir total i\n"
+
+
+def time_parse(code: str) -> tuple[float, list]:
+    start = time.perf_counter()
+    expressions = parse(code)
+    return time.perf_counter() - start, expressions
+
+
+def time_backends(expressions: list, runs: int) -> dict[str, tuple[float, str]]:
+    timings = {}
+    timings["tree"] = time_tree_walker(expressions, runs)
+    timings["iterative"] = time_tree_walker(expressions, runs, IterativeEvaluator)
+    for name, evaluator_class in [("closure", ClosureEvaluator), ("unboxed", UnboxedEvaluator)]:
+        compile_time, run_time, output = time_closures(evaluator_class, expressions, runs)
+        timings[name] = (compile_time + run_time, output)
+
+    compile_time, run_time, output = time_virtual_machine(expressions, runs)
+    timings["vm"] = (compile_time + run_time, output)
+    return timings
+
+
+def main():
+    iteration_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    loop_code = loop_program(iteration_count)
+    unrolled_code = unrolled_program(iteration_count)
+    loop_parse_time, loop_expressions = time_parse(loop_code)
+    unrolled_parse_time, unrolled_expressions = time_parse(unrolled_code)
+    loop_timings = time_backends(loop_expressions, runs)
+    unrolled_timings = time_backends(unrolled_expressions, runs)
+    flag_loop_timings = time_backends(time_parse(flag_loop_program(iteration_count))[1], runs)
+
+    print(f'{iteration_count} iterations, {runs} runs')
+    print(f'{"":<22}{"unrolled":>12}{"loop":>12}{"speedup":>10}{"flag loop":>13}')
+    print(f'{"source size":<22}{len(unrolled_code):>11}B{len(loop_code):>11}B')
+    print(f'{"tokenize + parse":<22}{unrolled_parse_time:>11.3f}s{loop_parse_time:>11.3f}s{unrolled_parse_time / loop_parse_time:>9.1f}x')
+    for name, (unrolled_time, unrolled_output) in unrolled_timings.items():
+        loop_time, loop_output = loop_timings[name]
+        flag_loop_time, flag_loop_output = flag_loop_timings[name]
+        if loop_output != unrolled_output:
+            print(f'warning: {name} output differs between the loop and the unrolled script', file = sys.stderr)
+        if flag_loop_output != unrolled_output:
+            print(f'warning: {name} output differs between the flag loop and the unrolled script', file = sys.stderr)
+
+        print(f'{"evaluate " + name:<22}{unrolled_time:>11.3f}s{loop_time:>11.3f}s{unrolled_time / loop_time:>9.1f}x'
+              f'{flag_loop_time:>12.3f}s')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# Usage (from the python directory): python -m benchmarks.mapped_source [statement count] [runs]
+# Writes a generated program to a temporary file, then tokenizes and parses it as a stream, once from the file
+# read into a string and once from the file mapped into memory, reporting the time taken and the peak memory
+# allocated by Python for each.
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.corpus import CorpusGenerator
+from iterative_parser import IterativeParser
+from mapped_source import MappedSource
+from tokenizer import Tokenizer
+
+
+def count_parsed_expressions(token_results) -> int:
+    tokens = map(lambda t: t.value, token_results)
+    return sum(1 for _ in IterativeParser(tokens).expressions())
+
+
+def count_expressions(filepath: str, mapped: bool) -> int:
+    if mapped:
+        with MappedSource(filepath) as mapped_source:
+            return count_parsed_expressions(mapped_source.tokens())
+
+    with open(filepath) as file:
+        code = file.read()
+
+    return count_parsed_expressions(Tokenizer(code).tokens())
+
+
+def measure(filepath: str, mapped: bool, runs: int) -> tuple[float, int, int]:
+    best_seconds = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        expression_count = count_expressions(filepath, mapped)
+        best_seconds = min(best_seconds, time.perf_counter() - start)
+
+    # Memory is traced in a run of its own, as tracing slows the timed runs down
+    tracemalloc.start()
+    try:
+        count_expressions(filepath, mapped)
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return best_seconds, peak_bytes, expression_count
+
+
+def main():
+    statement_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    file_descriptor, filepath = tempfile.mkstemp(suffix = ".uwupp")
+    try:
+        with os.fdopen(file_descriptor, "w") as file:
+            file.write(CorpusGenerator().program(statement_count))
+
+        file_size = os.path.getsize(filepath)
+        print(f'{statement_count} statements, {file_size / 1024 / 1024:.1f} MiB')
+        for name, mapped in (("read", False), ("mapped", True)):
+            seconds, peak_bytes, expression_count = measure(filepath, mapped, runs)
+            print(f'{name:<7} {seconds:8.3f}s  peak {peak_bytes / 1024 / 1024:8.2f} MiB '
+                  f'({peak_bytes / file_size:.2f}x the file), {expression_count} expressions')
+    finally:
+        os.remove(filepath)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
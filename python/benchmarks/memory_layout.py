@@ -0,0 +1,103 @@
+# Usage (from the python directory): python -m benchmarks.memory_layout [source size in bytes]
+# Reports how many bytes the token list and the parsed expressions take per token and per AST node, in the compact
+# layout the tokenizer and parser build and in the layout they built before it, see DictToken and DictExpression.
+import sys
+import tracemalloc
+
+from benchmarks.evaluator_backends import arithmetic_program
+from parser import *
+from tokenizer import *
+
+
+# The earlier layout: classes without __slots__, so every instance carries a __dict__. Every token also had a
+# Result and a text of its own, where symbols, ends of line and keywords now share one Result and identifier
+# names are interned. Expression stays a single class for every kind of node in both layouts; only how its
+# instances are stored changed.
+class DictResult:
+    def __init__(self, value):
+        self.is_ok = True
+        self.value = value
+        self.error = None
+
+
+class DictToken:
+    def __init__(self, token: Token):
+        self.kind = token.kind
+        self.original = copied(token.original)
+        self.value = copied(token.value)
+
+
+class DictExpression:
+    def __init__(self, expression: Expression):
+        self.type = expression.type
+        self.operator = expression.operator
+        self.value = expression.value
+        self.operands = dict_expressions(expression.operands)
+        self.condition = DictExpression(expression.condition) if expression.condition is not None else None
+        self.if_body = dict_expressions(expression.if_body)
+        self.else_body = dict_expressions(expression.else_body)
+        self.slot = expression.slot
+
+
+def dict_expressions(expressions: list | None) -> list | None:
+    return [DictExpression(expression) for expression in expressions] if expressions is not None else None
+
+
+# A new object equal to value, as slicing the source gave each token. Single characters are cached by Python
+# either way.
+def copied(value):
+    if type(value) is str:
+        return value[:1] + value[1:]
+    if type(value) is float:
+        return value + 0.0
+
+    return value
+
+
+def count_nodes(expression: Expression) -> int:
+    children = list(expression.operands or [])
+    if expression.type == ExpressionType.If:
+        children += [expression.condition] + expression.if_body + (expression.else_body or [])
+
+    return 1 + sum(count_nodes(child) for child in children)
+
+
+def main():
+    source_size = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    source = ""
+    statement_count = 1_000
+    while len(source) < source_size:
+        source = arithmetic_program(statement_count)
+        statement_count *= 2
+
+    tracemalloc.start()
+    tokens = Tokenizer(source).process()
+    token_bytes = tracemalloc.get_traced_memory()[0]
+    token_count = len(tokens)
+
+    expression_results = Parser(map(lambda t: t.value, tokens)).process()
+    expressions = [result.value for result in expression_results]
+    del expression_results
+    tree_bytes = tracemalloc.get_traced_memory()[0] - token_bytes
+
+    # Both earlier layouts are measured as copies of the compact ones, by how much memory the copies add
+    start_bytes = tracemalloc.get_traced_memory()[0]
+    dict_tokens = [DictResult(DictToken(token_result.value)) for token_result in tokens]
+    dict_token_bytes = tracemalloc.get_traced_memory()[0] - start_bytes
+
+    start_bytes = tracemalloc.get_traced_memory()[0]
+    dict_tree = dict_expressions(expressions)
+    dict_tree_bytes = tracemalloc.get_traced_memory()[0] - start_bytes
+    tracemalloc.stop()
+    del dict_tokens, dict_tree
+
+    node_count = sum(count_nodes(expression) for expression in expressions)
+
+    print(f'source        {len(source):>12} bytes')
+    print(f'{"":<14}{"count":>12}  {"__dict__":>16}  {"compact":>16}')
+    print(f'tokens        {token_count:>12}  {dict_token_bytes / token_count:>16.1f}  {token_bytes / token_count:>16.1f}  bytes per token')
+    print(f'AST nodes     {node_count:>12}  {dict_tree_bytes / node_count:>16.1f}  {tree_bytes / node_count:>16.1f}  bytes per node')
+
+
+if __name__ == "__main__":
+    main()
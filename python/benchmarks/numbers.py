@@ -0,0 +1,167 @@
+# Usage (from the python directory): python -m benchmarks.numbers [number count] [runs]
+# Tokenizes a number dense source with the current parse_number and with the digit by digit float conversion
+# it replaced, then evaluates the same integer arithmetic with int literals and with float ones. Finally runs
+# integer arithmetic that outgrows MAXIMUM_INTEGER_BITS on every backend, which must print the same results.
+import random
+import sys
+import time
+from io import StringIO
+
+import tokenizer
+from benchmarks.evaluator_backends import parse
+from closure_compiler import ClosureEvaluator
+from evaluator import Evaluator
+from iterative_evaluator import IterativeEvaluator
+from runner import Runner
+from tokenizer import Tokenizer
+from unboxed import UnboxedEvaluator
+from vm import BytecodeEvaluator
+
+
+# How number literals used to be converted, kept to compare against
+def digit_by_digit_parse_number(string_value: str) -> float | None:
+    decimal_places: int = 0
+    digit_count:    int = 0
+    exponent:       int = 0
+    number:         float = 0
+    iterator = enumerate(reversed(string_value))
+
+    for number_character_tuple in iterator:
+        number_character = number_character_tuple[1]
+        if number_character.isdigit():
+            if number_character != "0" or decimal_places != 0:
+                digit = int(number_character)
+                number += digit * pow(10, exponent)
+
+            exponent += 1
+        elif number_character == ".":
+            decimal_places = digit_count
+            continue
+        elif number_character == "_":
+            continue
+        else:
+            return None
+
+        digit_count += 1
+
+    number /= pow(10, decimal_places)
+    return number
+
+
+def number_dense_source(number_count: int) -> str:
+    generator = random.Random(0)
+    lines = []
+    for line_index in range(number_count // 16):
+        numbers = [str(generator.randint(0, 10 ** generator.randint(1, 12))) for _ in range(16)]
+        if line_index % 2:
+            numbers = [f'{number}.{generator.randint(0, 999_999)}' for number in numbers]
+
+        lines.append(f'impwimir TwTSuma {" ".join(numbers)}')
+
+    return "\n".join(lines) + "\n"
+
+
+def time_tokenizer(source: str, runs: int) -> float:
+    best_seconds = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        Tokenizer(source).process()
+        best_seconds = min(best_seconds, time.perf_counter() - start)
+
+    return best_seconds
+
+
+def integer_program(statement_count: int, float_literals: bool) -> str:
+    suffix = ".0" if float_literals else ""
+    lines = [f'a = 1{suffix}', f'b = 7{suffix}', f'c = 0{suffix}']
+    for index in range(statement_count):
+        lines.append(f'c = c + a * b - {index % 13}{suffix}')
+        lines.append(f'a = a + {index % 5 + 1}{suffix}')
+        lines.append(f'b = TwTPotencia {index % 3 + 1}{suffix} 3{suffix}')
+
+    lines.append("impwimir c")
+    return "\n".join(lines) + "\n"
+
+
+def time_evaluator(code: str, runs: int) -> tuple[float, str]:
+    expressions = parse(code)
+    best_seconds = float("inf")
+    for _ in range(runs):
+        output_destination = StringIO()
+        start = time.perf_counter()
+        Evaluator(expressions, output_destination).process()
+        best_seconds = min(best_seconds, time.perf_counter() - start)
+
+    return best_seconds, output_destination.getvalue()
+
+
+# Squares 10 until it is far past MAXIMUM_INTEGER_BITS, in a loop and unrolled, and builds a literal and sums
+# past it too; ints turn into floats on the way instead of growing without bound
+OVERFLOW_PROGRAM = """v = 10
+i = 0
+mientras 12 >= i {
+    v = v * v
+    i = i + 1
+}
+w = 10
+""" + "w = w * w\n" * 8 + """impwimir v " " w " " w - w " " 0 - w * w * w * w
+impwimir (TwTSuma w w w w) " " (TwTPotencia 2 1020) " " (TwTPotencia 7 360)
+impwimir 1""" + "0" * 400 + """ / 3
+u = 1
+i = 0
+mientras 299 >= i {
+    u = u * 10
+    i = i + 1
+}
+impwimir (TwTPotencia 10 300) == u " " (TwTPotencia 2 600) " " (TwTPotencia 10 400) " " (TwTPotencia 0 - 10 401)
+"""
+BACKENDS = {"tree": Evaluator, "closure": ClosureEvaluator, "unboxed": UnboxedEvaluator,
+            "iterative": IterativeEvaluator, "vm": BytecodeEvaluator}
+
+
+def overflow_outputs() -> dict[str, str]:
+    outputs = {}
+    for name, evaluator_class in BACKENDS.items():
+        output_destination = StringIO()
+        Runner(OVERFLOW_PROGRAM, output_destination, evaluator_class = evaluator_class).run_code()
+        outputs[name] = output_destination.getvalue()
+
+    return outputs
+
+
+def main():
+    number_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    source = number_dense_source(number_count)
+    current_seconds = time_tokenizer(source, runs)
+    current_parse_number = tokenizer.parse_number
+    tokenizer.parse_number = digit_by_digit_parse_number
+    try:
+        previous_seconds = time_tokenizer(source, runs)
+    finally:
+        tokenizer.parse_number = current_parse_number
+
+    print(f'Tokenizing {number_count} numbers ({len(source)} bytes): {previous_seconds:.4f}s digit by digit, '
+          f'{current_seconds:.4f}s now, {previous_seconds / current_seconds:.2f}x')
+
+    statement_count = number_count // 10
+    int_seconds, int_output = time_evaluator(integer_program(statement_count, False), runs)
+    float_seconds, float_output = time_evaluator(integer_program(statement_count, True), runs)
+    print(f'Evaluating {statement_count * 3} statements of integer arithmetic: {float_seconds:.4f}s with float '
+          f'literals, {int_seconds:.4f}s with int literals, {float_seconds / int_seconds:.2f}x')
+    print(f'  results: {float_output.strip()} with floats, {int_output.strip()} with ints')
+
+    outputs = overflow_outputs()
+    if len(set(outputs.values())) != 1:
+        for name, output in outputs.items():
+            print(f'{name:<10} {output.strip()[:100]}')
+        print("Backends disagree on integer arithmetic past MAXIMUM_INTEGER_BITS.")
+        return 1
+
+    lines = outputs["tree"].strip().splitlines()
+    print(f'Integer arithmetic past MAXIMUM_INTEGER_BITS, the same on every backend: {lines[0][:60]}..., {" ".join(lines[1:])[:60]}...')
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+# Usage (from the python directory): python -m benchmarks.optimizer_identity [source files or directories...]
+# Checks that every optimization level prints exactly what the unoptimized program prints.
+import os
+import sys
+from io import StringIO
+
+from optimizer import MAXIMUM_OPTIMIZATION_LEVEL
+from runner import Runner
+
+DEFAULT_CORPUS = ["../cli/test_files"]
+
+
+def source_files(paths: list[str]) -> list[str]:
+    filepaths: list[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            filepaths.extend(sorted(os.path.join(path, filename) for filename in os.listdir(path)
+                                    if filename.endswith(".uwupp")))
+        else:
+            filepaths.append(path)
+
+    return filepaths
+
+
+def run_output(code: str, optimization_level: int) -> str:
+    output_destination = StringIO()
+    try:
+        Runner(code, output_destination, optimization_level = optimization_level).run_code()
+    except Exception as exception:
+        output_destination.write(f'<{type(exception).__name__}>')
+
+    return output_destination.getvalue()
+
+
+def main():
+    mismatches = 0
+    for filepath in source_files(sys.argv[1:] or DEFAULT_CORPUS):
+        with open(filepath, encoding = "utf-8") as file:
+            code = file.read()
+
+        expected_output = run_output(code, 0)
+        file_mismatches = 0
+        for optimization_level in range(1, MAXIMUM_OPTIMIZATION_LEVEL + 1):
+            if run_output(code, optimization_level) != expected_output:
+                file_mismatches += 1
+                print(f'MISMATCH {filepath} at optimization level {optimization_level}')
+
+        if file_mismatches == 0:
+            print(f'ok {filepath}')
+
+        mismatches += file_mismatches
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
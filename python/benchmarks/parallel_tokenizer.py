@@ -0,0 +1,58 @@
+# Usage (from the python directory): python -m benchmarks.parallel_tokenizer [statement count] [runs] [worker counts]
+# Tokenizes a generated program with Tokenizer and with ParallelTokenizer for each worker count, by default every
+# power of two up to the number of cores and the number of cores itself, and reports the speedup of each.
+import os
+import sys
+import time
+
+from benchmarks.corpus import CorpusGenerator
+from parallel_tokenizer import ParallelTokenizer
+from tokenizer import Tokenizer
+
+
+def fastest_run(function, runs: int) -> tuple[float, any]:
+    best_seconds = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = function()
+        best_seconds = min(best_seconds, time.perf_counter() - start)
+
+    return best_seconds, result
+
+
+def default_worker_counts(core_count: int) -> list[int]:
+    worker_counts = [2]
+    while worker_counts[-1] * 2 <= core_count:
+        worker_counts.append(worker_counts[-1] * 2)
+    if core_count > worker_counts[-1]:
+        worker_counts.append(core_count)
+
+    return worker_counts
+
+
+def main():
+    statement_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    core_count = os.cpu_count() or 1
+    if len(sys.argv) > 3:
+        worker_counts = [int(worker_count) for worker_count in sys.argv[3].split(",")]
+    else:
+        worker_counts = default_worker_counts(core_count)
+
+    code = CorpusGenerator().program(statement_count)
+    serial_seconds, serial_tokens = fastest_run(lambda: Tokenizer(code).process(), runs)
+    print(f'{statement_count} statements, {len(code) / 1024 / 1024:.1f} MiB, {len(serial_tokens)} tokens, '
+          f'{core_count} cores')
+    print(f'{"serial":>10} {serial_seconds:8.3f}s')
+
+    for worker_count in worker_counts:
+        seconds, tokens = fastest_run(lambda: ParallelTokenizer(code, worker_count).process(), runs)
+        if len(tokens) != len(serial_tokens):
+            print(f'{worker_count} workers produced {len(tokens)} tokens instead of {len(serial_tokens)}.')
+            return 1
+
+        print(f'{worker_count:>2} workers {seconds:8.3f}s  {serial_seconds / seconds:.2f}x')
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+# Usage (from the python directory): python -m benchmarks.parser_engines [statement count] [runs]
+# Compares the recursive Parser with IterativeParser on the same tokens, on ordinary statements and on long "+"
+# chains, and checks that both produce the same trees.
+import sys
+import time
+
+from benchmarks.evaluator_backends import arithmetic_program
+from iterative_parser import IterativeParser
+from parser import Parser
+from program_cache import expression_to_tuple
+from tokenizer import Tokenizer
+
+
+def time_parser(parser_class, tokens: list, runs: int) -> tuple[float, list]:
+    start = time.perf_counter()
+    for _ in range(runs):
+        results = parser_class(tokens).process()
+
+    return (time.perf_counter() - start) / runs, results
+
+
+def compare(name: str, code: str, runs: int):
+    tokens = [result.value for result in Tokenizer(code).process()]
+    recursive_seconds, recursive_results = time_parser(Parser, tokens, runs)
+    iterative_seconds, iterative_results = time_parser(IterativeParser, tokens, runs)
+
+    identical = [expression_to_tuple(result.value) for result in recursive_results] == \
+                [expression_to_tuple(result.value) for result in iterative_results]
+    print(f'{name:<16} {len(tokens):>9} {len(tokens) / recursive_seconds:>14,.0f} {len(tokens) / iterative_seconds:>14,.0f}'
+          f' {recursive_seconds / iterative_seconds:>8.2f}x {"yes" if identical else "NO":>9}')
+
+
+def main():
+    statement_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    print(f'{"program":<16} {"tokens":>9} {"recursive t/s":>14} {"iterative t/s":>14} {"speedup":>9} {"identical":>9}')
+    compare("statements", arithmetic_program(statement_count), runs)
+    # Chains short enough for the recursive parser, and comparing the trees, to stay within the recursion limit
+    chain = " + ".join(["1"] * 200) + "\n"
+    compare("addition chains", chain * (statement_count // 20), runs)
+
+
+if __name__ == "__main__":
+    main()
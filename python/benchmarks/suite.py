@@ -0,0 +1,194 @@
+# Usage (from the python directory): python -m benchmarks.suite [options]
+#   --tiers=100,1000,10000  statement counts of the generated programs, see CorpusGenerator
+#   --runs=N                times each phase is run, the fastest run counts
+#   --seed=N                seed of the generated programs
+#   --save=PATH             writes the results as JSON, to be used as a baseline later
+#   --baseline=PATH         compares the results with a saved baseline, exiting with 1 on regressions
+#   --threshold=F           slowdown or memory growth over the baseline reported as a regression, 0.1 for 10%
+# Times the tokenizer, the parser and the evaluator separately on generated programs of increasing size, and
+# reports their throughput and the peak memory each one needs.
+import json
+import sys
+import time
+import tracemalloc
+from io import StringIO
+
+from benchmarks.corpus import CorpusGenerator
+from evaluator import Evaluator
+from iterative_evaluator import IterativeEvaluator
+from iterative_parser import IterativeParser
+from parser import *
+from resolver import Resolver
+from tokenizer import Tokenizer
+
+SIZE_TIERS = [100, 1_000, 10_000]
+DEFAULT_RUNS = 3
+DEFAULT_THRESHOLD = 0.1
+PHASES = ["tokenize", "parse", "evaluate"]
+# What each phase's throughput is counted in
+THROUGHPUT_UNITS = {"tokenize": "tokens", "parse": "nodes", "evaluate": "evaluated nodes"}
+
+
+def count_nodes(expressions: list[Expression]) -> int:
+    node_count = 0
+    pending_expressions = list(expressions)
+    while pending_expressions:
+        expression = pending_expressions.pop()
+        node_count += 1
+        pending_expressions.extend(expression.operands or [])
+        if expression.condition is not None:
+            pending_expressions.append(expression.condition)
+        if expression.type in (ExpressionType.If, ExpressionType.While, ExpressionType.Function):
+            pending_expressions.extend(expression.if_body)
+            pending_expressions.extend(expression.else_body or [])
+
+    return node_count
+
+
+# Nodes an evaluation goes through, branches not taken left out. An IterativeEvaluator that never gets to
+# suspend counts them for free, see evaluation_steps.
+def count_evaluated_nodes(expressions: list[Expression], slot_count: int) -> int:
+    yield_interval = 1 << 62
+    evaluator = IterativeEvaluator(expressions, StringIO())
+    evaluator.allocate_slots(slot_count)
+    for _ in evaluator.process_steps(yield_interval):
+        pass
+
+    return yield_interval - evaluator.countdown
+
+
+def tokenize(code: str) -> list:
+    return [result.value for result in Tokenizer(code).process()]
+
+
+def parse(tokens: list) -> list[Expression]:
+    return [result.value for result in IterativeParser(tokens).process()]
+
+
+def evaluate(expressions: list[Expression], slot_count: int):
+    evaluator = Evaluator(expressions, StringIO())
+    evaluator.allocate_slots(slot_count)
+    evaluator.process()
+
+
+def fastest_run(function, runs: int, *arguments) -> tuple[float, any]:
+    best_seconds = float("inf")
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = function(*arguments)
+        best_seconds = min(best_seconds, time.perf_counter() - start)
+
+    return best_seconds, result
+
+
+# Runs the phase once more with tracemalloc on, apart from the timed runs it would slow down
+def peak_bytes(function, *arguments) -> int:
+    tracemalloc.start()
+    try:
+        function(*arguments)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure_tier(statement_count: int, runs: int, seed: int) -> dict:
+    code = CorpusGenerator(seed).program(statement_count)
+
+    tokenize_seconds, tokens = fastest_run(tokenize, runs, code)
+    parse_seconds, expressions = fastest_run(parse, runs, tokens)
+    resolver = Resolver()
+    resolver.process(expressions)
+    evaluate_seconds, _ = fastest_run(evaluate, runs, expressions, resolver.slot_count)
+
+    counts = {
+        "tokenize": len(tokens),
+        "parse": count_nodes(expressions),
+        "evaluate": count_evaluated_nodes(expressions, resolver.slot_count),
+    }
+    seconds = {"tokenize": tokenize_seconds, "parse": parse_seconds, "evaluate": evaluate_seconds}
+    peaks = {
+        "tokenize": peak_bytes(tokenize, code),
+        "parse": peak_bytes(parse, tokens),
+        "evaluate": peak_bytes(evaluate, expressions, resolver.slot_count),
+    }
+
+    return {
+        "statements": statement_count,
+        "bytes": len(code.encode("utf-8")),
+        "phases": {phase: {"seconds": seconds[phase], "count": counts[phase], "per_second": counts[phase] / seconds[phase],
+                           "peak_bytes": peaks[phase]} for phase in PHASES},
+    }
+
+
+# Returns a description of every phase that got slower or needs more memory than threshold allows
+def regressions(results: dict, baseline: dict, threshold: float) -> list[str]:
+    baseline_tiers = {tier["statements"]: tier for tier in baseline["tiers"]}
+    found = []
+    for tier in results["tiers"]:
+        baseline_tier = baseline_tiers.get(tier["statements"])
+        if baseline_tier is None:
+            continue
+
+        for phase in PHASES:
+            current, previous = tier["phases"][phase], baseline_tier["phases"][phase]
+            for measure in ("seconds", "peak_bytes"):
+                ratio = current[measure] / previous[measure] if previous[measure] else 1.0
+                if ratio > 1 + threshold:
+                    found.append(f'{tier["statements"]} statements, {phase}: {measure} {previous[measure]:.6g} -> '
+                                 f'{current[measure]:.6g} ({(ratio - 1) * 100:+.1f}%)')
+
+    return found
+
+
+def option_value(options: list[str], name: str, default: str | None) -> str | None:
+    for option in options:
+        if option.startswith(f'--{name}='):
+            return option.removeprefix(f'--{name}=')
+
+    return default
+
+
+def main():
+    options = sys.argv[1:]
+    tiers_option = option_value(options, "tiers", None)
+    tiers = [int(tier) for tier in tiers_option.split(",")] if tiers_option is not None else SIZE_TIERS
+    runs = int(option_value(options, "runs", str(DEFAULT_RUNS)))
+    seed = int(option_value(options, "seed", "0"))
+    threshold = float(option_value(options, "threshold", str(DEFAULT_THRESHOLD)))
+    save_path = option_value(options, "save", None)
+    baseline_path = option_value(options, "baseline", None)
+
+    results = {"seed": seed, "runs": runs, "tiers": []}
+    print(f'{"statements":>10} {"bytes":>12} {"phase":<9} {"seconds":>10} {"throughput":>30} {"peak KiB":>10}')
+    for statement_count in tiers:
+        tier = measure_tier(statement_count, runs, seed)
+        results["tiers"].append(tier)
+        for phase in PHASES:
+            measures = tier["phases"][phase]
+            throughput = f'{measures["per_second"]:,.0f} {THROUGHPUT_UNITS[phase]}/s'
+            print(f'{statement_count:>10} {tier["bytes"]:>12} {phase:<9} {measures["seconds"]:>10.4f} '
+                  f'{throughput:>30} {measures["peak_bytes"] / 1024:>10.1f}')
+
+    if save_path is not None:
+        with open(save_path, "w") as file:
+            json.dump(results, file, indent = 2)
+
+    if baseline_path is not None:
+        with open(baseline_path) as file:
+            baseline = json.load(file)
+
+        if baseline["seed"] != seed:
+            print(f'The baseline was measured on programs generated with seed {baseline["seed"]}, not {seed}.')
+            return 1
+
+        found = regressions(results, baseline, threshold)
+        for regression in found:
+            print(f'REGRESSION {regression}')
+        if found:
+            return 1
+
+        print(f'No regressions over {threshold * 100:.0f}% against {baseline_path}.')
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+# Usage (from the python directory): python -m benchmarks.tokenizer_scaling [max size in bytes]
+import sys
+import time
+
+from tokenizer import Tokenizer
+
+SAMPLE_PATH = "../cli/test_files/test_code.uwupp"
+SIZE_TIERS = [1_000, 10_000, 100_000, 1_000_000, 10_000_000, 50_000_000]
+
+
+def build_source(sample: str, size: int) -> str:
+    repetitions = size // len(sample) + 1
+    source = (sample * repetitions)[:size]
+    # Cut at the last newline so the input never ends inside a string literal
+    return source[:source.rfind("\n") + 1]
+
+
+def main():
+    maximum_size = int(sys.argv[1]) if len(sys.argv) > 1 else SIZE_TIERS[-1]
+    with open(SAMPLE_PATH, encoding = "utf-8") as file:
+        sample = file.read() + "\n"
+
+    print(f'{"bytes":>12} {"tokens":>10} {"seconds":>10} {"ns/byte":>10}')
+    for size in SIZE_TIERS:
+        if size > maximum_size:
+            break
+
+        source = build_source(sample, size)
+        start = time.perf_counter()
+        tokens = Tokenizer(source).process()
+        elapsed = time.perf_counter() - start
+
+        print(f'{len(source):>12} {len(tokens):>10} {elapsed:>10.4f} {elapsed * 1e9 / len(source):>10.1f}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import math
+import operator as python_operator
+import sys
+
+from arrays import *
+from tokenizer import add_keyword
+from values import *
+
+
+# A function the language provides. Its arguments are checked before function is called with them: there are
+# parameter_count of them, or any number when it is None, and each one has one of parameter_types. function
+# takes and returns ValueData. native_function, when set, does the same on the plain values UnboxedEvaluator
+# passes around. A pure built-in does nothing but compute a result from its arguments, so calls to it can be
+# folded by the Optimizer and functions calling it can be memoized.
+class BuiltIn:
+    __slots__ = ("name", "function", "parameter_types", "parameter_count", "pure", "native_function")
+
+    def __init__(self, name: str, function, parameter_types: list[ValueType], parameter_count: int | None,
+                 pure: bool = True, native_function = None):
+        self.name = name
+        self.function = function
+        # A list rather than a set: Enum members hash in Python, so "in" on a short list is faster
+        self.parameter_types = parameter_types
+        self.parameter_count = parameter_count
+        self.pure = pure
+        self.native_function = native_function
+
+
+# Every built-in, by name. The tokenizer, the parser and every evaluator get built-ins from here, so one
+# registered by the host before a program is parsed is called like the language's own ones.
+class BuiltInRegistry:
+    def __init__(self):
+        self.built_ins: dict[str, BuiltIn] = {}
+        # The built-ins called by name. The others, like Not and Array, have syntax of their own.
+        self.keywords: dict[str, BuiltIn] = {}
+
+    def register(self, built_in: BuiltIn, keyword: bool = True) -> BuiltIn:
+        if built_in.name in self.built_ins:
+            raise ValueError(f'Built-in {built_in.name} is already registered.')
+        if keyword:
+            add_keyword(built_in.name)
+            self.keywords[built_in.name] = built_in
+
+        self.built_ins[built_in.name] = built_in
+        return built_in
+
+    # Registers a Python function taking and returning plain values: floats or ints for Number, str for String,
+    # bool for Boolean and None for nya. Host functions are assumed to have side effects unless pure is set.
+    def register_native(self, name: str, function, parameter_types: list[ValueType], parameter_count: int | None = None,
+                        pure: bool = False) -> BuiltIn:
+        def native_function(*values):
+            value = function(*values)
+            if value is None:
+                return Nya
+            if type(value) not in native_value_types:
+                raise TypeError(f'Built-in {name} returned an unsupported {type(value).__name__} value.')
+
+            return value
+
+        def boxed_function(*arguments: ValueData) -> ValueData:
+            value = native_function(*[argument.value for argument in arguments])
+            return ValueData(value, native_value_types[type(value)])
+
+        return self.register(BuiltIn(name, boxed_function, list(parameter_types), parameter_count, pure, native_function))
+
+
+native_value_types = {
+    float:      ValueType.Number,
+    int:        ValueType.Number,
+    bool:       ValueType.Boolean,
+    str:        ValueType.String,
+    type(Nya):  ValueType.Nya,
+}
+native_value_types.update({array_type: ValueType.Array for array_type in array_types})
+
+
+# Sums of ints are exact. Once a float is involved the sum is rounded only once, at the end, instead of after
+# every addition, so long sums don't pile up rounding errors.
+def number_sum(values: list) -> int | float:
+    total = sum(values)
+    if type(total) is int:
+        return bounded_number(total)
+    if not math.isfinite(total):
+        return total
+
+    return math.fsum(values)
+
+
+# Integer powers stay exact while they fit in MAXIMUM_INTEGER_BITS and become floats past it, like products do.
+# Powers too large for a float are infinite instead of failing with an OverflowError.
+def number_power(base, exponent):
+    if type(base) is int and type(exponent) is int and exponent > 0:
+        # The power has more than (bit_length - 1) * exponent bits, so one past the bound by that measure is
+        # never built as an integer. Any other is built, and has at most about twice MAXIMUM_INTEGER_BITS bits.
+        if (abs(base).bit_length() - 1) * exponent < MAXIMUM_INTEGER_BITS:
+            return bounded_number(base ** exponent)
+
+        base = float(base)
+
+    try:
+        return base ** exponent
+    except OverflowError:
+        return -math.inf if base < 0 and exponent % 2 == 1 else math.inf
+
+
+def UnUReversa(value_data: ValueData) -> ValueData:
+    actual_value = value_data.value
+    if value_data.type == ValueType.Number:
+        return ValueData.number_value(UnUReversa_number(actual_value))
+    elif value_data.type == ValueType.String:
+        return ValueData.string_value(UnUReversa_string(actual_value))
+
+    raise RuntimeError("Invalid value type for UnUReversa function.")
+
+
+def UnUReversa_string(value: str) -> str:
+    return value[::-1]
+
+
+def UnUReversa_number(value: float) -> float:
+    reverse_number = 0
+    while value > 0:
+        digit = value % 10
+        reverse_number = reverse_number * 10 + digit
+        value //= 10
+
+    return reverse_number
+
+def TwTPotencia(value_number: ValueData, value_power: ValueData) -> ValueData:
+    actual_value_number = value_number.value
+    actual_value_power = value_power.value
+    if value_number.type == ValueType.Array or value_power.type == ValueType.Array:
+        return ValueData.array_value(array_power(actual_value_number, actual_value_power))
+
+    return ValueData.number_value(number_power(actual_value_number, actual_value_power))
+
+def owoValorTotal(value_data: ValueData) -> ValueData:
+    if value_data.type == ValueType.Array:
+        return ValueData.array_value(array_absolute(value_data.value))
+
+    return ValueData.number_value(abs(value_data.value))
+
+def UwUMaximo(*numbers: ValueData) -> ValueData:
+    max_value = 0
+    for number in numbers:
+        value = number.value
+        if number.type == ValueType.Array:
+            value = array_maximum(value)
+            if value is None:
+                continue
+
+        if value > max_value:
+            max_value = value
+
+    return ValueData.number_value(max_value)
+
+def UnUMinimo(*numbers: ValueData) -> ValueData:
+    min_value = sys.float_info.max
+    for number in numbers:
+        value = number.value
+        if number.type == ValueType.Array:
+            value = array_minimum(value)
+            if value is None:
+                continue
+
+        if value < min_value:
+            min_value = value
+
+    return ValueData.number_value(min_value)
+
+def UwUCima(value_data: ValueData) -> ValueData:
+    if value_data.type == ValueType.Array:
+        return ValueData.array_value(array_ceiling(value_data.value))
+
+    return ValueData.number_value(math.ceil(value_data.value))
+
+def UnUSuelo(value_data: ValueData) -> ValueData:
+    if value_data.type == ValueType.Array:
+        return ValueData.array_value(array_floor(value_data.value))
+
+    return ValueData.number_value(math.floor(value_data.value))
+
+# Arrays count as all of their elements
+def EwEMedia(*numbers: ValueData) -> ValueData:
+    values = []
+    count = 0
+    for number in numbers:
+        if number.type == ValueType.Array:
+            values.append(array_sum(number.value))
+            count += array_length(number.value)
+        else:
+            values.append(number.value)
+            count += 1
+
+    return ValueData.number_value(number_sum(values) / count)
+
+def TwTSuma(*numbers: ValueData) -> ValueData:
+    values = [array_sum(number.value) if number.type == ValueType.Array else number.value for number in numbers]
+    return ValueData.number_value(number_sum(values))
+
+def OwOLazo(value_data: ValueData) -> ValueData:
+    if value_data.value.lower() == value_data.value[::-1].lower():
+        return ValueData.boolean_value(True)
+    return ValueData.boolean_value(False)
+
+def UnUMezcla(first_value_data: ValueData, second_value_data: ValueData) -> ValueData:
+    if sorted(first_value_data.value.lower()) == sorted(second_value_data.value.lower()):
+        return ValueData.boolean_value(True)
+    return ValueData.boolean_value(False)
+
+def Array(*numbers: ValueData) -> ValueData:
+    return ValueData.array_value(create_array([number.value for number in numbers]))
+
+def UwURango(start: ValueData, end: ValueData) -> ValueData:
+    return ValueData.array_value(number_range(start.value, end.value))
+
+
+built_in_registry = BuiltInRegistry()
+
+for language_built_in in [
+    BuiltIn("UnUReversa",       UnUReversa,     [ValueType.Number, ValueType.String], 1),
+    BuiltIn("TwTPotencia",      TwTPotencia,    [ValueType.Number, ValueType.Array], 2),
+    BuiltIn("owoValorTotal",    owoValorTotal,  [ValueType.Number, ValueType.Array], 1),
+    BuiltIn("UwUMaximo",        UwUMaximo,      [ValueType.Number, ValueType.Array], None),
+    BuiltIn("UnUMinimo",        UnUMinimo,      [ValueType.Number, ValueType.Array], None),
+    BuiltIn("UwUCima",          UwUCima,        [ValueType.Number, ValueType.Array], 1),
+    BuiltIn("UnUSuelo",         UnUSuelo,       [ValueType.Number, ValueType.Array], 1),
+    BuiltIn("EwEMedia",         EwEMedia,       [ValueType.Number, ValueType.Array], None),
+    BuiltIn("TwTSuma",          TwTSuma,        [ValueType.Number, ValueType.Array], None),
+    BuiltIn("OwOLazo",          OwOLazo,        [ValueType.String], 1),
+    BuiltIn("UnUMezcla",        UnUMezcla,      [ValueType.String], 2),
+    BuiltIn("UwURango",         UwURango,       [ValueType.Number], 2),
+]:
+    built_in_registry.register(language_built_in)
+
+# Named after their Operator. "no" returns a bare bool, which evaluators never wrap in ValueData.
+built_in_registry.register(BuiltIn("Not", python_operator.not_, [ValueType.Boolean], 1), keyword = False)
+built_in_registry.register(BuiltIn("Array", Array, [ValueType.Number], None), keyword = False)
@@ -0,0 +1,376 @@
+import marshal
+from array import array
+
+from closure_compiler import binary_operators
+from evaluator import *
+from parser import *
+from resolver import is_local, is_pure_function, resolve_locals
+
+BYTECODE_VERSION = 5
+
+# Every instruction takes INSTRUCTION_WIDTH slots of the instruction array: the opcode followed by three
+# operands, most of them register numbers. Unused operands are 0.
+INSTRUCTION_WIDTH = 4
+
+OpCode = Enum("OpCode", """LoadConstant LoadVariable StoreVariable Negate Add Subtract Multiply Divide
+                           And Or DoubleEquals Greater Less GreaterEquals LessEquals CheckArgument Call
+                           PrintValue PrintNewline PushHandler PopHandler Jump BranchIfFalse Raise LoopIfFalse
+                           LoadLocal StoreLocal DefineFunction LoadFunction CallFunction Return""", start = 0)
+
+binary_operator_opcodes = {
+    Operator.Plus:          OpCode.Add,
+    Operator.Minus:         OpCode.Subtract,
+    Operator.Star:          OpCode.Multiply,
+    Operator.Slash:         OpCode.Divide,
+    Operator.And:           OpCode.And,
+    Operator.Or:            OpCode.Or,
+    Operator.DoubleEquals:  OpCode.DoubleEquals,
+    Operator.Greater:       OpCode.Greater,
+    Operator.Less:          OpCode.Less,
+    Operator.GreaterEquals: OpCode.GreaterEquals,
+    Operator.LessEquals:    OpCode.LessEquals,
+}
+
+
+# A function definition, as (name, parameter count, frame size, address of the body, pure), see
+# BytecodeCompiler.compile_function
+FunctionDefinition = tuple[str, int, int, int, bool]
+
+
+class BytecodeProgram:
+    def __init__(self, instructions: array, constants: list[ValueData], names: list[str],
+                 call_sites: list[tuple[str, int]], messages: list[str], register_count: int,
+                 functions: list[FunctionDefinition], function_call_sites: list[tuple[str, int]]):
+        self.instructions = instructions
+        self.constants = constants
+        self.names = names
+        self.call_sites = call_sites
+        self.messages = messages
+        self.register_count = register_count
+        self.functions = functions
+        self.function_call_sites = function_call_sites
+
+    def to_bytes(self) -> bytes:
+        constants = [serialize_constant(value_data) for value_data in self.constants]
+        return marshal.dumps((BYTECODE_VERSION, self.instructions.tobytes(), constants, self.names, self.call_sites,
+                              self.messages, self.register_count, self.functions, self.function_call_sites))
+
+    @staticmethod
+    def from_bytes(data: bytes):
+        version, instruction_bytes, constants, names, call_sites, messages, register_count, functions, \
+            function_call_sites = marshal.loads(data)
+        if version != BYTECODE_VERSION:
+            raise ValueError(f'Unsupported bytecode version {version}, expected {BYTECODE_VERSION}.')
+
+        instructions = array("i")
+        instructions.frombytes(instruction_bytes)
+        constants = [deserialize_constant(constant) for constant in constants]
+        return BytecodeProgram(instructions, constants, names, [tuple(call_site) for call_site in call_sites],
+                               messages, register_count,
+                               [tuple(function) for function in functions],
+                               [tuple(call_site) for call_site in function_call_sites])
+
+
+# Compiles Expression trees into a flat instruction array. Every expression is compiled into a destination
+# register, and its operands into the registers above it, so registers are reused like a stack across
+# statements. Errors that Evaluator only reports once the faulty expression runs (operand counts,
+# assignments to non identifiers) are compiled into Raise instructions so they keep happening at the same
+# point of execution.
+class BytecodeCompiler:
+    def __init__(self):
+        self.instructions = array("i")
+        self.constants: list[ValueData] = []
+        self.names: list[str] = []
+        self.call_sites: list[tuple[str, int]] = []
+        self.messages: list[str] = []
+        self.functions: list[FunctionDefinition] = []
+        self.function_call_sites: list[tuple[str, int]] = []
+        self.register_count = 1
+        self.next_register = 0
+        # Number of locals of the function being compiled, which are its first registers
+        self.local_count = 0
+        self.constant_indices: dict[tuple, int] = {}
+        self.name_indices: dict[str, int] = {}
+        self.message_indices: dict[str, int] = {}
+        self.nya_constant = self.add_constant(ValueData.nya_value())
+
+    def compile_program(self, expressions: Iterable[Expression]) -> BytecodeProgram:
+        for expression in expressions:
+            self.compile_statement(expression)
+
+        return self.program()
+
+    # Compiles one statement at a time, yielding the program compiled so far with the address of the statement's
+    # first instruction, so a statement can run before the next one is read
+    def compile_statements(self, expressions: Iterable[Expression]) -> Iterator[tuple[BytecodeProgram, int]]:
+        for expression in expressions:
+            address = len(self.instructions)
+            self.compile_statement(expression)
+            yield self.program(), address
+
+    # The program shares the compiler's lists, so later statements are added to it
+    def program(self) -> BytecodeProgram:
+        return BytecodeProgram(self.instructions, self.constants, self.names, self.call_sites, self.messages,
+                               self.register_count, self.functions, self.function_call_sites)
+
+    def compile_statement(self, expression: Expression):
+        destination = self.allocate_register()
+        self.compile(expression, destination)
+        self.next_register = destination
+
+    def compile(self, expression: Expression, destination: int):
+        match expression.type:
+            case ExpressionType.Nya:
+                self.emit(OpCode.LoadConstant, destination, self.nya_constant)
+
+            case ExpressionType.Boolean | ExpressionType.Number | ExpressionType.String:
+                constant_index = self.add_constant(ValueData(expression.value, ValueType[expression.type.name]))
+                self.emit(OpCode.LoadConstant, destination, constant_index)
+
+            case ExpressionType.Identifier if is_local(expression):
+                self.emit(OpCode.LoadLocal, destination, self.local_register(expression), self.add_name(expression.value))
+
+            case ExpressionType.Identifier:
+                self.emit(OpCode.LoadVariable, destination, self.add_name(expression.value))
+
+            case ExpressionType.Function:
+                self.compile_function(expression, destination)
+
+            case ExpressionType.Call:
+                self.compile_call(expression, destination)
+
+            case ExpressionType.If:
+                self.compile_if(expression, destination)
+
+            case ExpressionType.While:
+                self.compile_while(expression, destination)
+
+            case ExpressionType.Operation:
+                match expression.operator:
+                    case Operator.Group:
+                        self.compile(expression.operands[0], destination)
+
+                    case Operator.Print:
+                        self.compile_print(expression, destination)
+
+                    case Operator.Equals:
+                        self.compile_assignment(expression, destination)
+
+                    case Operator.Minus if len(expression.operands) == 1:
+                        self.compile(expression.operands[0], destination)
+                        self.emit(OpCode.Negate, destination, destination)
+
+                    case operator if operator in binary_operators:
+                        self.compile_binary_operation(expression, binary_operator_opcodes[operator], destination)
+
+                    case Operator.BuiltIn | Operator.Not | Operator.Array:
+                        self.compile_built_in(expression, destination)
+
+                    case _:
+                        # Operations without an evaluation rule produce no value, like in Evaluator
+                        self.emit(OpCode.LoadConstant, destination, self.add_constant(None))
+
+    def compile_assignment(self, expression: Expression, destination: int):
+        identifier_expression = expression.operands[0]
+        if identifier_expression.type != ExpressionType.Identifier:
+            self.emit_raise("Expected identifier for the left hand side of assignment expression.")
+            return
+
+        self.compile(expression.operands[1], destination)
+        if is_local(identifier_expression):
+            self.emit(OpCode.StoreLocal, destination, self.local_register(identifier_expression))
+        else:
+            self.emit(OpCode.StoreVariable, destination, self.add_name(identifier_expression.value))
+
+    def compile_binary_operation(self, expression: Expression, opcode: OpCode, destination: int):
+        operand_count = len(expression.operands)
+        if operand_count != 2:
+            self.emit_raise(f'Invalid number of operands for binary operation {expression.type}. Expected 2, got {operand_count}.')
+            return
+
+        self.compile(expression.operands[0], destination)
+        right_register = self.allocate_register()
+        self.compile(expression.operands[1], right_register)
+        self.emit(opcode, destination, destination, right_register)
+        self.next_register = right_register
+
+    # Call sites refer to built-ins by name, the VirtualMachine looks them up in built_in_registry
+    def compile_built_in(self, expression: Expression, destination: int):
+        name = built_in_name(expression)
+        expected_operand_count = built_in_registry.built_ins[name].parameter_count
+        operand_count = len(expression.operands)
+        if expected_operand_count is not None and operand_count != expected_operand_count:
+            self.emit_raise(f'Invalid number of arguments for {expression.type.name}. Expected {expected_operand_count}, got {operand_count}.')
+            return
+
+        call_site = len(self.call_sites)
+        self.call_sites.append((name, operand_count))
+
+        first_register = self.next_register
+        for operand in expression.operands:
+            operand_register = self.allocate_register()
+            self.compile(operand, operand_register)
+            self.emit(OpCode.CheckArgument, operand_register, call_site)
+
+        self.emit(OpCode.Call, destination, call_site, first_register)
+        self.next_register = first_register
+
+    def compile_if(self, expression: Expression, destination: int):
+        self.compile(expression.condition, destination)
+        branch_index = self.emit(OpCode.BranchIfFalse, destination)
+
+        self.emit(OpCode.LoadConstant, destination, self.nya_constant)
+        for body_expression in expression.if_body:
+            self.compile(body_expression, destination)
+
+        jump_index = self.emit(OpCode.Jump)
+        self.patch_target(branch_index, 2)
+        self.emit(OpCode.LoadConstant, destination, self.nya_constant)
+        for body_expression in (expression.else_body or []):
+            self.compile(body_expression, destination)
+
+        self.patch_target(jump_index, 1)
+
+    # The condition gets a register of its own, so destination keeps the value of the last body expression run.
+    # LoopIfFalse is BranchIfFalse with the error message of a loop condition.
+    def compile_while(self, expression: Expression, destination: int):
+        self.emit(OpCode.LoadConstant, destination, self.nya_constant)
+        condition_register = self.allocate_register()
+        condition_index = len(self.instructions)
+        self.compile(expression.condition, condition_register)
+        branch_index = self.emit(OpCode.LoopIfFalse, condition_register)
+
+        for body_expression in expression.if_body:
+            self.compile(body_expression, destination)
+
+        self.emit(OpCode.Jump, condition_index)
+        self.patch_target(branch_index, 2)
+        self.next_register = condition_register
+
+    # The body is compiled in place, behind a jump over it, with registers of its own: the locals of the
+    # function come first, so that a call's frame and registers are a single list, and its temporaries after
+    # them. Running the definition binds the name to the body's address.
+    def compile_function(self, expression: Expression, destination: int):
+        if expression.slot is None:
+            resolve_locals(expression)
+
+        jump_index = self.emit(OpCode.Jump)
+        body_address = len(self.instructions)
+        outer_registers = (self.next_register, self.register_count, self.local_count)
+        self.next_register = self.register_count = self.local_count = expression.slot
+        result_register = self.allocate_register()
+
+        self.emit(OpCode.LoadConstant, result_register, self.nya_constant)
+        for body_expression in expression.if_body:
+            self.compile(body_expression, result_register)
+
+        self.emit(OpCode.Return, result_register)
+        frame_size = self.register_count
+        self.next_register, self.register_count, self.local_count = outer_registers
+        self.patch_target(jump_index, 1)
+
+        function_index = len(self.functions)
+        self.functions.append((expression.value, len(expression.operands), frame_size, body_address, is_pure_function(expression)))
+        self.emit(OpCode.DefineFunction, function_index)
+        self.emit(OpCode.LoadConstant, destination, self.nya_constant)
+
+    # LoadFunction looks the function up and checks its arity before the arguments are evaluated, like
+    # Evaluator.process_call, and leaves it in destination for CallFunction
+    def compile_call(self, expression: Expression, destination: int):
+        call_site = len(self.function_call_sites)
+        self.function_call_sites.append((expression.value, len(expression.operands)))
+        self.emit(OpCode.LoadFunction, destination, call_site)
+
+        first_register = self.next_register
+        for argument in expression.operands:
+            self.compile(argument, self.allocate_register())
+
+        self.emit(OpCode.CallFunction, destination, first_register)
+        self.next_register = first_register
+
+    def local_register(self, identifier_expression: Expression) -> int:
+        return identifier_expression.slot + self.local_count
+
+    def compile_print(self, expression: Expression, destination: int):
+        # Errors in arguments stop the statement but are not fatal, matching Evaluator.process_print
+        handler_index = self.emit(OpCode.PushHandler)
+        for argument in expression.operands:
+            self.compile(argument, destination)
+            self.emit(OpCode.PrintValue, destination)
+
+        self.emit(OpCode.PrintNewline)
+        self.emit(OpCode.PopHandler)
+        self.patch_target(handler_index, 1)
+        self.emit(OpCode.LoadConstant, destination, self.nya_constant)
+
+    def emit(self, opcode: OpCode, first: int = 0, second: int = 0, third: int = 0) -> int:
+        instruction_index = len(self.instructions)
+        self.instructions.extend((opcode.value, first, second, third))
+        return instruction_index
+
+    def emit_raise(self, message: str):
+        message_index = self.message_indices.get(message)
+        if message_index is None:
+            message_index = self.message_indices[message] = len(self.messages)
+            self.messages.append(message)
+
+        self.emit(OpCode.Raise, message_index)
+
+    # Points the operand at offset of the instruction at instruction_index to the next instruction emitted
+    def patch_target(self, instruction_index: int, offset: int):
+        self.instructions[instruction_index + offset] = len(self.instructions)
+
+    def allocate_register(self) -> int:
+        register = self.next_register
+        self.next_register += 1
+        self.register_count = max(self.register_count, self.next_register)
+        return register
+
+    def add_constant(self, value_data: ValueData | None) -> int:
+        # repr keeps constants that compare equal apart, like 0.0 and -0.0
+        key = (type(value_data.value), repr(value_data.value), value_data.type) if value_data is not None else None
+        constant_index = self.constant_indices.get(key)
+        if constant_index is None:
+            constant_index = self.constant_indices[key] = len(self.constants)
+            self.constants.append(value_data)
+
+        return constant_index
+
+    def add_name(self, name: str) -> int:
+        name_index = self.name_indices.get(name)
+        if name_index is None:
+            name_index = self.name_indices[name] = len(self.names)
+            self.names.append(name)
+
+        return name_index
+
+
+def serialize_constant(value_data: ValueData | None) -> tuple | None:
+    if value_data is None:
+        return None
+    elif value_data.type == ValueType.Nya:
+        return (None, value_data.type.name)
+
+    return (value_data.value, value_data.type.name)
+
+
+def deserialize_constant(constant: tuple | None) -> ValueData | None:
+    if constant is None:
+        return None
+
+    value, type_name = constant
+    if type_name == ValueType.Nya.name:
+        return ValueData.nya_value()
+
+    return ValueData(value, ValueType[type_name])
+
+
+def disassemble(program: BytecodeProgram) -> str:
+    lines: list[str] = []
+    instructions = program.instructions
+    for index in range(0, len(instructions), INSTRUCTION_WIDTH):
+        opcode = OpCode(instructions[index])
+        operands = " ".join(str(operand) for operand in instructions[(index + 1):(index + INSTRUCTION_WIDTH)])
+        lines.append(f'{index:>6} {opcode.name:<14} {operands}')
+
+    return "\n".join(lines)
@@ -0,0 +1,484 @@
+from typing import Callable
+
+from evaluator import *
+from parser import *
+
+binary_operators = {
+    Operator.Plus:          (number_add, ValueType.Number),
+    Operator.Minus:         (number_subtract, ValueType.Number),
+    Operator.Slash:         (python_operator.truediv, ValueType.Number),
+    Operator.Star:          (number_multiply, ValueType.Number),
+    Operator.And:           (python_operator.and_, ValueType.Boolean),
+    Operator.Or:            (python_operator.or_, ValueType.Boolean),
+    Operator.DoubleEquals:  (python_operator.eq, ValueType.Boolean),
+    Operator.Greater:       (python_operator.gt, ValueType.Boolean),
+    Operator.Less:          (python_operator.lt, ValueType.Boolean),
+    Operator.GreaterEquals: (python_operator.ge, ValueType.Boolean),
+    Operator.LessEquals:    (python_operator.le, ValueType.Boolean),
+}
+
+CompiledExpression = Callable[[], ValueData]
+
+
+class ClosureEvaluationError(Exception):
+    def __init__(self, error: EvaluatorError):
+        super().__init__(error.message)
+        self.error = error
+
+
+# Turns each Expression tree into a tree of closures once. Operator dispatch, operand counts and constant
+# values are resolved while compiling, so running a closure only evaluates operands and applies the
+# operation. Closures return ValueData directly and raise ClosureEvaluationError instead of returning a
+# failed Result; the messages are the same ones Evaluator reports.
+class ClosureCompiler:
+    def __init__(self, evaluator: Evaluator):
+        self.evaluator = evaluator
+
+    def compile(self, expression: Expression) -> CompiledExpression:
+        match expression.type:
+            case ExpressionType.Boolean | ExpressionType.Number | ExpressionType.String | ExpressionType.Nya:
+                return self.compile_literal(expression)
+
+            case ExpressionType.Identifier:
+                return self.compile_identifier(expression)
+
+            case ExpressionType.If:
+                return self.compile_if(expression)
+
+            case ExpressionType.While:
+                return self.compile_while(expression)
+
+            case ExpressionType.Call:
+                return self.compile_call(expression)
+
+            case ExpressionType.Function:
+                return self.compile_function(expression)
+
+            case ExpressionType.Operation:
+                match expression.operator:
+                    case Operator.Group:
+                        return self.compile(expression.operands[0])
+
+                    case Operator.Print:
+                        return self.compile_print(expression)
+
+                    case Operator.Equals:
+                        return self.compile_assignment(expression)
+
+                    case Operator.Minus if len(expression.operands) == 1:
+                        return self.compile_negation(expression)
+
+                    case operator if operator in binary_operators:
+                        python_function, result_type = binary_operators[operator]
+                        return self.compile_binary_operation(expression, python_function, result_type)
+
+                    case Operator.BuiltIn | Operator.Not | Operator.Array:
+                        return self.compile_built_in(expression, built_in_registry.built_ins[built_in_name(expression)])
+
+        return self.compile_missing_operation(expression)
+
+    def compile_literal(self, expression: Expression) -> CompiledExpression:
+        if expression.type == ExpressionType.Nya:
+            return self.compile_constant(ValueData.nya_value())
+
+        return self.compile_constant(ValueData(expression.value, ValueType[expression.type.name]))
+
+    def compile_missing_operation(self, expression: Expression) -> CompiledExpression:
+        # Operations without an evaluation rule produce no value, like in Evaluator.process_expression
+        return lambda: None
+
+    @staticmethod
+    def compile_constant(value_data: ValueData) -> CompiledExpression:
+        return lambda: value_data
+
+    @staticmethod
+    def compile_error(message: str) -> CompiledExpression:
+        def error():
+            raise ClosureEvaluationError(EvaluatorError(message))
+
+        return error
+
+    def compile_identifier(self, expression: Expression) -> CompiledExpression:
+        variables = self.evaluator.variables
+        variable_name = expression.value
+        error_message = f'Variable {variable_name} is not defined.'
+
+        slot = expression.slot
+        if slot is not None and slot < 0:
+            evaluator = self.evaluator
+
+            def local_identifier():
+                value = evaluator.frame[slot]
+                if value is None:
+                    raise ClosureEvaluationError(EvaluatorError(error_message))
+
+                return value
+
+            return local_identifier
+
+        if slot is not None:
+            slots = self.evaluator.slots
+
+            def slot_identifier():
+                value = slots[slot]
+                if value is None:
+                    raise ClosureEvaluationError(EvaluatorError(error_message))
+
+                return value
+
+            return slot_identifier
+
+        def identifier():
+            value = variables.get(variable_name, None)
+            if value is None:
+                raise ClosureEvaluationError(EvaluatorError(error_message))
+
+            return value
+
+        return identifier
+
+    def compile_assignment(self, expression: Expression) -> CompiledExpression:
+        identifier_expression = expression.operands[0]
+        if identifier_expression.type != ExpressionType.Identifier:
+            return self.compile_error("Expected identifier for the left hand side of assignment expression.")
+
+        variables = self.evaluator.variables
+        variable_name = identifier_expression.value
+        value_expression = self.compile(expression.operands[1])
+
+        slot = identifier_expression.slot
+        if slot is not None and slot < 0:
+            evaluator = self.evaluator
+
+            def local_assignment():
+                value_data = value_expression()
+                evaluator.frame[slot] = value_data
+                return value_data
+
+            return local_assignment
+
+        if slot is not None:
+            slots = self.evaluator.slots
+
+            def slot_assignment():
+                value_data = value_expression()
+                slots[slot] = value_data
+                return value_data
+
+            return slot_assignment
+
+        def assignment():
+            value_data = value_expression()
+            variables[variable_name] = value_data
+            return value_data
+
+        return assignment
+
+    def compile_negation(self, expression: Expression) -> CompiledExpression:
+        operand_expression = self.compile(expression.operands[0])
+        number_type = ValueType.Number
+
+        def negation():
+            operand_value_data = operand_expression()
+            if operand_value_data.type != number_type:
+                raise ClosureEvaluationError(EvaluatorError("Can only negate numbers."))
+
+            return ValueData(- operand_value_data.value, number_type)
+
+        return negation
+
+    def compile_binary_operation(self, expression: Expression, operator, result_type: ValueType) -> CompiledExpression:
+        operand_count = len(expression.operands)
+        if operand_count != 2:
+            return self.compile_error(f'Invalid number of operands for binary operation {expression.type}. Expected 2, got {operand_count}.')
+
+        left_expression = self.compile(expression.operands[0])
+        right_expression = self.compile(expression.operands[1])
+        array_type = ValueType.Array
+
+        def binary_operation():
+            left_value_data = left_expression()
+            right_value_data = right_expression()
+            if left_value_data.type == array_type or right_value_data.type == array_type:
+                result = array_binary_operation(operator, left_value_data, right_value_data)
+                if not result.is_ok:
+                    raise ClosureEvaluationError(result.error)
+
+                return result.value
+            if left_value_data.type != right_value_data.type:
+                raise ClosureEvaluationError(EvaluatorError(f'Operand types do not match for binary operation. Got {left_value_data.type.name} and {right_value_data.type.name}.'))
+
+            return ValueData(operator(left_value_data.value, right_value_data.value), result_type)
+
+        return binary_operation
+
+    # The built-in is looked up once, when compiling its call site. Calls with a single argument, like most
+    # built-in calls, don't build an argument list.
+    def compile_built_in(self, expression: Expression, built_in: BuiltIn) -> CompiledExpression:
+        operand_count = len(expression.operands)
+        if built_in.parameter_count is not None and operand_count != built_in.parameter_count:
+            return self.compile_error(f'Invalid number of arguments for {expression.type.name}. Expected {built_in.parameter_count}, got {operand_count}.')
+
+        operand_expressions = [self.compile(operand) for operand in expression.operands]
+        built_in_function = built_in.function
+        expected_operand_types = built_in.parameter_types
+        nya_message = f'nya~~ value passed through 0th parameter to {expression.type.name} function.'
+        nya_type = ValueType.Nya
+
+        def argument_type_error(operand_value_data: ValueData) -> ClosureEvaluationError:
+            type_names_joined = " or ".join(expected_operand_types)
+            return ClosureEvaluationError(EvaluatorError(f'Invalid argument type for {expression.type.name} function. Expected {type_names_joined}, got {operand_value_data.type}.'))
+
+        if operand_count == 1:
+            operand_expression = operand_expressions[0]
+
+            def single_argument_built_in():
+                operand_value_data = operand_expression()
+                if operand_value_data.type == nya_type:
+                    raise ClosureEvaluationError(EvaluatorError(nya_message))
+                if operand_value_data.type not in expected_operand_types:
+                    raise argument_type_error(operand_value_data)
+
+                return built_in_function(operand_value_data)
+
+            return single_argument_built_in
+
+        def built_in_call():
+            operand_values_data: list[ValueData] = []
+            for operand_expression in operand_expressions:
+                operand_value_data = operand_expression()
+                if operand_value_data.type == nya_type:
+                    raise ClosureEvaluationError(EvaluatorError(nya_message))
+                if operand_value_data.type not in expected_operand_types:
+                    raise argument_type_error(operand_value_data)
+
+                operand_values_data.append(operand_value_data)
+
+            return built_in_function(*operand_values_data)
+
+        return built_in_call
+
+    def compile_if(self, expression: Expression) -> CompiledExpression:
+        condition_expression = self.compile(expression.condition)
+        if_body = [self.compile(body_expression) for body_expression in expression.if_body]
+        else_body = [self.compile(body_expression) for body_expression in expression.else_body] \
+            if expression.else_body is not None else []
+        boolean_type = ValueType.Boolean
+        nya_value_data = ValueData.nya_value()
+
+        def if_expression():
+            condition_value_data = condition_expression()
+            if condition_value_data.type != boolean_type:
+                raise ClosureEvaluationError(EvaluatorError(f'Invalid value type for if condition. Expected Boolean, got {condition_value_data.type.name}.'))
+
+            body_value_data = nya_value_data
+            for body_expression in (if_body if condition_value_data.value else else_body):
+                body_value_data = body_expression()
+
+            return body_value_data
+
+        return if_expression
+
+    # The condition and body are compiled once, so an iteration only calls their closures. Bodies of a single
+    # expression, the usual case, get a loop without the inner one.
+    def compile_while(self, expression: Expression) -> CompiledExpression:
+        condition_expression = self.compile(expression.condition)
+        body = [self.compile(body_expression) for body_expression in expression.if_body]
+        boolean_type = ValueType.Boolean
+        nya_value_data = ValueData.nya_value()
+
+        def condition_error(condition_value_data: ValueData):
+            return ClosureEvaluationError(EvaluatorError(f'Invalid value type for loop condition. Expected Boolean, got {condition_value_data.type.name}.'))
+
+        if len(body) == 1:
+            body_expression = body[0]
+
+            def single_expression_loop():
+                body_value_data = nya_value_data
+                while True:
+                    condition_value_data = condition_expression()
+                    if condition_value_data.type != boolean_type:
+                        raise condition_error(condition_value_data)
+                    if not condition_value_data.value:
+                        return body_value_data
+
+                    body_value_data = body_expression()
+
+            return single_expression_loop
+
+        def loop():
+            body_value_data = nya_value_data
+            while True:
+                condition_value_data = condition_expression()
+                if condition_value_data.type != boolean_type:
+                    raise condition_error(condition_value_data)
+                if not condition_value_data.value:
+                    return body_value_data
+
+                for body_expression in body:
+                    body_value_data = body_expression()
+
+        return loop
+
+    # The body is compiled once with the definition, and every time the definition runs it binds the name to a
+    # new UserFunction holding the compiled body
+    def compile_function(self, expression: Expression) -> CompiledExpression:
+        if expression.slot is None:
+            resolve_locals(expression)
+
+        body = [self.compile(body_expression) for body_expression in expression.if_body]
+        functions = self.evaluator.functions
+        memoization_size = self.evaluator.memoization_size
+        nya_value = self.compile_literal(Expression.create_nya())()
+
+        def function_definition():
+            functions[expression.value] = UserFunction.from_definition(expression, body, memoization_size)
+            return nya_value
+
+        return function_definition
+
+    # The key memoized calls remember the arguments under, see memo_key in evaluator.py. Subclasses that pass
+    # other kinds of values than ValueData override it, like UnboxedCompiler does.
+    argument_key = staticmethod(memo_key)
+
+    def compile_call(self, expression: Expression) -> CompiledExpression:
+        argument_expressions = [self.compile(argument) for argument in expression.operands]
+        argument_count = len(argument_expressions)
+        function_name = expression.value
+        functions = self.evaluator.functions
+        evaluator = self.evaluator
+        argument_key = self.argument_key
+
+        def call():
+            function = functions.get(function_name)
+            if function is None or function.parameter_count != argument_count:
+                raise ClosureEvaluationError(user_function_error_result(function, function_name, argument_count).error)
+
+            arguments = [argument_expression() for argument_expression in argument_expressions]
+            key = None
+            if function.memo is not None:
+                key = argument_key(arguments)
+                if key is not None and (value := function.recall(key)) is not None:
+                    return value
+
+            caller_frame = evaluator.frame
+            frame = evaluator.frame = function.take_frame(arguments)
+            try:
+                for body_expression in function.body:
+                    value = body_expression()
+            except RecursionError:
+                raise ClosureEvaluationError(recursion_error_result(function_name).error)
+            finally:
+                evaluator.frame = caller_frame
+                function.release_frame(frame)
+
+            if key is not None:
+                function.remember(key, value)
+
+            return value
+
+        return call
+
+    def compile_print(self, expression: Expression) -> CompiledExpression:
+        argument_expressions = [self.compile(argument) for argument in expression.operands]
+        line = self.evaluator.line
+        write_line = self.evaluator.write_line
+        boolean_type = ValueType.Boolean
+        array_type = ValueType.Array
+        nya_value_data = ValueData.nya_value()
+
+        def print_expression():
+            for argument_expression in argument_expressions:
+                # Errors in arguments stop the statement but are not fatal, matching Evaluator.process_print
+                try:
+                    value_data = argument_expression()
+                except ClosureEvaluationError:
+                    write_line("")
+                    return nya_value_data
+
+                value = value_data.value
+                if value_data.type == boolean_type:
+                    value = "chi" if value else "ño"
+                elif value_data.type == array_type:
+                    value = array_string(value)
+
+                line.append(str(value))
+
+            write_line("\n")
+            return nya_value_data
+
+        return print_expression
+
+
+class UnsupportedOperationError(Exception):
+    pass
+
+
+# Compiles the "mientras" loops that Evaluator runs, see Evaluator.process_while. Evaluator fails on an
+# operation without an evaluation rule as soon as anything touches its missing value, even a body
+# statement, which closures don't reproduce; loops containing one are not compiled. Functions stay
+# Evaluator's, defined and called through it, since their bodies are expressions there.
+class LoopCompiler(ClosureCompiler):
+    def compile_loop(self, expression: Expression) -> Callable[[], Result[ValueData, EvaluatorError]] | None:
+        try:
+            loop = self.compile_while(expression)
+        except UnsupportedOperationError:
+            return None
+
+        def compiled_loop():
+            try:
+                return Result(loop())
+            except ClosureEvaluationError as error:
+                return Result(error = error.error)
+
+        return compiled_loop
+
+    def compile_missing_operation(self, expression: Expression) -> CompiledExpression:
+        raise UnsupportedOperationError()
+
+    def compile_function(self, expression: Expression) -> CompiledExpression:
+        return self.compile_evaluator_expression(expression)
+
+    def compile_call(self, expression: Expression) -> CompiledExpression:
+        return self.compile_evaluator_expression(expression)
+
+    def compile_evaluator_expression(self, expression: Expression) -> CompiledExpression:
+        process_expression = self.evaluator.process_expression
+
+        def evaluator_expression():
+            result = process_expression(expression)
+            if not result.is_ok:
+                raise ClosureEvaluationError(result.error)
+
+            return result.value
+
+        return evaluator_expression
+
+
+class ClosureEvaluator(Evaluator):
+    def __init__(self, expressions: Iterable[Expression], output_destination, memoization_size: int = 0):
+        super().__init__(expressions, output_destination, memoization_size)
+        self.compiler = ClosureCompiler(self)
+        # Set by prepare. Without it, expressions are compiled as they are processed.
+        self.compiled_expressions: list[CompiledExpression] | None = None
+
+    def prepare(self):
+        self.compiled_expressions = [self.compiler.compile(expression) for expression in self.expressions]
+
+    def process(self):
+        if self.compiled_expressions is not None:
+            self.process_compiled(self.compiled_expressions)
+        else:
+            self.process_compiled(map(self.compiler.compile, self.expressions))
+
+    def process_compiled(self, compiled_expressions: Iterable[CompiledExpression]):
+        try:
+            for compiled_expression in compiled_expressions:
+                try:
+                    self.last_value = compiled_expression()
+                except ClosureEvaluationError as error:
+                    self.error = error.error
+                    print(f'FATAL ERROR: {error.error.message}', file = self.output_destination)
+                    return
+        finally:
+            self.write_line("")
@@ -0,0 +1,148 @@
+import queue
+from io import StringIO
+from typing import Iterable
+
+from evaluator import *
+from program_cache import ProgramCache
+from runner import Runner
+
+
+class ProgramError:
+    __slots__ = ("message",)
+
+    def __init__(self, message: str):
+        self.message = message
+
+
+# What a run of a Program gave back. Values are plain Python ones, see python_value. output is None when the
+# run wrote to an output destination of the caller.
+class Execution:
+    __slots__ = ("output", "value", "variables", "error")
+
+    def __init__(self, output: str | None, value, variables: dict[str, any], error: str | None):
+        self.output = output
+        # Value of the last top level expression, None if there is none or the program stopped on an error
+        self.value = value
+        self.variables = variables
+        self.error = error
+
+
+# Code parsed, optimized and resolved once, to be run any number of times by Interpreters. The expressions
+# are never modified after compile, so interpreters in different threads can share them.
+class Program:
+    def __init__(self, expressions: list[Expression], slot_names: dict[str, int], warnings: list[str],
+                 evaluator_class: type[Evaluator], memoization_size: int):
+        self.expressions = expressions
+        self.slot_names = slot_names
+        self.warnings = warnings
+        self.evaluator_class = evaluator_class
+        self.memoization_size = memoization_size
+
+    # Returns the tokenizer and parser errors, as Runner would print them, if the code can't be parsed
+    @staticmethod
+    def compile(code: str, evaluator_class: type[Evaluator] = Evaluator, optimization_level: int = 0,
+                memoization_size: int = 0, cache: ProgramCache | None = None) -> Result:
+        errors = StringIO()
+        runner = Runner(code, errors, evaluator_class = evaluator_class, cache = cache,
+                        optimization_level = optimization_level, memoization_size = memoization_size)
+        resolved_code = runner.resolve_code()
+        if resolved_code is None:
+            return Result(error = ProgramError(errors.getvalue()))
+
+        expressions, resolver = resolved_code
+        # The parser ends code that ends with a line break with a nya expression, which would otherwise be the
+        # value of every such program
+        if expressions and expressions[-1].type == ExpressionType.Nya and code.rstrip(" \t\r").endswith("\n"):
+            expressions = expressions[:-1]
+
+        warnings = [diagnostic.message for diagnostic in runner.diagnostics]
+        return Result(Program(expressions, dict(resolver.slot_names), warnings, evaluator_class, memoization_size))
+
+    def interpreter(self):
+        return Interpreter(self)
+
+    def pool(self, size: int):
+        return InterpreterPool(self, size)
+
+
+# An evaluator kept ready to run one Program: its slots are allocated and the program is compiled for its
+# backend once, when the interpreter is created. Every run starts over from no variables and no functions but
+# the inputs, so a run sees nothing of the previous ones. An Interpreter runs one program at a time; threads
+# share interpreters through an InterpreterPool.
+class Interpreter:
+    def __init__(self, program: Program):
+        self.program = program
+        self.evaluator = program.evaluator_class(program.expressions, None, program.memoization_size)
+        self.evaluator.allocate_slots(len(program.slot_names))
+        self.evaluator.prepare()
+
+    # Output is captured and returned unless an output destination is given. The global variables named by
+    # output_names are read back once the program has run.
+    def run(self, inputs: dict[str, any] | None = None, output_destination = None,
+            output_names: Iterable[str] = ()) -> Execution:
+        evaluator = self.evaluator
+        captured_output = StringIO() if output_destination is None else None
+        evaluator.reset(output_destination if output_destination is not None else captured_output)
+
+        slot_names = self.program.slot_names
+        if inputs is not None:
+            for name, value in inputs.items():
+                evaluator.assign_global(name, slot_names.get(name), input_value_data(value))
+
+        try:
+            evaluator.process()
+        finally:
+            # The output destination is the caller's, the interpreter must not write to it after returning
+            evaluator.output_destination = None
+
+        variables = {name: python_value(evaluator.global_value(name, slot_names.get(name))) for name in output_names}
+        error = evaluator.error.message if evaluator.error is not None else None
+        return Execution(captured_output.getvalue() if captured_output is not None else None,
+                         python_value(evaluator.value_data(evaluator.last_value)), variables, error)
+
+
+# Interpreters of one Program for concurrent runs. Each run borrows an idle interpreter and waits for one to be
+# returned when all of them are busy, so at most size runs happen at once. Interpreters are created up front,
+# and the most recently returned one is lent first since its memory is the most likely to still be cached.
+class InterpreterPool:
+    def __init__(self, program: Program, size: int):
+        self.program = program
+        self.idle_interpreters: queue.LifoQueue[Interpreter] = queue.LifoQueue()
+        for _ in range(size):
+            self.idle_interpreters.put(program.interpreter())
+
+    def run(self, inputs: dict[str, any] | None = None, output_destination = None,
+            output_names: Iterable[str] = ()) -> Execution:
+        interpreter = self.idle_interpreters.get()
+        try:
+            return interpreter.run(inputs, output_destination, output_names)
+        finally:
+            self.idle_interpreters.put(interpreter)
+
+
+# Input values are the plain ones register_native takes: numbers, strings, bools and None for nya, along with
+# lists of numbers for arrays
+def input_value_data(value) -> ValueData:
+    if value is None:
+        return ValueData.nya_value()
+    if isinstance(value, (list, tuple)):
+        return ValueData.array_value(create_array([number if type(number) is int else float(number) for number in value]))
+    if type(value) not in native_value_types:
+        raise TypeError(f'Unsupported input value of type {type(value).__name__}.')
+
+    return ValueData(value, native_value_types[type(value)])
+
+
+# Nya becomes None and arrays become lists of their numbers
+def python_value(value_data: ValueData | None):
+    if not isinstance(value_data, ValueData):
+        # Undefined variables, and the bare bool "no" gives
+        return value_data
+
+    match value_data.type:
+        case ValueType.Nya:
+            return None
+        case ValueType.Array:
+            return array_list(value_data.value)
+
+    return value_data.value
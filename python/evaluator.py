@@ -1,53 +1,168 @@
-import math
 import operator as python_operator
-import sys
+from collections import OrderedDict
 
+from arrays import *
+from built_ins import *
 from parser import *
+from resolver import is_pure_function, resolve_locals
 from result import *
+from values import *
 
-Nya = object()
 
-ValueType = Enum("ValueType", "Boolean Number Nya String")
+class EvaluatorError:
+    __slots__ = ("message",)
 
+    def __init__(self, message: str):
+        self.message = message
 
-class ValueData:
-    def __init__(self, value, type: ValueType):
-        self.value = value
-        self.type = type
 
+# A defined function as it is called by the evaluators. Calling it needs a frame for its locals, a list indexed
+# by their slots, see resolve_locals. Frames of returned calls are kept for the next calls instead of being
+# allocated again, so a call allocates nothing once the recursion depth has been reached before.
+class UserFunction:
+    __slots__ = ("name", "parameter_count", "body", "empty_frame", "free_frames", "memo", "memo_size")
+
+    # body is whatever the evaluator runs: expressions, compiled closures or a bytecode address. A
+    # memoization_size above 0 caches the results of that many argument lists, evicting the least recently used.
+    def __init__(self, name: str, parameter_count: int, frame_size: int, body, memoization_size: int = 0):
+        self.name = name
+        self.parameter_count = parameter_count
+        self.body = body
+        self.empty_frame = [None] * frame_size
+        self.free_frames: list[list] = []
+        self.memo: OrderedDict | None = OrderedDict() if memoization_size > 0 else None
+        self.memo_size = memoization_size
+
+    # Only pure functions get a memo, whatever memoization_size is
     @staticmethod
-    def boolean_value(value):
-        return ValueData(value, ValueType.Boolean)
+    def from_definition(definition: Expression, body, memoization_size: int = 0):
+        if definition.slot is None:
+            resolve_locals(definition)
+        if memoization_size > 0 and not is_pure_function(definition):
+            memoization_size = 0
 
-    @staticmethod
-    def number_value(value):
-        return ValueData(value, ValueType.Number)
+        return UserFunction(definition.value, len(definition.operands), definition.slot, body, memoization_size)
 
-    @staticmethod
-    def nya_value():
-        return ValueData(Nya, ValueType.Nya)
+    def take_frame(self, arguments: list) -> list:
+        frame = self.free_frames.pop() if self.free_frames else self.empty_frame.copy()
+        frame[:len(arguments)] = arguments
+        return frame
 
-    @staticmethod
-    def string_value(value):
-        return ValueData(value, ValueType.String)
+    def release_frame(self, frame: list):
+        frame[:] = self.empty_frame
+        self.free_frames.append(frame)
 
+    def recall(self, key: tuple):
+        value = self.memo.get(key)
+        if value is not None:
+            self.memo.move_to_end(key)
+
+        return value
+
+    def remember(self, key: tuple, value):
+        self.memo[key] = value
+        if len(self.memo) > self.memo_size:
+            self.memo.popitem(last = False)
+
+
+# Memo key of the arguments of a call, None if they can't be used as one. Types are part of the key because
+# equal values of different types, like the string "1" returned by "+" and 1 or 1.0, behave differently.
+def memo_key(arguments: list[ValueData]) -> tuple | None:
+    key = []
+    for argument in arguments:
+        value = argument.value
+        value_type = type(value)
+        if argument.type == ValueType.Array:
+            return None
+        if value_type is float and value == 0:
+            # 0.0 and -0.0 are equal but print differently
+            value = str(value)
+
+        key += (argument.type, value_type, value)
+
+    return tuple(key)
+
+
+def user_function_error_result(function: UserFunction | None, name: str, argument_count: int) -> Result[any, EvaluatorError] | None:
+    if function is None:
+        return evaluator_error_result(f'Function {name} is not defined.')
+    if argument_count != function.parameter_count:
+        return evaluator_error_result(f'Invalid number of arguments for {name}. Expected {function.parameter_count}, got {argument_count}.')
+
+    return None
 
-class EvaluatorError:
-    def __init__(self, message: str):
-        self.message = message
 
 class Evaluator:
-    def __init__(self, expressions: list[Expression], output_destination):
+    def __init__(self, expressions: list[Expression], output_destination, memoization_size: int = 0):
         self.expressions = expressions
         self.variables: dict[str, ValueData] = {}
+        self.slots: list[ValueData | None] = []
+        self.functions: dict[str, UserFunction] = {}
+        # Frame of the function call being evaluated, see UserFunction
+        self.frame: list[ValueData | None] | None = None
+        self.memoization_size = memoization_size
         self.output_destination = output_destination
+        # Text of the print statement being evaluated, see write_line
+        self.line: list[str] = []
+        # See process_while
+        self.compiled_loops: dict[Expression, any] = {}
+        # Value of the last top level expression and error that stopped the program, set by process
+        self.last_value = None
+        self.error: EvaluatorError | None = None
+
+    # Makes room for the variables of resolved expressions, see Resolver
+    def allocate_slots(self, slot_count: int):
+        if slot_count > len(self.slots):
+            self.slots.extend([None] * (slot_count - len(self.slots)))
+
+    # Does the work that doesn't depend on the values of variables, like compiling, ahead of the first process
+    # call, so that processing the same expressions again only evaluates them. See Interpreter.
+    def prepare(self):
+        self.expressions = list(self.expressions)
+
+    # Forgets everything a previous process call left behind, but keeps what prepare did. Compiled code holds
+    # on to the lists and dictionaries of the evaluator, so they are emptied instead of replaced.
+    def reset(self, output_destination):
+        self.output_destination = output_destination
+        self.variables.clear()
+        self.slots[:] = [None] * len(self.slots)
+        self.functions.clear()
+        self.frame = None
+        self.line.clear()
+        self.last_value = None
+        self.error = None
+
+    # Sets a global variable before the expressions are processed. The slot is the one the Resolver gave the
+    # name, None if the expressions never use it.
+    def assign_global(self, name: str, slot: int | None, value_data: ValueData):
+        if slot is None:
+            self.variables[name] = value_data
+        else:
+            self.slots[slot] = value_data
+
+    def global_value(self, name: str, slot: int | None) -> ValueData | None:
+        if slot is None:
+            return self.variables.get(name, None)
+
+        return self.slots[slot]
+
+    # Evaluators that don't keep values as ValueData convert them here, see last_value
+    def value_data(self, value) -> ValueData | None:
+        return value
 
     def process(self):
-        for expression in self.expressions:
-            result = self.process_expression(expression)
-            if not result.is_ok:
-                print(f'FATAL ERROR: {result.error.message}', file = self.output_destination)
-                return
+        try:
+            for expression in self.expressions:
+                result = self.process_expression(expression)
+                if not result.is_ok:
+                    self.error = result.error
+                    print(f'FATAL ERROR: {result.error.message}', file = self.output_destination)
+                    return
+
+                self.last_value = result.value
+        finally:
+            # Text of a print statement interrupted by a Python exception is still written
+            self.write_line("")
 
     def process_expression(self, expression: Expression) -> Result[ValueData, EvaluatorError]:
         result: Result[ValueData, EvaluatorError] = None
@@ -59,7 +174,14 @@ class Evaluator:
                 result = Result(ValueData(expression.value, ValueType[expression.type.name]))
 
             case ExpressionType.Identifier:
-                value = self.variables.get(expression.value, None)
+                slot = expression.slot
+                if slot is None:
+                    value = self.variables.get(expression.value, None)
+                elif slot >= 0:
+                    value = self.slots[slot]
+                else:
+                    value = self.frame[slot]
+
                 if value is None:
                     return evaluator_error_result(f'Variable {expression.value} is not defined.')
 
@@ -68,6 +190,16 @@ class Evaluator:
             case ExpressionType.If:
                 result = self.process_if(expression)
 
+            case ExpressionType.While:
+                result = self.process_while(expression)
+
+            case ExpressionType.Call:
+                result = self.process_call(expression)
+
+            case ExpressionType.Function:
+                self.functions[expression.value] = UserFunction.from_definition(expression, expression.if_body, self.memoization_size)
+                result = Result(ValueData.nya_value())
+
             case ExpressionType.Operation:
                 match expression.operator:
                     case Operator.Group:
@@ -93,16 +225,16 @@ class Evaluator:
                             result = Result(ValueData.number_value(- operand_value_data.value))
 
                         else:
-                            result = self.process_binary_operation(expression, python_operator.sub, ValueData.number_value)
+                            result = self.process_binary_operation(expression, number_subtract, ValueData.number_value)
 
                     case Operator.Plus:
-                        result = self.process_binary_operation(expression, python_operator.add, ValueData.number_value)
+                        result = self.process_binary_operation(expression, number_add, ValueData.number_value)
 
                     case Operator.Slash:
                         result = self.process_binary_operation(expression, python_operator.truediv, ValueData.number_value)
 
                     case Operator.Star:
-                        result = self.process_binary_operation(expression, python_operator.mul, ValueData.number_value)
+                        result = self.process_binary_operation(expression, number_multiply, ValueData.number_value)
 
                     case Operator.And:
                         result = self.process_binary_operation(expression, python_operator.and_, ValueData.boolean_value)
@@ -110,11 +242,6 @@ class Evaluator:
                     case Operator.Or:
                         result = self.process_binary_operation(expression, python_operator.or_, ValueData.boolean_value)
 
-                    case Operator.Not:
-                        result = self.process_n_ary_operation(expression,
-                                                              [ValueType.Boolean],
-                                                              1, python_operator.not_)
-
                     case Operator.DoubleEquals:
                         result = self.process_binary_operation(expression, python_operator.eq, ValueData.boolean_value)
 
@@ -130,60 +257,8 @@ class Evaluator:
                     case Operator.LessEquals:
                         result = self.process_binary_operation(expression, python_operator.le, ValueData.boolean_value)
 
-                    case Operator.UnUReversa:
-                        result = self.process_n_ary_operation(expression,
-                                                              [ValueType.Number, ValueType.String],
-                                                              1, UnUReversa)
-
-                    case Operator.TwTPotencia:
-                        result = self.process_n_ary_operation(expression,
-                                                              [ValueType.Number],
-                                                              2, TwTPotencia)
-
-                    case Operator.owoValorTotal:
-                        result = self.process_n_ary_operation(expression,
-                                                              [ValueType.Number],
-                                                              1, owoValorTotal)
-
-                    case Operator.UwUMaximo:
-                        result = self.process_n_ary_operation(expression,
-                                                              [ValueType.Number],
-                                                              None, UwUMaximo)
-
-                    case Operator.UnUMinimo:
-                        result = self.process_n_ary_operation(expression,
-                                                              [ValueType.Number],
-                                                              None, UnUMinimo)
-
-                    case Operator.UwUCima:
-                        result = self.process_n_ary_operation(expression,
-                                                              [ValueType.Number],
-                                                              1, UwUCima)
-
-                    case Operator.UnUSuelo:
-                        result = self.process_n_ary_operation(expression,
-                                                              [ValueType.Number],
-                                                              1, UnUSuelo)
-
-                    case Operator.EwEMedia:
-                        result = self.process_n_ary_operation(expression,
-                                                              [ValueType.Number],
-                                                              None, EwEMedia)
-
-                    case Operator.TwTSuma:
-                        result = self.process_n_ary_operation(expression,
-                                                              [ValueType.Number],
-                                                              None, TwTSuma)
-
-                    case Operator.OwOLazo:
-                        result = self.process_n_ary_operation(expression,
-                                                              [ValueType.String],
-                                                              1, OwOLazo)
-
-                    case Operator.UnUMezcla:
-                        result = self.process_n_ary_operation(expression,
-                                                              [ValueType.String],
-                                                              2, UnUMezcla)
+                    case Operator.BuiltIn | Operator.Not | Operator.Array:
+                        result = self.process_built_in(expression, built_in_registry.built_ins[built_in_name(expression)])
 
 
         return result
@@ -201,7 +276,13 @@ class Evaluator:
         variable_name = expression.operands[0].value
         value_data = actual_value_result.value
 
-        self.variables[variable_name] = value_data
+        slot = identifier_expression.slot
+        if slot is None:
+            self.variables[variable_name] = value_data
+        elif slot >= 0:
+            self.slots[slot] = value_data
+        else:
+            self.frame[slot] = value_data
         return actual_value_result
 
     def process_binary_operation(self, expression: Expression, operator, value_data_constructor) -> Result[ValueData, EvaluatorError]:
@@ -223,16 +304,18 @@ class Evaluator:
 
         left_value_data = left_expression_value_result.value
         right_value_data = right_expression_value_result.value
+        if left_value_data.type == ValueType.Array or right_value_data.type == ValueType.Array:
+            return array_binary_operation(operator, left_value_data, right_value_data)
         if left_value_data.type != right_value_data.type:
             return evaluator_error_result(f'Operand types do not match for binary operation. Got {left_value_data.type.name} and {right_value_data.type.name}.')
 
         return Result(value_data_constructor(operator(left_value_data.value, right_value_data.value)))
 
-    def process_n_ary_operation(self, expression: Expression, expected_operand_types: list[ValueType],
-                                expected_operand_count: int | None, built_in_function) -> Result[ValueData, EvaluatorError]:
+    def process_built_in(self, expression: Expression, built_in: BuiltIn) -> Result[ValueData, EvaluatorError]:
         operand_count = len(expression.operands)
-        if expected_operand_count is not None and operand_count != expected_operand_count:
-            return evaluator_error_result(f'Invalid number of arguments for {expression.type.name}. Expected {expected_operand_count}, got {operand_count}.')
+        expected_operand_types = built_in.parameter_types
+        if built_in.parameter_count is not None and operand_count != built_in.parameter_count:
+            return evaluator_error_result(f'Invalid number of arguments for {expression.type.name}. Expected {built_in.parameter_count}, got {operand_count}.')
 
         index = 0
         operand_values_data: list[ValueData] = []
@@ -250,7 +333,7 @@ class Evaluator:
 
             operand_values_data.append(operand_value_result.value)
 
-        return Result(built_in_function(*operand_values_data))
+        return Result(built_in.function(*operand_values_data))
 
     def process_if(self, expression: Expression) -> Result[ValueData, EvaluatorError]:
         condition_result = self.process_expression(expression.condition)
@@ -277,100 +360,138 @@ class Evaluator:
 
         return body_expression_result
 
-    def process_print(self, expression: Expression) -> Result[ValueData, EvaluatorError]:
-        for argument in expression.operands:
-            argument_value_result = self.process_expression(argument)
-            if not argument_value_result.is_ok:
-                return argument_value_result
-
-            value_data = argument_value_result.value
-            value = value_data.value
-            if value_data.type == ValueType.Boolean:
-                value = "chi" if value else "ño"
-
-            print(value, end = "", file = self.output_destination)
-
-        print(file = self.output_destination)
-        return Result(ValueData.nya_value())
+    # Functions are looked up when they are called, so a function body may call functions defined after it, as
+    # long as they are defined by the time the call runs. The value of a call is the value of the last expression
+    # of the body.
+    def process_call(self, expression: Expression) -> Result[ValueData, EvaluatorError]:
+        function = self.functions.get(expression.value)
+        error_result = user_function_error_result(function, expression.value, len(expression.operands))
+        if error_result is not None:
+            return error_result
 
+        arguments: list[ValueData] = []
+        for argument in expression.operands:
+            argument_result = self.process_expression(argument)
+            if not argument_result.is_ok:
+                return argument_result
+
+            arguments.append(argument_result.value)
+
+        key = None
+        if function.memo is not None:
+            key = memo_key(arguments)
+            if key is not None and (value_data := function.recall(key)) is not None:
+                return Result(value_data)
+
+        caller_frame = self.frame
+        frame = self.frame = function.take_frame(arguments)
+        try:
+            for body_expression in function.body:
+                body_expression_result = self.process_expression(body_expression)
+                if not body_expression_result.is_ok:
+                    return body_expression_result
+        except RecursionError:
+            # Calls nest on the Python stack; IterativeEvaluator and BytecodeEvaluator have no such limit
+            return recursion_error_result(expression.value)
+        finally:
+            self.frame = caller_frame
+            function.release_frame(frame)
+
+        if key is not None:
+            function.remember(key, body_expression_result.value)
 
-def evaluator_error_result(message: str) -> Result[any, EvaluatorError]:
-    return Result(error = EvaluatorError(message))
+        return body_expression_result
 
+    # A loop is compiled into closures the first time it runs, see LoopCompiler, so its iterations neither
+    # dispatch on expression types again nor look up variables, value types or methods. Loops the closures
+    # can't run exactly like process_loop are left to it.
+    def process_while(self, expression: Expression) -> Result[ValueData, EvaluatorError]:
+        if expression not in self.compiled_loops:
+            from closure_compiler import LoopCompiler
+            self.compiled_loops[expression] = LoopCompiler(self).compile_loop(expression)
 
-def UnUReversa(value_data: ValueData) -> ValueData:
-    actual_value = value_data.value
-    if value_data.type == ValueType.Number:
-        return ValueData.number_value(UnUReversa_number(actual_value))
-    elif value_data.type == ValueType.String:
-        return ValueData.string_value(UnUReversa_string(actual_value))
+        compiled_loop = self.compiled_loops[expression]
+        if compiled_loop is not None:
+            return compiled_loop()
 
-    raise RuntimeError("Invalid value type for UnUReversa function.")
+        return self.process_loop(expression)
 
+    def process_loop(self, expression: Expression) -> Result[ValueData, EvaluatorError]:
+        condition = expression.condition
+        body = expression.if_body
+        process_expression = self.process_expression
+        boolean_type = ValueType.Boolean
 
-def UnUReversa_string(value: str) -> str:
-    return value[::-1]
+        body_expression_result = Result(ValueData.nya_value())
+        while True:
+            condition_result = process_expression(condition)
+            if not condition_result.is_ok:
+                return condition_result
 
+            condition_value_data = condition_result.value
+            if condition_value_data.type != boolean_type:
+                return evaluator_error_result(f'Invalid value type for loop condition. Expected Boolean, got {condition_value_data.type.name}.')
 
-def UnUReversa_number(value: float) -> float:
-    reverse_number = 0
-    while value > 0:
-        digit = value % 10
-        reverse_number = reverse_number * 10 + digit
-        value //= 10
+            if not condition_value_data.value:
+                return body_expression_result
 
-    return reverse_number
+            for body_expression in body:
+                body_expression_result = process_expression(body_expression)
+                if not body_expression_result.is_ok:
+                    return body_expression_result
 
-def TwTPotencia(value_number: ValueData, value_power: ValueData) -> ValueData:
-    actual_value_number = value_number.value
-    actual_value_power = value_power.value
-    return ValueData.number_value(actual_value_number ** actual_value_power)
+    def process_print(self, expression: Expression) -> Result[ValueData, EvaluatorError]:
+        line = self.line
+        for argument in expression.operands:
+            argument_value_result = self.process_expression(argument)
+            if not argument_value_result.is_ok:
+                # The arguments printed so far are still written, without ending the line
+                self.write_line("")
+                return argument_value_result
 
-def owoValorTotal(value_data: ValueData) -> ValueData:
-    return ValueData.number_value(abs(value_data.value))
+            value_data = argument_value_result.value
+            value = value_data.value
+            if value_data.type == ValueType.Boolean:
+                value = "chi" if value else "ño"
+            elif value_data.type == ValueType.Array:
+                value = array_string(value)
 
-def UwUMaximo(*numbers: ValueData) -> ValueData:
-    max_value = 0
-    for number in numbers:
-        if number.value > max_value:
-            max_value = number.value
+            line.append(str(value))
 
-    return ValueData.number_value(max_value)
+        self.write_line("\n")
+        return Result(ValueData.nya_value())
 
-def UnUMinimo(*numbers: ValueData) -> ValueData:
-    min_value = sys.float_info.max
-    for number in numbers:
-        if number.value < min_value:
-            min_value = number.value
+    # Print statements collect their text in self.line and write it with a single call. A print statement
+    # nested in the arguments of another one adds to the same list, so text keeps its original order.
+    def write_line(self, end: str):
+        if self.line or end:
+            self.output_destination.write("".join(self.line) + end)
+            self.line.clear()
 
-    return ValueData.number_value(min_value)
 
-def UwUCima(value_data: ValueData) -> ValueData:
-    return ValueData.number_value(math.ceil(value_data.value))
+def evaluator_error_result(message: str) -> Result[any, EvaluatorError]:
+    return Result(error = EvaluatorError(message))
 
-def UnUSuelo(value_data: ValueData) -> ValueData:
-    return ValueData.number_value(math.floor(value_data.value))
 
-def EwEMedia(*numbers: ValueData) -> ValueData:
-    total = 0
-    for number in numbers:
-        total += number.value
+# A recursion deeper than the Python stack allows is reported from the call that ran into the limit. Building
+# the error there can run into it again, in which case a call further out reports it instead.
+def recursion_error_result(name: str) -> Result[any, EvaluatorError]:
+    return evaluator_error_result(f'Maximum recursion depth exceeded in {name}.')
 
-    return ValueData.number_value(total / len(numbers))
 
-def TwTSuma(*numbers: ValueData) -> ValueData:
-    total = 0
-    for number in numbers:
-        total += number.value
+# Arithmetic and comparisons between an array and a number, or two arrays of the same length, apply to every
+# element
+def array_binary_operation(operator, left_value_data: ValueData, right_value_data: ValueData) -> Result[ValueData, EvaluatorError]:
+    for value_data in (left_value_data, right_value_data):
+        if value_data.type != ValueType.Array and value_data.type != ValueType.Number:
+            return evaluator_error_result(f'Operand types do not match for binary operation. Got {left_value_data.type.name} and {right_value_data.type.name}.')
 
-    return ValueData.number_value(total)
+    if operator not in elementwise_operators:
+        return evaluator_error_result(f'Invalid operand type for binary operation. Got {left_value_data.type.name} and {right_value_data.type.name}.')
 
-def OwOLazo(value_data: ValueData) -> ValueData:
-    if value_data.value.lower() == value_data.value[::-1].lower():
-        return ValueData.boolean_value(True)
-    return ValueData.boolean_value(False)
+    left_value = left_value_data.value
+    right_value = right_value_data.value
+    if left_value_data.type == right_value_data.type and array_length(left_value) != array_length(right_value):
+        return evaluator_error_result(f'Array lengths do not match for binary operation. Got {array_length(left_value)} and {array_length(right_value)}.')
 
-def UnUMezcla(first_value_data: ValueData, second_value_data: ValueData) -> ValueData:
-    if sorted(first_value_data.value.lower()) == sorted(second_value_data.value.lower()):
-        return ValueData.boolean_value(True)
-    return ValueData.boolean_value(False)
\ No newline at end of file
+    return Result(ValueData.array_value(elementwise(operator, left_value, right_value)))
@@ -0,0 +1,351 @@
+from typing import Generator
+
+from closure_compiler import binary_operators
+from evaluator import *
+from parser import *
+
+EvaluationStep = Enum("EvaluationStep", """Evaluate Negate BinaryOperation CheckArgument CallBuiltIn Assign
+                                            Condition Body LoopCondition LoopBody CallFunction Return PrintArgument
+                                            PrintValue""", start = 0)
+
+EVALUATE            = EvaluationStep.Evaluate.value
+NEGATE              = EvaluationStep.Negate.value
+BINARY_OPERATION    = EvaluationStep.BinaryOperation.value
+CHECK_ARGUMENT      = EvaluationStep.CheckArgument.value
+CALL_BUILT_IN       = EvaluationStep.CallBuiltIn.value
+ASSIGN              = EvaluationStep.Assign.value
+CONDITION           = EvaluationStep.Condition.value
+BODY                = EvaluationStep.Body.value
+LOOP_CONDITION      = EvaluationStep.LoopCondition.value
+LOOP_BODY           = EvaluationStep.LoopBody.value
+CALL_FUNCTION       = EvaluationStep.CallFunction.value
+RETURN              = EvaluationStep.Return.value
+PRINT_ARGUMENT      = EvaluationStep.PrintArgument.value
+PRINT_VALUE         = EvaluationStep.PrintValue.value
+
+
+# Evaluates Expression trees like Evaluator, but without recursion: the work still to do is kept on an explicit
+# stack of (step, expression, data) entries, and operand values on a separate value stack, so how deeply an
+# expression nests has no effect on the Python stack.
+# Evaluator checks the result of every operand as soon as it has been evaluated and returns failed results
+# unchanged up to the closest print statement, which swallows them, or to process. Here a failed result
+# unwinds the work stack the same way, so the same operands are evaluated, in the same order, with the same
+# output and errors.
+class IterativeEvaluator(Evaluator):
+    def __init__(self, expressions: list[Expression], output_destination, memoization_size: int = 0):
+        super().__init__(expressions, output_destination, memoization_size)
+        # Nodes left to evaluate before the next suspension and nodes between suspensions, see evaluation_steps
+        self.countdown = 0
+        self.yield_interval = 0
+
+    # Processes the expressions like process, as a generator that suspends where evaluation_steps does
+    def process_steps(self, yield_interval: int) -> Generator[None, None, None]:
+        self.countdown = self.yield_interval = yield_interval
+        try:
+            for expression in self.expressions:
+                frame = self.frame
+                try:
+                    result = yield from self.evaluation_steps(expression)
+                finally:
+                    self.frame = frame
+
+                if not result.is_ok:
+                    self.error = result.error
+                    print(f'FATAL ERROR: {result.error.message}', file = self.output_destination)
+                    return
+
+                self.last_value = result.value
+        finally:
+            self.write_line("")
+
+    # Calls made by the expression replace self.frame until they return, see evaluate
+    def process_expression(self, expression: Expression) -> Result[ValueData, EvaluatorError]:
+        frame = self.frame
+        try:
+            return self.evaluate(expression)
+        finally:
+            self.frame = frame
+
+    def evaluate(self, expression: Expression) -> Result[ValueData, EvaluatorError]:
+        self.countdown = 0
+        try:
+            next(self.evaluation_steps(expression))
+        except StopIteration as stop:
+            return stop.value
+
+    # Evaluates the expression as a generator that returns its result. It suspends before evaluating every
+    # yield_interval-th node, counting on from where the previous expression left the countdown, so a caller can
+    # do other work in the middle of a long running program, see AsyncRunner. The countdown of a plain evaluate
+    # starts at zero and never gets back to it.
+    def evaluation_steps(self, expression: Expression) -> Generator[None, None, Result[ValueData, EvaluatorError]]:
+        work: list[tuple] = [(EVALUATE, expression, None)]
+        values: list = []
+        slots = self.slots
+        variables = self.variables
+        built_ins = built_in_registry.built_ins
+        line = self.line
+        countdown = self.countdown
+
+        while work:
+            step, expression, data = work.pop()
+
+            if step == EVALUATE:
+                countdown -= 1
+                if countdown == 0:
+                    self.countdown = 0
+                    yield
+                    countdown = self.countdown = self.yield_interval
+
+                expression_type = expression.type
+                if expression_type == ExpressionType.Operation:
+                    operator = expression.operator
+                    operands = expression.operands
+
+                    if operator in binary_operators and (operator != Operator.Minus or len(operands) != 1):
+                        operand_count = len(operands)
+                        if operand_count != 2:
+                            result = evaluator_error_result(f'Invalid number of operands for binary operation {expression.type}. Expected 2, got {operand_count}.')
+                        else:
+                            work.append((BINARY_OPERATION, expression, binary_operators[operator]))
+                            work.append((EVALUATE, operands[1], None))
+                            work.append((EVALUATE, operands[0], None))
+                            continue
+
+                    elif operator in built_in_operators:
+                        built_in = built_ins[built_in_name(expression)]
+                        operand_count = len(operands)
+                        if built_in.parameter_count is not None and operand_count != built_in.parameter_count:
+                            result = evaluator_error_result(f'Invalid number of arguments for {expression.type.name}. Expected {built_in.parameter_count}, got {operand_count}.')
+                        else:
+                            work.append((CALL_BUILT_IN, expression, (built_in.function, operand_count)))
+                            for operand in reversed(operands):
+                                work.append((CHECK_ARGUMENT, expression, built_in.parameter_types))
+                                work.append((EVALUATE, operand, None))
+
+                            continue
+
+                    elif operator == Operator.Group:
+                        # The result of the operand is the result of the group, it is checked by whoever uses it
+                        work.append((EVALUATE, operands[0], None))
+                        continue
+
+                    elif operator == Operator.Minus:
+                        work.append((NEGATE, expression, None))
+                        work.append((EVALUATE, operands[0], None))
+                        continue
+
+                    elif operator == Operator.Equals:
+                        if operands[0].type != ExpressionType.Identifier:
+                            result = evaluator_error_result("Expected identifier for the left hand side of assignment expression.")
+                        else:
+                            work.append((ASSIGN, operands[0], None))
+                            work.append((EVALUATE, operands[1], None))
+                            continue
+
+                    elif operator == Operator.Print:
+                        work.append((PRINT_ARGUMENT, expression, 0))
+                        continue
+
+                    else:
+                        # Like Evaluator, there is no rule for Bang
+                        result = None
+
+                elif expression_type == ExpressionType.Identifier:
+                    slot = expression.slot
+                    if slot is None:
+                        value = variables.get(expression.value, None)
+                    elif slot >= 0:
+                        value = slots[slot]
+                    else:
+                        value = self.frame[slot]
+
+                    if value is None:
+                        result = evaluator_error_result(f'Variable {expression.value} is not defined.')
+                    else:
+                        result = Result(value)
+
+                elif expression_type == ExpressionType.If:
+                    work.append((CONDITION, expression, None))
+                    work.append((EVALUATE, expression.condition, None))
+                    continue
+
+                elif expression_type == ExpressionType.While:
+                    work.append((LOOP_CONDITION, expression, None))
+                    work.append((EVALUATE, expression.condition, None))
+                    continue
+
+                elif expression_type == ExpressionType.Call:
+                    function = self.functions.get(expression.value)
+                    result = user_function_error_result(function, expression.value, len(expression.operands))
+                    if result is None:
+                        work.append((CALL_FUNCTION, expression, function))
+                        for operand in reversed(expression.operands):
+                            work.append((EVALUATE, operand, None))
+
+                        continue
+
+                elif expression_type == ExpressionType.Function:
+                    self.functions[expression.value] = UserFunction.from_definition(expression, expression.if_body, self.memoization_size)
+                    result = Result(ValueData.nya_value())
+
+                elif expression_type == ExpressionType.Nya:
+                    result = Result(ValueData.nya_value())
+
+                else:
+                    result = Result(ValueData(expression.value, ValueType[expression_type.name]))
+
+            elif step == BINARY_OPERATION:
+                right_value_data = values.pop()
+                left_value_data = values.pop()
+                if left_value_data.type == ValueType.Array or right_value_data.type == ValueType.Array:
+                    result = array_binary_operation(data[0], left_value_data, right_value_data)
+                elif left_value_data.type != right_value_data.type:
+                    result = evaluator_error_result(f'Operand types do not match for binary operation. Got {left_value_data.type.name} and {right_value_data.type.name}.')
+                else:
+                    operator, result_type = data
+                    result = Result(ValueData(operator(left_value_data.value, right_value_data.value), result_type))
+
+            elif step == CHECK_ARGUMENT:
+                operand_value_data = values[-1]
+                if operand_value_data.type == ValueType.Nya:
+                    result = evaluator_error_result(f'nya~~ value passed through 0th parameter to {expression.type.name} function.')
+                elif operand_value_data.type not in data:
+                    type_names_joined = " or ".join(data)
+                    result = evaluator_error_result(f'Invalid argument type for {expression.type.name} function. Expected {type_names_joined}, got {operand_value_data.type}.')
+                else:
+                    continue
+
+            elif step == CALL_BUILT_IN:
+                built_in_function, operand_count = data
+                operand_values_data = values[len(values) - operand_count:]
+                del values[len(values) - operand_count:]
+                result = Result(built_in_function(*operand_values_data))
+
+            elif step == NEGATE:
+                operand_value_data = values.pop()
+                if operand_value_data.type != ValueType.Number:
+                    result = evaluator_error_result("Can only negate numbers.")
+                else:
+                    result = Result(ValueData.number_value(- operand_value_data.value))
+
+            elif step == ASSIGN:
+                value_data = values.pop()
+                slot = expression.slot
+                if slot is None:
+                    variables[expression.value] = value_data
+                elif slot >= 0:
+                    slots[slot] = value_data
+                else:
+                    self.frame[slot] = value_data
+
+                result = Result(value_data)
+
+            elif step == CONDITION:
+                condition_value_data = values.pop()
+                if condition_value_data.type != ValueType.Boolean:
+                    result = evaluator_error_result(f'Invalid value type for if condition. Expected Boolean, got {condition_value_data.type.name}.')
+                else:
+                    body = expression.if_body if condition_value_data.value else (expression.else_body or [])
+                    if body:
+                        work.append((BODY, body, 0))
+                        continue
+
+                    result = Result(ValueData.nya_value())
+
+            elif step == BODY:
+                # Here expression is the list of body expressions, and the value of a body is the value of its last one
+                if data > 0:
+                    values.pop()
+
+                if data + 1 < len(expression):
+                    work.append((BODY, expression, data + 1))
+
+                work.append((EVALUATE, expression[data], None))
+                continue
+
+            elif step == LOOP_CONDITION:
+                # data is the value of the body the last time it ran, None before the first iteration
+                condition_value_data = values.pop()
+                if condition_value_data.type != ValueType.Boolean:
+                    result = evaluator_error_result(f'Invalid value type for loop condition. Expected Boolean, got {condition_value_data.type.name}.')
+                elif not condition_value_data.value:
+                    result = Result(data if data is not None else ValueData.nya_value())
+                else:
+                    work.append((LOOP_BODY, expression, None))
+                    work.append((BODY, expression.if_body, 0))
+                    continue
+
+            elif step == LOOP_BODY:
+                work.append((LOOP_CONDITION, expression, values.pop()))
+                work.append((EVALUATE, expression.condition, None))
+                continue
+
+            elif step == CALL_FUNCTION:
+                # data is the called UserFunction, its arguments are on top of the value stack
+                function = data
+                arguments = values[len(values) - function.parameter_count:]
+                del values[len(values) - function.parameter_count:]
+                key = memo_key(arguments) if function.memo is not None else None
+                if key is not None and (value_data := function.recall(key)) is not None:
+                    result = Result(value_data)
+                else:
+                    frame = function.take_frame(arguments)
+                    work.append((RETURN, expression, (function, self.frame, frame, key)))
+                    self.frame = frame
+                    work.append((BODY, function.body, 0))
+                    continue
+
+            elif step == RETURN:
+                function, caller_frame, frame, key = data
+                self.frame = caller_frame
+                function.release_frame(frame)
+                value_data = values.pop()
+                if key is not None:
+                    function.remember(key, value_data)
+
+                result = Result(value_data)
+
+            elif step == PRINT_ARGUMENT:
+                if data < len(expression.operands):
+                    # Remembers how many values there were, to drop the partial ones if the argument fails
+                    work.append((PRINT_VALUE, expression, (data, len(values))))
+                    work.append((EVALUATE, expression.operands[data], None))
+                    continue
+
+                self.write_line("\n")
+                result = Result(ValueData.nya_value())
+
+            else:
+                value_data = values.pop()
+                value = value_data.value
+                if value_data.type == ValueType.Boolean:
+                    value = "chi" if value else "ño"
+                elif value_data.type == ValueType.Array:
+                    value = array_string(value)
+
+                line.append(str(value))
+                work.append((PRINT_ARGUMENT, expression, data[0] + 1))
+                continue
+
+            if result.is_ok:
+                values.append(result.value)
+                continue
+
+            # Unwinds to the closest print statement still evaluating an argument, or out of the expression,
+            # returning from the calls in between
+            while work:
+                step, expression, data = work.pop()
+                if step == RETURN:
+                    function, self.frame, frame, _ = data
+                    function.release_frame(frame)
+                elif step == PRINT_VALUE:
+                    del values[data[1]:]
+                    self.write_line("")
+                    values.append(ValueData.nya_value())
+                    break
+            else:
+                self.countdown = countdown
+                return result
+
+        self.countdown = countdown
+        return Result(values.pop())
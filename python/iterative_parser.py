@@ -0,0 +1,344 @@
+from parser import *
+
+# What a frame does with the expression parsed for it by the frame above it on the stack
+ParserState = Enum("ParserState", "Argument ArrayElement Condition IfBody ElseBody LoopCondition LoopBody FunctionBody Group PrefixOperand RightOperand")
+
+# Operator and infix_operator_precedence of the tokens that Parser reads as infix operators, looked up once
+infix_operators = {
+    token_kind: (Operator[token_kind.name], infix_operator_precedence(Operator[token_kind.name]))
+    for token_kind in [TokenKind.DoubleEquals, TokenKind.Equals, TokenKind.Greater, TokenKind.GreaterEquals, TokenKind.Less,
+                       TokenKind.LessEquals, TokenKind.Minus, TokenKind.Plus, TokenKind.Slash, TokenKind.Star]
+}
+expression_end_token_kinds = {TokenKind.LeftBrace, TokenKind.RightParenthesis, TokenKind.RightBrace}
+infix_keywords = {AND_KEYWORD, OR_KEYWORD, NOT_KEYWORD}
+
+
+# One call to Parser.process_expression that is waiting for a nested expression, with the locals it keeps
+# across that call
+class ParserFrame:
+    __slots__ = ("minimum_precedence", "parenthesized", "argument_list", "block", "state", "token", "operator",
+                 "left_expression", "arguments", "condition", "if_body", "else_body")
+
+    def __init__(self, minimum_precedence: int, parenthesized: bool, argument_list: bool, block: bool):
+        self.minimum_precedence = minimum_precedence
+        self.parenthesized = parenthesized
+        self.argument_list = argument_list
+        self.block = block
+        # The other slots are only set by the states that use them
+
+
+# Parses the same grammar as Parser into the same Expression trees, reporting the same errors after consuming
+# the same tokens, but keeps the pending operators and operands on an explicit stack of frames instead of the
+# Python call stack. Arbitrarily long and deeply nested expressions parse in constant Python stack depth.
+class IterativeParser(Parser):
+    def process_expression(self, token_iterator: CustomIterator, minimum_precedence: int, parenthesized: bool, argument_list = False, block = False) -> Result[Expression, ParserError] | None:
+        frames: list[ParserFrame] = []
+        frame = ParserFrame(minimum_precedence, parenthesized, argument_list, block)
+        step = self.begin(frame, token_iterator)
+
+        # Each step either starts parsing a nested expression, finishes the current one with an Expression, or
+        # fails with an error Result
+        while True:
+            step_type = type(step)
+            if step_type is ParserFrame:
+                frames.append(frame)
+                frame = step
+                step = self.begin(frame, token_iterator)
+            elif step_type is Result:
+                # Every frame hands an error on unchanged, so it ends the whole expression at once
+                return step
+            elif frames:
+                frame = frames.pop()
+                step = self.resume(frame, step, token_iterator)
+            else:
+                return Result(step)
+
+    def begin(self, frame: ParserFrame, token_iterator: CustomIterator) -> ParserFrame | Expression | Result[Expression, ParserError]:
+        token = None
+        token_kind = None
+        while (token := token_iterator.peek()) is not None and token.kind == TokenKind.Eol:
+            if not frame.parenthesized and frame.minimum_precedence > 0:
+                return parser_error_result("Unexpected end of line in expression.")
+            else:
+                token_iterator.next()
+                token_kind = token.kind
+
+        if token is None:
+            if token_kind == TokenKind.Eol:
+                token_iterator.next()
+                return Expression.create_nya()
+
+            return parser_error_result("Expected a token.")
+        elif token.kind == TokenKind.RightBrace:
+            if frame.block:
+                return Expression.create_nya()
+            else:
+                token_iterator.next()
+                return parser_error_result("Unexpected token.")
+
+        token_iterator.next()
+        match token.kind:
+            case TokenKind.Keyword if token.value in value_keywords:
+                if token.value == "nya":
+                    frame.left_expression = Expression.create_nya()
+                else:
+                    frame.left_expression = Expression.create_value(ExpressionType.Boolean, token.value == TRUE_KEYWORD)
+
+            case TokenKind.Keyword if token.original in built_in_registry.keywords or token.original == PRINT_KEYWORD:
+                frame.token = token
+                frame.arguments = []
+                frame.state = ParserState.Argument
+                return self.next_argument(frame, token_iterator)
+
+            case TokenKind.Keyword if token.original == IF_KEYWORD:
+                frame.state = ParserState.Condition
+                return ParserFrame(0, False, False, False)
+
+            case TokenKind.Keyword if token.original == WHILE_KEYWORD:
+                frame.state = ParserState.LoopCondition
+                return ParserFrame(0, False, False, False)
+
+            case TokenKind.Keyword if token.original == FUNCTION_KEYWORD:
+                signature_result = process_function_signature(token_iterator)
+                if not signature_result.is_ok:
+                    return signature_result
+
+                frame.token, frame.arguments = signature_result.value
+                definition_error_result = self.define_function(frame.token, frame.arguments)
+                if definition_error_result is not None:
+                    return definition_error_result
+
+                frame.if_body = []
+                frame.state = ParserState.FunctionBody
+                return self.next_body_expression(frame, token_iterator)
+
+            case TokenKind.Number:
+                frame.left_expression = Expression.create_value(ExpressionType.Number, token.value)
+
+            case TokenKind.String:
+                frame.left_expression = Expression.create_value(ExpressionType.String, token.value)
+
+            case TokenKind.Identifier if token.original in self.function_parameter_counts:
+                if is_assignment(token_iterator):
+                    return variable_function_error_result(token.original)
+
+                frame.token = token
+                frame.arguments = []
+                frame.state = ParserState.Argument
+                return self.next_argument(frame, token_iterator)
+
+            case TokenKind.Identifier:
+                if is_assignment(token_iterator):
+                    self.variable_names.add(token.original)
+
+                frame.left_expression = Expression.create_value(ExpressionType.Identifier, token.original)
+
+            case TokenKind.LeftParenthesis:
+                frame.state = ParserState.Group
+                return ParserFrame(0, True, frame.argument_list, False)
+
+            case TokenKind.LeftBracket:
+                frame.arguments = []
+                frame.state = ParserState.ArrayElement
+                return self.next_array_element(frame, token_iterator)
+
+            case TokenKind.Keyword if token.original == NOT_KEYWORD:
+                frame.operator = Operator.Not
+                frame.state = ParserState.PrefixOperand
+                return ParserFrame(10, frame.parenthesized, frame.argument_list, False)
+
+            case TokenKind.Bang | TokenKind.Minus | TokenKind.Keyword:
+                frame.operator = Operator[token.kind.name]
+                frame.state = ParserState.PrefixOperand
+                return ParserFrame(10, frame.parenthesized, frame.argument_list, False)
+
+            case _:
+                return parser_error_result("Unexpected token.")
+
+        return self.infix_operation(frame, token_iterator)
+
+    def resume(self, frame: ParserFrame, expression: Expression, token_iterator: CustomIterator) -> ParserFrame | Expression | Result[Expression, ParserError]:
+        match frame.state:
+            case ParserState.Argument:
+                frame.arguments.append(expression)
+                return self.next_argument(frame, token_iterator)
+
+            case ParserState.ArrayElement:
+                frame.arguments.append(expression)
+                return self.next_array_element(frame, token_iterator)
+
+            case ParserState.Condition:
+                next_token = token_iterator.next()
+                if next_token is None or next_token.kind != TokenKind.LeftBrace:
+                    return parser_error_result('Expected "{" after "si" condition.')
+
+                frame.condition = expression
+                frame.if_body = []
+                frame.else_body = None
+                frame.state = ParserState.IfBody
+                return self.next_body_expression(frame, token_iterator)
+
+            case ParserState.LoopCondition:
+                next_token = token_iterator.next()
+                if next_token is None or next_token.kind != TokenKind.LeftBrace:
+                    return parser_error_result('Expected "{" after "mientras" condition.')
+
+                frame.condition = expression
+                frame.if_body = []
+                frame.state = ParserState.LoopBody
+                return self.next_body_expression(frame, token_iterator)
+
+            case ParserState.IfBody | ParserState.LoopBody | ParserState.FunctionBody:
+                if expression.type != ExpressionType.Nya:
+                    frame.if_body.append(expression)
+
+                return self.next_body_expression(frame, token_iterator)
+
+            case ParserState.ElseBody:
+                if expression.type != ExpressionType.Nya:
+                    frame.else_body.append(expression)
+
+                return self.next_body_expression(frame, token_iterator)
+
+            case ParserState.Group:
+                next_token = token_iterator.next()
+                if next_token is None or next_token.kind != TokenKind.RightParenthesis:
+                    return parser_error_result('Expected ")" after parenthesized expression.')
+
+                frame.left_expression = Expression.create_operation(Operator.Group, [expression])
+
+            case ParserState.PrefixOperand:
+                frame.left_expression = Expression.create_operation(frame.operator, [expression])
+
+            case ParserState.RightOperand:
+                frame.left_expression = Expression.create_operation(frame.operator, [frame.left_expression, expression])
+
+        return self.infix_operation(frame, token_iterator)
+
+    def next_argument(self, frame: ParserFrame, token_iterator: CustomIterator) -> ParserFrame | Expression | Result[Expression, ParserError]:
+        next_token = token_iterator.peek()
+        is_call = frame.token.kind == TokenKind.Identifier
+        if next_token is not None and next_token.kind not in argument_end_token_kinds and \
+                (not is_call or len(frame.arguments) < self.function_parameter_counts[frame.token.original]):
+            return ParserFrame(0, frame.parenthesized, True, False)
+
+        if is_call:
+            if not frame.argument_list and (extra_argument_error := self.extra_argument_error_result(frame.token, token_iterator)):
+                return extra_argument_error
+
+            frame.left_expression = Expression.create_call(frame.token.original, frame.arguments)
+            return self.infix_operation(frame, token_iterator)
+
+        if frame.token.original == PRINT_KEYWORD:
+            frame.left_expression = Expression.create_operation(Operator.Print, frame.arguments)
+        else:
+            frame.left_expression = Expression.create_built_in_call(frame.token.original, frame.arguments)
+
+        return self.infix_operation(frame, token_iterator)
+
+    # Parses the next element of an array literal, or finishes the literal once its "]" is reached
+    def next_array_element(self, frame: ParserFrame, token_iterator: CustomIterator) -> ParserFrame | Expression | Result[Expression, ParserError]:
+        next_token = skip_eol(token_iterator)
+        if next_token is not None and next_token.kind != TokenKind.RightBracket:
+            return ParserFrame(0, False, True, False)
+
+        if next_token is None:
+            return parser_error_result('Expected "]" after array elements.')
+
+        token_iterator.next() # Discard right bracket
+        frame.left_expression = Expression.create_operation(Operator.Array, frame.arguments)
+        return self.infix_operation(frame, token_iterator)
+
+    # Parses the next expression of a "si", "sino", "mientras" or "funcion" body, or finishes the body once its "}"
+    # is reached
+    def next_body_expression(self, frame: ParserFrame, token_iterator: CustomIterator) -> ParserFrame | Expression | Result[Expression, ParserError]:
+        next_token = token_iterator.peek()
+        if next_token is not None and next_token.kind != TokenKind.RightBrace:
+            return ParserFrame(0, False, False, True)
+
+        if frame.state == ParserState.LoopBody:
+            if next_token is None:
+                return parser_error_result('Expected "}" after "mientras" expression body.')
+
+            token_iterator.next() # Discard right brace
+            if len(frame.if_body) == 0:
+                frame.if_body.append(Expression.create_nya())
+
+            return Expression.create_while(frame.condition, frame.if_body)
+        elif frame.state == ParserState.FunctionBody:
+            if next_token is None:
+                return parser_error_result('Expected "}" after "funcion" expression body.')
+
+            token_iterator.next() # Discard right brace
+            if len(frame.if_body) == 0:
+                frame.if_body.append(Expression.create_nya())
+
+            # frame.token holds the name of the function here
+            return Expression.create_function(frame.token, frame.arguments, frame.if_body)
+        elif frame.state == ParserState.IfBody:
+            if next_token is None:
+                return parser_error_result('Expected "}" after "si" expression body.')
+
+            token_iterator.next() # Discard right brace
+            skip_eol(token_iterator)
+            next_token = token_iterator.peek()
+            if next_token is not None and next_token.kind == TokenKind.Keyword and next_token.original == ELSE_KEYWORD:
+                token_iterator.next() # Discard else keyword
+                next_token = token_iterator.next()
+                if next_token is None or next_token.kind != TokenKind.LeftBrace:
+                    return parser_error_result('Expected "{" after "si" condition.')
+
+                frame.else_body = []
+                frame.state = ParserState.ElseBody
+                return self.next_body_expression(frame, token_iterator)
+        else:
+            next_token = token_iterator.next()
+            if next_token is None or next_token.kind != TokenKind.RightBrace:
+                return parser_error_result('Expected "}" after "sino" expression body.')
+
+        if len(frame.if_body) == 0:
+            frame.if_body.append(Expression.create_nya())
+        if frame.else_body is not None and len(frame.else_body) == 0:
+            frame.else_body.append(Expression.create_nya())
+
+        return Expression.create_if(frame.condition, frame.if_body, frame.else_body)
+
+    # Continues the frame's expression with an infix operator if the next token is one that binds tightly enough
+    def infix_operation(self, frame: ParserFrame, token_iterator: CustomIterator) -> ParserFrame | Expression | Result[Expression, ParserError]:
+        while True:
+            token = token_iterator.peek()
+            if token is None:
+                break
+
+            token_kind = token.kind
+            infix_operator = infix_operators.get(token_kind)
+            if infix_operator is not None:
+                operator, operator_precedence = infix_operator
+            elif token_kind == TokenKind.Eol:
+                if frame.parenthesized:
+                    token_iterator.next()
+                    continue
+                else:
+                    break
+            elif token_kind in expression_end_token_kinds:
+                break
+            elif token_kind == TokenKind.Keyword and token.original in infix_keywords:
+                # "y", "o" and "no" have no precedence, so they end the expression like in Parser
+                break
+            elif token_kind == TokenKind.BangEquals:
+                # There is no Operator for "!=", Parser fails with the same KeyError
+                operator = Operator[token_kind.name]
+            elif frame.argument_list:
+                break
+            else:
+                return parser_error_result("Unexpected token.")
+
+            if operator_precedence is None or operator_precedence[0] < frame.minimum_precedence:
+                break
+
+            token_iterator.next()
+            frame.operator = operator
+            frame.state = ParserState.RightOperand
+            return ParserFrame(operator_precedence[1], frame.parenthesized, frame.argument_list, False)
+
+        return frame.left_expression
@@ -1,20 +1,279 @@
+import importlib
+import os
 import sys
-from io import StringIO
+import time
+from typing import TextIO
 
 from evaluator import Evaluator
+from iterative_parser import IterativeParser
+from output import BufferedOutput, FlushPolicy
 from parser import *
-from runner import Runner
 from tokenizer import *
 
+# Modules needed by only some of the commands, such as the backends, the batch runner and the program cache,
+# are imported where they are used, so commands like repl start without loading them
+
+def open_file(filepath: str) -> TextIO:
+    try:
+        return open(filepath)
+    except FileNotFoundError:
+        print(f'Error while opening {filepath}')
+        sys.exit(1)
+
+
 def read_file(filepath: str) -> str:
+    with open_file(filepath) as file:
+        return file.read()
+
+
+# "--mmap" maps the source file into memory instead of reading it into a string, see MappedSource
+def open_mapped_source(filepath: str):
+    from mapped_source import MappedSource
+
     try:
-        file = open(filepath)
+        return MappedSource(filepath)
     except FileNotFoundError:
         print(f'Error while opening {filepath}')
         sys.exit(1)
+
+
+# Backend name to module and class name
+evaluator_classes = {
+    "tree":      ("evaluator", "Evaluator"),
+    "closure":   ("closure_compiler", "ClosureEvaluator"),
+    "unboxed":   ("unboxed", "UnboxedEvaluator"),
+    "iterative": ("iterative_evaluator", "IterativeEvaluator"),
+}
+
+
+# "--backend=NAME" picks one of evaluator_classes, the tree walking Evaluator by default
+def evaluator_class_option(options: list[str]) -> type[Evaluator]:
+    for option in options:
+        if option.startswith("--backend="):
+            module_name, class_name = evaluator_classes[option.removeprefix("--backend=")]
+            return getattr(importlib.import_module(module_name), class_name)
+
+    return Evaluator
+
+
+# "--optimize" selects the highest level, "--optimize=N" a specific one
+def optimization_level_option(options: list[str]) -> int:
+    for option in options:
+        if option == "--optimize":
+            from optimizer import MAXIMUM_OPTIMIZATION_LEVEL
+            return MAXIMUM_OPTIMIZATION_LEVEL
+        elif option.startswith("--optimize="):
+            return int(option.removeprefix("--optimize="))
+
+    return 0
+
+
+# "--memoize" caches the results of the last DEFAULT_MEMOIZATION_SIZE argument lists each pure function was
+# called with, "--memoize=N" of the last N
+DEFAULT_MEMOIZATION_SIZE = 1024
+
+
+def memoization_size_option(options: list[str]) -> int:
+    for option in options:
+        if option == "--memoize":
+            return DEFAULT_MEMOIZATION_SIZE
+        elif option.startswith("--memoize="):
+            return int(option.removeprefix("--memoize="))
+
+    return 0
+
+
+# "--flush=line|size|time" picks when program output is passed on; by line on a terminal, by size otherwise
+flush_policies = {policy.name.lower(): policy for policy in FlushPolicy}
+
+
+def flush_policy_option(options: list[str], destination: TextIO) -> FlushPolicy:
+    for option in options:
+        if option.startswith("--flush="):
+            return flush_policies[option.removeprefix("--flush=").lower()]
+
+    return FlushPolicy.Line if destination.isatty() else FlushPolicy.Size
+
+
+# The message for the first option given a value the functions above can't use, or None; checked before any
+# output file is opened
+def invalid_option_message(options: list[str]) -> str | None:
+    for option in options:
+        if option.startswith("--backend="):
+            name = option.removeprefix("--backend=")
+            if name not in evaluator_classes:
+                vm_hint = " The bytecode VM is run by the vm command." if name == "vm" else ""
+                return f'Unrecognized backend: {name}. Expected one of: {", ".join(evaluator_classes)}.{vm_hint}'
+        elif option.startswith("--optimize="):
+            from optimizer import MAXIMUM_OPTIMIZATION_LEVEL
+            level = option.removeprefix("--optimize=")
+            if not level.isdecimal() or int(level) > MAXIMUM_OPTIMIZATION_LEVEL:
+                return f'Invalid optimization level: {level}. Expected a number from 0 to {MAXIMUM_OPTIMIZATION_LEVEL}.'
+        elif option.startswith("--memoize="):
+            size = option.removeprefix("--memoize=")
+            if not size.isdecimal():
+                return f'Invalid memoization size: {size}. Expected a number of 0 or more.'
+        elif option.startswith("--flush="):
+            name = option.removeprefix("--flush=")
+            if name.lower() not in flush_policies:
+                return f'Unrecognized flush policy: {name}. Expected one of: {", ".join(flush_policies)}.'
+
+    return None
+
+
+# "--output=PATH" writes program output to a file instead of stdout
+def output_file_option(options: list[str]) -> str | None:
+    for option in options:
+        if option.startswith("--output="):
+            return option.removeprefix("--output=")
+
+    return None
+
+
+# "--workers=N" sets the number of processes used by the batch command and by "--parallel-tokenize", one per core
+# by default
+def worker_count_option(options: list[str]) -> int | None:
+    for option in options:
+        if option.startswith("--workers="):
+            return int(option.removeprefix("--workers="))
+
+    return None
+
+
+# "--parallel-tokenize" tokenizes large sources in a pool of processes, see ParallelTokenizer
+def tokenizer_worker_count_option(options: list[str]) -> int:
+    if "--parallel-tokenize" not in options:
+        return 1
+
+    return worker_count_option(options) or os.cpu_count() or 1
+
+
+def source_tokenizer(file_contents: str, options: list[str]):
+    tokenizer_worker_count = tokenizer_worker_count_option(options)
+    if tokenizer_worker_count > 1:
+        from parallel_tokenizer import ParallelTokenizer
+        return ParallelTokenizer(file_contents, tokenizer_worker_count)
+
+    return Tokenizer(file_contents)
+
+
+def run_batch(path: str, options: list[str]) -> int:
+    from batch import BatchRunner, script_paths
+
+    start_time = time.perf_counter()
+    batch_runner = BatchRunner(script_paths(path), worker_count_option(options), evaluator_class_option(options),
+                               optimization_level_option(options))
+    results = batch_runner.process()
+    elapsed_seconds = time.perf_counter() - start_time
+
+    failed_count = 0
+    for result in results:
+        print(f'=== {result.path} ({result.elapsed_seconds * 1000:.2f} ms) ===')
+        print(result.output, end = "")
+        for warning in result.warnings:
+            print(f'[Warning] {result.path}: {warning}', file = sys.stderr)
+
+        if result.error is not None:
+            print(f'CRASH: {result.error}')
+        if result.exit_code != 0:
+            failed_count += 1
+
+    print(f'Ran {len(results)} scripts in {elapsed_seconds:.3f} s, {failed_count} failed.', file = sys.stderr)
+    return 1 if failed_count > 0 else 0
+
+
+# Runs the program with a Profiler and prints where the time went, as a table or with "--json" as JSON. Node and
+# statement timings need the tree walking ProfilingEvaluator, which is used unless another backend is picked;
+# other backends only get their phases timed. Program output is thrown away unless "--output=PATH" is given.
+# "--trace-memory" also records the peak memory use of each phase.
+def run_profile(file_contents, options: list[str], evaluator_class: type[Evaluator], optimization_level: int,
+                memoization_size: int) -> int:
+    import json
+    from profiler import Profiler, ProfilingEvaluator
+    from runner import Runner
+
+    if not any(option.startswith("--backend=") for option in options):
+        evaluator_class = ProfilingEvaluator
+
+    output_file_path = output_file_option(options)
+    output_file = open(output_file_path if output_file_path is not None else os.devnull, "w")
+    profiler = Profiler("--trace-memory" in options)
+    try:
+        with profiler.phase("total"):
+            runner = Runner(file_contents, output_file, evaluator_class = evaluator_class,
+                            diagnostic_destination = sys.stderr, optimization_level = optimization_level,
+                            memoization_size = memoization_size, profiler = profiler)
+            exit_code = runner.run_code()
+    finally:
+        profiler.stop()
+        output_file.close()
+
+    if "--json" in options:
+        print(json.dumps(profiler.to_json(), indent = 2))
     else:
-        with file:
-            return file.read()
+        profiler.print_report(sys.stdout)
+
+    return exit_code or 0
+
+
+# Runs tokenize, parse, evaluate, vm or profile on a source file mapped into memory. Tokens are scanned from the
+# mapping and printed or parsed as they come, and with "--stream" evaluate runs one expression at a time, so
+# neither the source text nor the whole token list is ever held in memory. Mapped sources aren't cached.
+def run_mapped_source(command: str, mapped_source, options: list[str], streaming: bool,
+                      evaluator_class: type[Evaluator], optimization_level: int, memoization_size: int) -> int:
+    match command:
+        case "tokenize":
+            print_tokens(mapped_source.tokens())
+        case "parse":
+            tokens = map(lambda t: t.value, mapped_source.tokens())
+            for result in IterativeParser(tokens).expressions():
+                if result.is_ok:
+                    print_expression(result.value)
+                else:
+                    print(result.error.message)
+        case "evaluate" | "vm":
+            from runner import Runner
+
+            if command == "vm":
+                from vm import BytecodeEvaluator
+                evaluator_class = BytecodeEvaluator
+
+            output_file_path = output_file_option(options)
+            output_file = open(output_file_path, "w") if output_file_path is not None else sys.stdout
+            output_destination = BufferedOutput(output_file, flush_policy_option(options, output_file))
+            try:
+                runner = Runner(mapped_source, output_destination, streaming = streaming, evaluator_class = evaluator_class,
+                                diagnostic_destination = sys.stderr, optimization_level = optimization_level,
+                                memoization_size = memoization_size)
+                runner.run_code()
+                output_destination.write("\n")
+            finally:
+                output_destination.close()
+                if output_file is not sys.stdout:
+                    output_file.close()
+        case "profile":
+            return run_profile(mapped_source, options, evaluator_class, optimization_level, memoization_size)
+        case _:
+            print("Unrecognized command.")
+            return 1
+
+    return 0
+
+
+# The source file is optional; when given it is run first, leaving its variables to inspect
+def run_repl(filepath: str | None, options: list[str]) -> int:
+    from repl import Repl
+
+    if filepath is not None and filepath.startswith("--"):
+        options.insert(0, filepath)
+        filepath = None
+
+    repl = Repl(sys.stdin, sys.stdout, evaluator_class_option(options))
+    if filepath is not None:
+        repl.process_source(read_file(filepath))
+
+    repl.run()
+    return 0
 
 
 def main():
@@ -22,28 +281,75 @@ def main():
     next(iterator)
     command = next(iterator, None)
     filepath = next(iterator, None)
+    options = list(iterator)
 
     if command is None:
         print("Must provide one of two commands: tokenize, parse.")
         return 1
 
+    # The repl takes its source file optionally, so what was read as the file path may be an option
+    if (option_message := invalid_option_message(options if filepath is None else [filepath, *options])) is not None:
+        print(option_message)
+        return 1
+
+    if command == "repl":
+        return run_repl(filepath, options)
+
     if filepath is None:
         print("Must provide path to source file.")
         return 1
 
-    file_contents = read_file(filepath)
+    if command == "clear-cache":
+        from program_cache import CACHE_DIRECTORY_NAME, ProgramCache
+        cache_directory = filepath if os.path.isdir(filepath) else os.path.dirname(os.path.abspath(filepath))
+        removed_count = ProgramCache(os.path.join(cache_directory, CACHE_DIRECTORY_NAME)).clear()
+        print(f'Removed {removed_count} cached programs.')
+        return 0
+
+    if command == "batch":
+        return run_batch(filepath, options)
+
+    streaming = "--stream" in options
+    optimization_level = optimization_level_option(options)
+    memoization_size = memoization_size_option(options)
+    evaluator_class = evaluator_class_option(options)
+    if "--mmap" in options:
+        with open_mapped_source(filepath) as mapped_source:
+            return run_mapped_source(command, mapped_source, options, streaming, evaluator_class, optimization_level,
+                                     memoization_size)
+
+    if streaming:
+        source_file = open_file(filepath)
+    else:
+        file_contents = read_file(filepath)
+
     match command:
         case "tokenize":
-            tokenizer = Tokenizer(file_contents)
+            if streaming:
+                with source_file:
+                    print_tokens(StreamTokenizer(source_file).tokens())
+                return 0
+
+            tokenizer = source_tokenizer(file_contents, options)
             tokens = tokenizer.process()
             print_tokens(tokens)
             return 0
         case "parse":
-            tokenizer = Tokenizer(file_contents)
+            if streaming:
+                with source_file:
+                    tokens = map(lambda t: t.value, StreamTokenizer(source_file).tokens())
+                    for result in IterativeParser(tokens).expressions():
+                        if result.is_ok:
+                            print_expression(result.value)
+                        else:
+                            print(result.error.message)
+                return 0
+
+            tokenizer = source_tokenizer(file_contents, options)
             tokens = tokenizer.process()
             tokens = map(lambda t: t.value, tokens)
 
-            parser = Parser(tokens)
+            parser = IterativeParser(tokens)
             expression_results = parser.process()
 
             for result in expression_results:
@@ -52,14 +358,44 @@ def main():
                 else:
                     print(result.error.message)
             return 0
-        case "evaluate":
-            output_destination = StringIO()
+        case "evaluate" | "vm":
+            from program_cache import ProgramCache
+            from runner import Runner
+
+            if command == "vm":
+                from vm import BytecodeEvaluator
+                evaluator_class = BytecodeEvaluator
+
+            output_file_path = output_file_option(options)
+            output_file = open(output_file_path, "w") if output_file_path is not None else sys.stdout
+            output_destination = BufferedOutput(output_file, flush_policy_option(options, output_file))
+
+            try:
+                if streaming:
+                    with source_file:
+                        runner = Runner(source_file, output_destination, streaming = True, evaluator_class = evaluator_class,
+                                        diagnostic_destination = sys.stderr, optimization_level = optimization_level,
+                                        memoization_size = memoization_size)
+                        runner.run_code()
+                else:
+                    cache = ProgramCache.for_source_file(filepath) if "--no-cache" not in options else None
+                    runner = Runner(file_contents, output_destination, evaluator_class = evaluator_class, cache = cache,
+                                    diagnostic_destination = sys.stderr, optimization_level = optimization_level,
+                                    memoization_size = memoization_size,
+                                    tokenizer_worker_count = tokenizer_worker_count_option(options))
+                    runner.run_code()
 
-            runner = Runner(file_contents, output_destination)
-            runner.run_code()
+                    if cache is not None and "--cache-stats" in options:
+                        print(f'Cache hits: {cache.hits}, misses: {cache.misses}', file = sys.stderr)
 
-            print(output_destination.getvalue())
-            output_destination.close()
+                # Output used to be printed in one go at the end, followed by a newline
+                output_destination.write("\n")
+            finally:
+                output_destination.close()
+                if output_file is not sys.stdout:
+                    output_file.close()
+        case "profile":
+            return run_profile(file_contents, options, evaluator_class, optimization_level, memoization_size)
         case _:
             print("Unrecognized command.")
             return 1
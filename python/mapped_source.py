@@ -0,0 +1,41 @@
+import mmap
+import os
+from typing import Iterator
+
+from tokenizer import *
+
+
+# A UTF-8 source file mapped into memory instead of read into a string. Its pages are loaded by the operating
+# system as MappedTokenizer reaches them and can be dropped again once scanned, so with a streaming parser and
+# evaluator (see Runner) files larger than memory can be run. Must be closed, or used as a context manager, once
+# its tokens are no longer needed.
+class MappedSource:
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.file = open(filepath, "rb")
+        try:
+            if os.fstat(self.file.fileno()).st_size == 0:
+                # Empty files can't be mapped
+                self.buffer = b""
+            else:
+                self.buffer = mmap.mmap(self.file.fileno(), 0, access = mmap.ACCESS_READ)
+                if hasattr(mmap, "MADV_SEQUENTIAL"):
+                    self.buffer.madvise(mmap.MADV_SEQUENTIAL)
+        except BaseException:
+            self.file.close()
+            raise
+
+    def tokens(self) -> Iterator[Result[Token, TokenizerError]]:
+        return MappedTokenizer(self.buffer).tokens()
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.close()
@@ -0,0 +1,162 @@
+from evaluator import *
+from parser import *
+
+MAXIMUM_OPTIMIZATION_LEVEL = 2
+
+# Operations whose result depends only on their operands: no output, no variables and no hidden state. Calls
+# to built-ins are pure when their BuiltIn is.
+pure_operators = {
+    Operator.Plus, Operator.Minus, Operator.Slash, Operator.Star, Operator.And, Operator.Or, Operator.DoubleEquals,
+    Operator.Greater, Operator.Less, Operator.GreaterEquals, Operator.LessEquals,
+}
+literal_types = {ExpressionType.Boolean, ExpressionType.Number, ExpressionType.String, ExpressionType.Nya}
+
+
+# Rewrites Expression trees into cheaper trees that print the same output and report the same errors.
+#   Level 1: removes group wrappers and folds pure operations whose operands are all literals.
+#   Level 2: also replaces "si" expressions whose condition folds to a constant by the body that would run,
+#            and drops "mientras" loops whose condition folds to false.
+# Function bodies are optimized like top level statements.
+# Folding evaluates the operation with a real Evaluator, so folded values are exactly the runtime ones. An
+# operation that fails while folding is left in place, and the error is reported when it runs.
+class Optimizer:
+    def __init__(self, level: int = MAXIMUM_OPTIMIZATION_LEVEL):
+        self.level = level
+        self.folding_evaluator = Evaluator([], None)
+
+    def process(self, expressions: Iterable[Expression]) -> list[Expression]:
+        return list(self.statements(expressions))
+
+    # Optimizes a sequence of statements, splicing in the bodies of eliminated branches
+    def statements(self, expressions: Iterable[Expression]) -> Iterator[Expression]:
+        for expression in expressions:
+            expression = self.optimize(expression)
+            if self.level >= 2 and expression.type == ExpressionType.If:
+                branch = constant_branch(expression)
+                if branch is not None:
+                    yield from branch
+                    continue
+
+            yield expression
+
+    def optimize(self, expression: Expression) -> Expression:
+        if self.level <= 0:
+            return expression
+
+        match expression.type:
+            case ExpressionType.If:
+                return self.optimize_if(expression)
+
+            case ExpressionType.While:
+                return self.optimize_while(expression)
+
+            case ExpressionType.Operation:
+                return self.optimize_operation(expression)
+
+            case ExpressionType.Function:
+                return self.optimize_function(expression)
+
+            case ExpressionType.Call:
+                # Calls are never folded, the function they call is only known when they run
+                return Expression.create_call(expression.value, [self.optimize(argument) for argument in expression.operands])
+
+        return expression
+
+    def optimize_operation(self, expression: Expression) -> Expression:
+        if expression.operator == Operator.Group:
+            return self.optimize(expression.operands[0])
+
+        operands = [self.optimize(operand) for operand in expression.operands]
+        if expression.operator == Operator.Equals:
+            # "(a) = 1" is an error; dropping the group on the left hand side would turn it into an assignment
+            operands[0] = expression.operands[0]
+
+        if expression.operator == Operator.BuiltIn:
+            optimized_expression = Expression.create_built_in_call(expression.value, operands)
+        else:
+            optimized_expression = Expression.create_operation(expression.operator, operands)
+
+        if is_pure_operation(optimized_expression) and all(operand.type in literal_types for operand in operands):
+            return self.fold(optimized_expression)
+
+        return optimized_expression
+
+    def optimize_if(self, expression: Expression) -> Expression:
+        condition = self.optimize(expression.condition)
+        if_body = list(self.statements(expression.if_body))
+        else_body = list(self.statements(expression.else_body)) if expression.else_body is not None else None
+
+        if len(if_body) == 0:
+            if_body.append(Expression.create_nya())
+        if else_body is not None and len(else_body) == 0:
+            else_body.append(Expression.create_nya())
+
+        optimized_expression = Expression.create_if(condition, if_body, else_body)
+        if self.level >= 2:
+            # A branch can only replace the "si" in place of a single expression when it is one expression long
+            branch = constant_branch(optimized_expression)
+            if branch is not None and len(branch) == 1:
+                return branch[0]
+
+        return optimized_expression
+
+    def optimize_while(self, expression: Expression) -> Expression:
+        condition = self.optimize(expression.condition)
+        body = list(self.statements(expression.if_body))
+        if len(body) == 0:
+            body.append(Expression.create_nya())
+
+        # A loop whose condition folds to false never runs its body
+        if self.level >= 2 and condition.type == ExpressionType.Boolean and not condition.value:
+            return Expression.create_nya()
+
+        return Expression.create_while(condition, body)
+
+    def optimize_function(self, expression: Expression) -> Expression:
+        body = list(self.statements(expression.if_body))
+        if len(body) == 0:
+            body.append(Expression.create_nya())
+
+        return Expression.create_function(expression.value, expression.operands, body)
+
+    def fold(self, expression: Expression) -> Expression:
+        try:
+            result = self.folding_evaluator.process_expression(expression)
+        except Exception:
+            # Errors raised by Python itself, like a division by zero, must still happen at run time
+            return expression
+
+        # Arrays have no literal
+        if not result.is_ok or not isinstance(result.value, ValueData) or result.value.type == ValueType.Array:
+            return expression
+
+        return literal_expression(result.value)
+
+
+def is_pure_operation(expression: Expression) -> bool:
+    if expression.operator in built_in_operators:
+        return built_in_registry.built_ins[built_in_name(expression)].pure
+
+    return expression.operator in pure_operators
+
+
+# Returns the statements that a "si" expression with a constant condition always runs, or None if the
+# condition isn't constant or would fail the Boolean check at run time
+def constant_branch(expression: Expression) -> list[Expression] | None:
+    condition = expression.condition
+    if condition.type != ExpressionType.Boolean:
+        return None
+
+    if condition.value:
+        return expression.if_body
+    elif expression.else_body is not None:
+        return expression.else_body
+
+    return [Expression.create_nya()]
+
+
+def literal_expression(value_data: ValueData) -> Expression:
+    if value_data.type == ValueType.Nya:
+        return Expression.create_nya()
+
+    return Expression.create_value(ExpressionType[value_data.type.name], value_data.value)
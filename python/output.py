@@ -0,0 +1,61 @@
+import time
+from enum import Enum
+from typing import TextIO
+
+DEFAULT_BUFFER_SIZE = 64 * 1024
+DEFAULT_FLUSH_INTERVAL = 0.1
+
+FlushPolicy = Enum("FlushPolicy", "Line Size Time")
+
+
+# Collects program output and passes it on to a destination stream in batches, so output shows up while the
+# program is still running without a system call per print statement.
+#   Line: flushes after every write that ends a line, for interactive use.
+#   Size: flushes once buffer_size characters are pending.
+#   Time: flushes on the first write after flush_interval seconds have passed since the last flush.
+# Whatever the policy, no more than buffer_size characters are ever held, so memory use stays flat no
+# matter how much a program prints.
+class BufferedOutput:
+    def __init__(self, destination: TextIO, policy: FlushPolicy = FlushPolicy.Size,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE, flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        self.destination = destination
+        self.policy = policy
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.pending: list[str] = []
+        self.pending_size = 0
+        self.last_flush_time = time.monotonic()
+
+    def write(self, text: str) -> int:
+        self.pending.append(text)
+        self.pending_size += len(text)
+
+        if self.pending_size >= self.buffer_size:
+            self.flush()
+        elif self.policy == FlushPolicy.Line:
+            if text.endswith("\n"):
+                self.flush()
+        elif self.policy == FlushPolicy.Time:
+            if time.monotonic() - self.last_flush_time >= self.flush_interval:
+                self.flush()
+
+        return len(text)
+
+    def flush(self):
+        if self.pending:
+            self.destination.write("".join(self.pending))
+            self.pending.clear()
+            self.pending_size = 0
+
+        self.destination.flush()
+        self.last_flush_time = time.monotonic()
+
+    # Flushes the remaining output; the destination itself is left open, it may well be sys.stdout
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
@@ -1,12 +1,24 @@
 from enum import Enum
+from typing import Iterable, Iterator
 
+from built_ins import built_in_registry
 from tokenizer import *
 
-ExpressionType = Enum("ExpressionType", "Boolean Identifier If Number Nya Operation String")
+ExpressionType = Enum("ExpressionType", "Boolean Call Function Identifier If Number Nya Operation String While")
 Operator = Enum("Operator", """And Bang DoubleEquals Equals Greater GreaterEquals Group
                                            Less LessEquals Minus Not Or Plus Slash Star
-                                           Print UnUReversa TwTPotencia owoValorTotal UwUMaximo UnUMinimo
-                                           UwUCima UnUSuelo EwEMedia TwTSuma OwOLazo UnUMezcla""")
+                                           Print BuiltIn Array""")
+# Operations that call a built-in function, see built_in_name
+built_in_operators = {Operator.BuiltIn, Operator.Not, Operator.Array}
+
+# Tokens that end the arguments of a built-in function call
+argument_end_token_kinds = {TokenKind.Eol, TokenKind.RightParenthesis, TokenKind.RightBracket}
+# Tokens that can follow an operand without starting an argument
+operand_end_token_kinds = argument_end_token_kinds | {
+    TokenKind.BangEquals, TokenKind.DoubleEquals, TokenKind.Equals, TokenKind.Greater, TokenKind.GreaterEquals,
+    TokenKind.Less, TokenKind.LessEquals, TokenKind.Minus, TokenKind.Plus, TokenKind.Slash, TokenKind.Star,
+    TokenKind.LeftBrace, TokenKind.RightBrace,
+}
 
 
 class CustomIterator:
@@ -30,6 +42,8 @@ class CustomIterator:
 
 
 class Expression:
+    __slots__ = ("type", "operator", "value", "operands", "condition", "if_body", "else_body", "slot")
+
     def __init__(self, type: ExpressionType, operator: Operator | None = None,
                  value: str | float | None = None, operands = None, condition = None, if_body = None, else_body = None):
         self.type = type
@@ -39,6 +53,9 @@ class Expression:
         self.condition = condition
         self.if_body = if_body
         self.else_body = else_body
+        # Index of the variable in Evaluator.slots, set by the Resolver on Identifier expressions. Locals of a
+        # function get negative indices into its call frame, and the function itself the size of that frame.
+        self.slot: int | None = None
 
     @staticmethod
     def create_value(type: ExpressionType, value: str | float | None):
@@ -48,6 +65,20 @@ class Expression:
     def create_if(condition, if_body, else_body):
         return Expression(ExpressionType.If, condition = condition, if_body = if_body, else_body = else_body)
 
+    # A loop keeps its body in if_body, so loops need no slot of their own
+    @staticmethod
+    def create_while(condition, body):
+        return Expression(ExpressionType.While, condition = condition, if_body = body)
+
+    # The parameters are Identifier expressions so that they can be given slots like any other local
+    @staticmethod
+    def create_function(name: str, parameters: list, body: list):
+        return Expression(ExpressionType.Function, value = name, operands = parameters, if_body = body)
+
+    @staticmethod
+    def create_call(name: str, arguments: list):
+        return Expression(ExpressionType.Call, value = name, operands = arguments)
+
     @staticmethod
     def create_nya():
         return Expression(ExpressionType.Nya)
@@ -56,24 +87,43 @@ class Expression:
     def create_operation(operator: Operator, operands: list):
         return Expression(ExpressionType.Operation, operator, operands = operands)
 
+    # Calls the built-in with that name in built_in_registry
+    @staticmethod
+    def create_built_in_call(name: str, arguments: list):
+        return Expression(ExpressionType.Operation, Operator.BuiltIn, name, arguments)
+
 
 class ParserError:
+    __slots__ = ("message",)
+
     def __init__(self, message: str):
         self.message = message
 
 
 class Parser:
-    def __init__(self, tokens: list[Token]):
+    def __init__(self, tokens: Iterable[Token]):
         self.tokens = tokens
-
+        # Parameter counts of the functions by name. Identifiers defined as functions are parsed as calls, taking
+        # their arguments like built-in functions do, but no more than the function has parameters.
+        self.function_parameter_counts: dict[str, int] = {}
+        # Identifiers assigned to or taken as parameters, which can't also be defined as functions
+        self.variable_names: set[str] = set()
+
+    # Every function defined anywhere in the tokens is known before parsing starts, so functions can be called
+    # before their definition, as mutually recursive ones have to
     def process(self) -> list[Result[Expression, ParserError]]:
+        self.tokens = list(self.tokens)
+        self.function_parameter_counts.update(defined_functions(self.tokens))
+        return list(self.expressions())
+
+    # Tokens are pulled from self.tokens only as far as needed to finish the current top level expression,
+    # so a lazy token stream never has to be held in memory as a whole. Without process looking ahead, only the
+    # functions defined before an expression are known while parsing it.
+    def expressions(self) -> Iterator[Result[Expression, ParserError]]:
         token_iterator = CustomIterator(iter(self.tokens))
-        expressions: list[Result[Expression, ParserError]] = []
 
         while token_iterator.peek() is not None:
-            expressions.append(self.process_expression(token_iterator, 0, False))
-
-        return expressions
+            yield self.process_expression(token_iterator, 0, False)
 
     def process_expression(self, token_iterator: CustomIterator, minimum_precedence: int, parenthesized: bool, argument_list = False, block = False) -> Result[Expression, ParserError] | None:
         token = None
@@ -104,24 +154,17 @@ class Parser:
                 if token.value == "nya":
                     left_expression = Result(Expression.create_nya())
                 else:
-                    left_expression = Result(Expression.create_value(ExpressionType.Boolean, token.value))
+                    left_expression = Result(Expression.create_value(ExpressionType.Boolean, token.value == TRUE_KEYWORD))
 
-            case TokenKind.Keyword if token.original in built_in_functions:
-                arguments: list[Expression] = []
-
-                while (next_token := token_iterator.peek()) is not None and next_token.kind != TokenKind.Eol and next_token.kind != TokenKind.RightParenthesis:
-                    argument_expression_result = self.process_expression(token_iterator, 0, parenthesized, True)
-                    if not argument_expression_result.is_ok:
-                        return argument_expression_result
-
-                    arguments.append(argument_expression_result.value)
+            case TokenKind.Keyword if token.original in built_in_registry.keywords or token.original == PRINT_KEYWORD:
+                arguments_result = self.process_arguments(token_iterator, parenthesized)
+                if not arguments_result.is_ok:
+                    return arguments_result
 
                 if token.original == PRINT_KEYWORD:
-                    operator = Operator.Print
+                    left_expression = Result(Expression.create_operation(Operator.Print, arguments_result.value))
                 else:
-                    operator = Operator[token.original]
-
-                left_expression = Result(Expression.create_operation(operator, arguments))
+                    left_expression = Result(Expression.create_built_in_call(token.original, arguments_result.value))
 
             case TokenKind.Keyword if token.original == IF_KEYWORD:
                 condition_expression_result = self.process_expression(token_iterator, 0, False)
@@ -177,13 +220,88 @@ class Parser:
 
                 return Result(Expression.create_if(condition_expression_result.value, if_body, else_body))
 
+            case TokenKind.Keyword if token.original == WHILE_KEYWORD:
+                condition_expression_result = self.process_expression(token_iterator, 0, False)
+                if not condition_expression_result.is_ok:
+                    return condition_expression_result
+
+                next_token = token_iterator.next()
+
+                if next_token is None or next_token.kind != TokenKind.LeftBrace:
+                    return parser_error_result('Expected "{" after "mientras" condition.')
+
+                body: list[Expression] = []
+                while (next_token := token_iterator.peek()) is not None and next_token.kind != TokenKind.RightBrace:
+                    result = self.process_expression(token_iterator, 0, False, block = True)
+                    if not result.is_ok:
+                        return result
+                    elif result.value.type == ExpressionType.Nya:
+                        continue
+
+                    body.append(result.value)
+
+                if next_token is None or next_token.kind != TokenKind.RightBrace:
+                    return parser_error_result('Expected "}" after "mientras" expression body.')
+
+                token_iterator.next() # Discard right brace
+                if len(body) == 0:
+                    body.append(Expression.create_nya())
+
+                return Result(Expression.create_while(condition_expression_result.value, body))
+
+            case TokenKind.Keyword if token.original == FUNCTION_KEYWORD:
+                signature_result = process_function_signature(token_iterator)
+                if not signature_result.is_ok:
+                    return signature_result
+
+                name, parameters = signature_result.value
+                # Known before the body is parsed, so that the function can call itself
+                definition_error_result = self.define_function(name, parameters)
+                if definition_error_result is not None:
+                    return definition_error_result
+
+                body: list[Expression] = []
+                while (next_token := token_iterator.peek()) is not None and next_token.kind != TokenKind.RightBrace:
+                    result = self.process_expression(token_iterator, 0, False, block = True)
+                    if not result.is_ok:
+                        return result
+                    elif result.value.type == ExpressionType.Nya:
+                        continue
+
+                    body.append(result.value)
+
+                if next_token is None or next_token.kind != TokenKind.RightBrace:
+                    return parser_error_result('Expected "}" after "funcion" expression body.')
+
+                token_iterator.next() # Discard right brace
+                if len(body) == 0:
+                    body.append(Expression.create_nya())
+
+                return Result(Expression.create_function(name, parameters, body))
+
             case TokenKind.Number:
                 left_expression = Result(Expression.create_value(ExpressionType.Number, token.value))
 
             case TokenKind.String:
                 left_expression = Result(Expression.create_value(ExpressionType.String, token.value))
 
+            case TokenKind.Identifier if token.original in self.function_parameter_counts:
+                if is_assignment(token_iterator):
+                    return variable_function_error_result(token.original)
+
+                arguments_result = self.process_arguments(token_iterator, parenthesized,
+                                                          self.function_parameter_counts[token.original])
+                if not arguments_result.is_ok:
+                    return arguments_result
+                if not argument_list and (extra_argument_error := self.extra_argument_error_result(token, token_iterator)):
+                    return extra_argument_error
+
+                left_expression = Result(Expression.create_call(token.original, arguments_result.value))
+
             case TokenKind.Identifier:
+                if is_assignment(token_iterator):
+                    self.variable_names.add(token.original)
+
                 left_expression = Result(Expression.create_value(ExpressionType.Identifier, token.original))
 
             case TokenKind.LeftParenthesis:
@@ -199,6 +317,23 @@ class Parser:
                 inner_expression = inner_expression_result.value
                 left_expression = Result(Expression.create_operation(Operator.Group, [inner_expression]))
 
+            case TokenKind.LeftBracket:
+                elements: list[Expression] = []
+
+                # Elements are separated like built-in function arguments and may span several lines
+                while (next_token := skip_eol(token_iterator)) is not None and next_token.kind != TokenKind.RightBracket:
+                    element_expression_result = self.process_expression(token_iterator, 0, False, True)
+                    if not element_expression_result.is_ok:
+                        return element_expression_result
+
+                    elements.append(element_expression_result.value)
+
+                if next_token is None:
+                    return parser_error_result('Expected "]" after array elements.')
+
+                token_iterator.next() # Discard right bracket
+                left_expression = Result(Expression.create_operation(Operator.Array, elements))
+
             case TokenKind.Keyword if token.original == NOT_KEYWORD:
                 operator_precedence = 10
                 inner_expression_result = self.process_expression(token_iterator, operator_precedence, parenthesized, argument_list)
@@ -266,6 +401,79 @@ class Parser:
 
         return left_expression
 
+    # A name is either a variable or a function throughout a program. As calls and variables parse differently, a
+    # name that is both would parse one way or the other depending on which was seen first, and only process
+    # knows every function in advance; so wherever the two meet, in whichever order, the program is rejected.
+    # Returns the error, or None once the function and its parameters are known.
+    def define_function(self, name: str, parameters: list[Expression]) -> Result[Expression, ParserError] | None:
+        if name in self.variable_names:
+            return variable_function_error_result(name)
+
+        self.function_parameter_counts[name] = len(parameters)
+        for parameter in parameters:
+            if parameter.value in self.function_parameter_counts:
+                return variable_function_error_result(parameter.value)
+
+            self.variable_names.add(parameter.value)
+
+        return None
+
+    # A call with an argument for every parameter that is followed by what would be another argument. In an
+    # argument list that is the next argument of the enclosing call; elsewhere the call was given too many.
+    def extra_argument_error_result(self, name_token: Token, token_iterator: CustomIterator) -> Result[Expression, ParserError] | None:
+        next_token = token_iterator.peek()
+        if next_token is None or next_token.kind in operand_end_token_kinds or \
+                (next_token.kind == TokenKind.Keyword and next_token.original in (AND_KEYWORD, OR_KEYWORD, NOT_KEYWORD)):
+            return None
+
+        parameter_count = self.function_parameter_counts[name_token.original]
+        return parser_error_result(f'Too many arguments for {name_token.original}. Expected {parameter_count}.')
+
+    # Parses the arguments of a built-in or user-defined function call, which run up to the end of the line or
+    # to the parenthesis or bracket closing the call. A user-defined function takes no more than maximum_count,
+    # so that e.g. "f + 1" adds to the result of a function without parameters.
+    def process_arguments(self, token_iterator: CustomIterator, parenthesized: bool, maximum_count: int | None = None) -> Result[list[Expression], ParserError]:
+        arguments: list[Expression] = []
+
+        while (next_token := token_iterator.peek()) is not None and next_token.kind not in argument_end_token_kinds and \
+                (maximum_count is None or len(arguments) < maximum_count):
+            argument_expression_result = self.process_expression(token_iterator, 0, parenthesized, True)
+            if not argument_expression_result.is_ok:
+                return argument_expression_result
+
+            arguments.append(argument_expression_result.value)
+
+        return Result(arguments)
+
+
+# Parameter counts of the functions defined anywhere in the tokens, whatever they are nested in, by name
+def defined_functions(tokens: list[Token]) -> dict[str, int]:
+    parameter_counts = {}
+    for index, token in enumerate(tokens):
+        if token.kind != TokenKind.Keyword or token.original != FUNCTION_KEYWORD:
+            continue
+
+        parameter_index = index + 2
+        if parameter_index > len(tokens) or tokens[index + 1].kind != TokenKind.Identifier:
+            continue
+
+        while parameter_index < len(tokens) and tokens[parameter_index].kind == TokenKind.Identifier:
+            parameter_index += 1
+
+        parameter_counts[tokens[index + 1].original] = parameter_index - index - 2
+
+    return parameter_counts
+
+
+# Whether the identifier just read is assigned to
+def is_assignment(token_iterator: CustomIterator) -> bool:
+    next_token = token_iterator.peek()
+    return next_token is not None and next_token.kind == TokenKind.Equals
+
+
+def variable_function_error_result(name: str) -> Result[Expression, ParserError]:
+    return parser_error_result(f'{name} is both a variable and a function.')
+
 
 def skip_eol(token_iterator: CustomIterator) -> Token | None:
     while (token := token_iterator.peek()) is not None and token.kind == TokenKind.Eol:
@@ -274,6 +482,25 @@ def skip_eol(token_iterator: CustomIterator) -> Token | None:
     return token
 
 
+# Parses the name and parameters of a function definition up to and including the "{" opening its body
+def process_function_signature(token_iterator: CustomIterator) -> Result[tuple[str, list[Expression]], ParserError]:
+    name_token = token_iterator.next()
+    if name_token is None or name_token.kind != TokenKind.Identifier:
+        return parser_error_result('Expected function name after "funcion".')
+
+    parameters: list[Expression] = []
+    while (next_token := token_iterator.next()) is not None and next_token.kind == TokenKind.Identifier:
+        if any(parameter.value == next_token.original for parameter in parameters):
+            return parser_error_result(f'Duplicate parameter {next_token.original} in function {name_token.original}.')
+
+        parameters.append(Expression.create_value(ExpressionType.Identifier, next_token.original))
+
+    if next_token is None or next_token.kind != TokenKind.LeftBrace:
+        return parser_error_result('Expected "{" after function parameters.')
+
+    return Result((name_token.original, parameters))
+
+
 def operator_string(operator: Operator) -> str | None:
     match operator:
         case Operator.And:
@@ -306,38 +533,80 @@ def operator_string(operator: Operator) -> str | None:
             return operator.name
 
 
+# Expands a stack of the text and expressions still to write instead of recursing, so deeply nested
+# expressions, like long chains of operations, print without reaching the recursion limit
 def expression_string(expression: Expression) -> str:
-    match expression.type:
-        case ExpressionType.If:
-            expression_str = f'(si {expression_string(expression.condition)} {{'
+    parts: list[str] = []
+    pending: list[Expression | str] = [expression]
+    while pending:
+        item = pending.pop()
+        if isinstance(item, str):
+            parts.append(item)
+        else:
+            pending.extend(reversed(expression_parts(item)))
 
-            for body_expression in expression.if_body:
-                expression_str += f' {expression_string(body_expression)} .'
+    return "".join(parts)
 
-            expression_str += ' }'
 
+# The text expression_string writes for an expression, with the expressions nested in it left to expand
+def expression_parts(expression: Expression) -> list[Expression | str]:
+    match expression.type:
+        case ExpressionType.If:
+            parts = ["(si ", expression.condition, " {", *body_parts(expression.if_body), " }"]
             if expression.else_body is not None:
-                expression_str += f' sino {{'
+                parts += [" sino {", *body_parts(expression.else_body), " }"]
+
+            parts.append(")")
+            return parts
 
-                for body_expression in expression.if_body:
-                    expression_str += f' {expression_string(body_expression)} .'
+        case ExpressionType.While:
+            return ["(mientras ", expression.condition, " {", *body_parts(expression.if_body), " })"]
 
-                expression_str += ' }'
+        case ExpressionType.Function:
+            parameters = " ".join(parameter.value for parameter in expression.operands)
+            return [f'(funcion {expression.value} ({parameters}) {{', *body_parts(expression.if_body), " })"]
 
-            expression_str += ')'
-            return expression_str
+        case ExpressionType.Call:
+            return [f'({expression.value}', *operand_parts(expression.operands), ")"]
 
         case ExpressionType.Nya:
-            return NIL_KEYWORD
-        case ExpressionType.Boolean | ExpressionType.Identifier | ExpressionType.Number | ExpressionType.String:
-            return expression.value
+            return [NIL_KEYWORD]
+        case ExpressionType.Boolean:
+            return [TRUE_KEYWORD if expression.value else FALSE_KEYWORD]
+        case ExpressionType.Identifier | ExpressionType.Number | ExpressionType.String:
+            return [str(expression.value)]
         case ExpressionType.Operation:
-            expression_str = f'({operator_string(expression.operator)}'
-            for operand in expression.operands:
-                expression_str += f' {expression_string(operand)}'
+            if expression.operator == Operator.BuiltIn:
+                name = expression.value
+            else:
+                name = operator_string(expression.operator)
+
+            return [f'({name}', *operand_parts(expression.operands), ")"]
+
+
+def body_parts(body: list[Expression]) -> list[Expression | str]:
+    parts: list[Expression | str] = []
+    for body_expression in body:
+        parts += [" ", body_expression, " ."]
+
+    return parts
+
+
+def operand_parts(operands: list[Expression]) -> list[Expression | str]:
+    parts: list[Expression | str] = []
+    for operand in operands:
+        parts += [" ", operand]
+
+    return parts
+
+
+# Name in built_in_registry of the built-in an operation calls. Not and Array are built-ins too, named after
+# their operator.
+def built_in_name(expression: Expression) -> str:
+    if expression.operator == Operator.BuiltIn:
+        return expression.value
 
-            expression_str += ")"
-            return expression_str
+    return expression.operator.name
 
 
 def print_expression(expression: Expression):
@@ -0,0 +1,190 @@
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import TextIO
+
+from evaluator import *
+from parser import *
+
+STATEMENT_TEXT_LENGTH = 60
+
+
+class PhaseProfile:
+    __slots__ = ("name", "seconds", "allocated_blocks", "peak_bytes")
+
+    def __init__(self, name: str, seconds: float, allocated_blocks: int, peak_bytes: int | None):
+        self.name = name
+        self.seconds = seconds
+        # Memory blocks allocated during the phase and still alive at its end, see sys.getallocatedblocks
+        self.allocated_blocks = allocated_blocks
+        # Highest memory use during the phase, only known when tracing memory
+        self.peak_bytes = peak_bytes
+
+
+# Times are the cumulative time spent in nodes of one kind, counted once however deeply nodes of that kind
+# nest, and the part of it not spent in other nodes
+class NodeProfile:
+    __slots__ = ("name", "hits", "seconds", "own_seconds", "depth")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.hits = 0
+        self.seconds = 0.0
+        self.own_seconds = 0.0
+        # Nodes of this kind being evaluated right now
+        self.depth = 0
+
+
+class StatementProfile:
+    __slots__ = ("index", "text", "seconds")
+
+    def __init__(self, index: int, text: str, seconds: float):
+        self.index = index
+        self.text = text
+        self.seconds = seconds
+
+
+# Collects the time and memory taken by the phases of a run, see Runner, and what evaluating took node by node
+# and statement by statement, see ProfilingEvaluator. Phases are timed with any evaluator, nodes and
+# statements only with a ProfilingEvaluator, which is why running without a profiler costs nothing.
+# Tracing memory gives the peak memory use of each phase but slows evaluation down by an order of magnitude.
+class Profiler:
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.phases: list[PhaseProfile] = []
+        self.nodes: dict[str, NodeProfile] = {}
+        self.statements: list[StatementProfile] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+
+        allocated_blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak_bytes = tracemalloc.get_traced_memory()[1] if self.trace_memory else None
+            self.phases.append(PhaseProfile(name, seconds, sys.getallocatedblocks() - allocated_blocks, peak_bytes))
+
+    def evaluate(self, evaluator: Evaluator):
+        if isinstance(evaluator, ProfilingEvaluator):
+            evaluator.profiler = self
+
+        with self.phase("evaluate"):
+            evaluator.process()
+
+    def stop(self):
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def to_json(self) -> dict:
+        return {
+            "phases": [{"name": phase.name, "seconds": phase.seconds, "allocated_blocks": phase.allocated_blocks,
+                        "peak_bytes": phase.peak_bytes} for phase in self.phases],
+            "nodes": [{"name": node.name, "hits": node.hits, "seconds": node.seconds, "own_seconds": node.own_seconds}
+                      for node in self.sorted_nodes()],
+            "statements": [{"index": statement.index, "text": statement.text, "seconds": statement.seconds}
+                           for statement in self.statements],
+        }
+
+    def sorted_nodes(self) -> list[NodeProfile]:
+        return sorted(self.nodes.values(), key = lambda node: node.own_seconds, reverse = True)
+
+    # Nodes and statements are listed slowest first, statements only up to statement_count
+    def print_report(self, destination: TextIO, statement_count: int = 20):
+        print(f'{"Phase":<12} {"Time (ms)":>12} {"Net blocks":>10} {"Peak (KiB)":>12}', file = destination)
+        for phase in self.phases:
+            peak = f'{phase.peak_bytes / 1024:.1f}' if phase.peak_bytes is not None else "-"
+            print(f'{phase.name:<12} {phase.seconds * 1000:>12.3f} {phase.allocated_blocks:>10} {peak:>12}',
+                  file = destination)
+
+        if self.nodes:
+            print(file = destination)
+            print(f'{"Node":<24} {"Hits":>10} {"Time (ms)":>12} {"Own (ms)":>12} {"Own %":>7}', file = destination)
+            total_own_seconds = sum(node.own_seconds for node in self.nodes.values()) or 1.0
+            for node in self.sorted_nodes():
+                print(f'{node.name:<24} {node.hits:>10} {node.seconds * 1000:>12.3f} {node.own_seconds * 1000:>12.3f} '
+                      f'{node.own_seconds / total_own_seconds * 100:>6.1f}%', file = destination)
+
+        if self.statements:
+            print(file = destination)
+            print(f'{"Statement":>9} {"Time (ms)":>12}  Code', file = destination)
+            slowest = sorted(self.statements, key = lambda statement: statement.seconds, reverse = True)
+            for statement in slowest[:statement_count]:
+                print(f'{statement.index:>9} {statement.seconds * 1000:>12.3f}  {statement.text}', file = destination)
+
+
+# Name under which a node is counted: its operator for operations, or the name of the built-in it calls, and
+# its type otherwise
+def node_name(expression: Expression) -> str:
+    if expression.type != ExpressionType.Operation:
+        return expression.type.name
+    if expression.operator in built_in_operators:
+        return f'{Operator.BuiltIn.name} {built_in_name(expression)}'
+
+    return expression.operator.name
+
+
+def statement_text(expression: Expression) -> str:
+    text = str(expression_string(expression)).replace("\n", " ")
+    if len(text) > STATEMENT_TEXT_LENGTH:
+        return text[:STATEMENT_TEXT_LENGTH - 3] + "..."
+
+    return text
+
+
+# Evaluates like Evaluator while timing every node and top level statement for its profiler. Loops aren't
+# compiled into closures, whose nodes couldn't be timed, so loops run slower than they otherwise would.
+class ProfilingEvaluator(Evaluator):
+    def __init__(self, expressions: list[Expression], output_destination, memoization_size: int = 0):
+        super().__init__(expressions, output_destination, memoization_size)
+        self.profiler = Profiler()
+        # Time spent in the nodes evaluated so far by the node being evaluated
+        self.child_seconds = 0.0
+
+    def process(self):
+        statements = self.profiler.statements
+        try:
+            for index, expression in enumerate(self.expressions, 1):
+                start = time.perf_counter()
+                result = self.process_expression(expression)
+                statements.append(StatementProfile(index, statement_text(expression), time.perf_counter() - start))
+                if not result.is_ok:
+                    self.error = result.error
+                    print(f'FATAL ERROR: {result.error.message}', file = self.output_destination)
+                    return
+
+                self.last_value = result.value
+        finally:
+            self.write_line("")
+
+    def process_expression(self, expression: Expression) -> Result[ValueData, EvaluatorError]:
+        name = node_name(expression)
+        node = self.profiler.nodes.get(name)
+        if node is None:
+            node = self.profiler.nodes[name] = NodeProfile(name)
+
+        parent_child_seconds = self.child_seconds
+        self.child_seconds = 0.0
+        node.depth += 1
+        start = time.perf_counter()
+        try:
+            return super().process_expression(expression)
+        finally:
+            seconds = time.perf_counter() - start
+            node.depth -= 1
+            node.hits += 1
+            node.own_seconds += seconds - self.child_seconds
+            if node.depth == 0:
+                node.seconds += seconds
+
+            self.child_seconds = parent_child_seconds + seconds
+
+    def process_while(self, expression: Expression) -> Result[ValueData, EvaluatorError]:
+        return self.process_loop(expression)
@@ -0,0 +1,129 @@
+import hashlib
+import marshal
+import os
+import sys
+
+from parser import *
+
+# Bump whenever a change to the tokenizer or parser alters the Expression trees produced for the same source,
+# or the layout written by expression_to_tuple changes. Entries written by another version are never loaded.
+INTERPRETER_VERSION = 7
+CACHE_DIRECTORY_NAME = "__uwucache__"
+CACHE_FILE_EXTENSION = ".uwuc"
+
+
+# Stores parsed programs on disk, keyed by a hash of their source, the interpreter version and the built-in
+# keywords, so running an unchanged script skips tokenizing and parsing. Only programs without tokenizer or parser
+# errors are stored.
+class ProgramCache:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def for_source_file(filepath: str):
+        return ProgramCache(os.path.join(os.path.dirname(os.path.abspath(filepath)), CACHE_DIRECTORY_NAME))
+
+    def load(self, code: str) -> list[Expression] | None:
+        # A damaged entry can fail anywhere from reading it to rebuilding its trees, e.g. with an unknown
+        # ExpressionType or a tuple of the wrong size, and is then treated like a missing one
+        try:
+            with open(self.entry_path(code), "rb") as file:
+                version, expression_tuples = marshal.load(file)
+
+            if version != INTERPRETER_VERSION:
+                self.misses += 1
+                return None
+
+            expressions = [expression_from_tuple(expression_tuple) for expression_tuple in expression_tuples]
+        except (OSError, EOFError, ValueError, TypeError, RecursionError):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return expressions
+
+    def store(self, code: str, expressions: list[Expression]):
+        try:
+            expression_tuples = [expression_to_tuple(expression) for expression in expressions]
+        except RecursionError:
+            # Trees nested too deeply to convert are simply not cached
+            return
+
+        entry_path = self.entry_path(code)
+        temporary_path = f'{entry_path}.{os.getpid()}.tmp'
+
+        try:
+            os.makedirs(self.directory, exist_ok = True)
+            with open(temporary_path, "wb") as file:
+                marshal.dump((INTERPRETER_VERSION, expression_tuples), file)
+
+            # Readers never see a partially written entry
+            os.replace(temporary_path, entry_path)
+        except (OSError, ValueError):
+            # The cache is an optimization only; a read only or full disk, or a tree nested too deeply for marshal,
+            # must not stop the program from running
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def invalidate(self, code: str):
+        if os.path.exists(entry_path := self.entry_path(code)):
+            os.remove(entry_path)
+
+    def clear(self) -> int:
+        if not os.path.isdir(self.directory):
+            return 0
+
+        removed_count = 0
+        for filename in os.listdir(self.directory):
+            if filename.endswith(CACHE_FILE_EXTENSION):
+                os.remove(os.path.join(self.directory, filename))
+                removed_count += 1
+
+        return removed_count
+
+    def entry_path(self, code: str) -> str:
+        key = hashlib.sha256(f'{INTERPRETER_VERSION}:{sys.implementation.cache_tag}:'.encode())
+        key.update(f'{" ".join(built_in_registry.keywords)}:'.encode())
+        key.update(code.encode("utf-8", "surrogatepass"))
+        return os.path.join(self.directory, key.hexdigest() + CACHE_FILE_EXTENSION)
+
+
+def expression_to_tuple(expression: Expression) -> tuple:
+    return (
+        expression.type.value,
+        expression.operator.value if expression.operator is not None else None,
+        expression.value,
+        expressions_to_tuples(expression.operands),
+        expression_to_tuple(expression.condition) if expression.condition is not None else None,
+        expressions_to_tuples(expression.if_body),
+        expressions_to_tuples(expression.else_body),
+    )
+
+
+def expressions_to_tuples(expressions: list[Expression] | None) -> tuple | None:
+    if expressions is None:
+        return None
+
+    return tuple(expression_to_tuple(expression) for expression in expressions)
+
+
+def expression_from_tuple(expression_tuple: tuple) -> Expression:
+    type_value, operator_value, value, operands, condition, if_body, else_body = expression_tuple
+    return Expression(
+        ExpressionType(type_value),
+        Operator(operator_value) if operator_value is not None else None,
+        value,
+        expressions_from_tuples(operands),
+        expression_from_tuple(condition) if condition is not None else None,
+        expressions_from_tuples(if_body),
+        expressions_from_tuples(else_body),
+    )
+
+
+def expressions_from_tuples(expression_tuples: tuple | None) -> list[Expression] | None:
+    if expression_tuples is None:
+        return None
+
+    return [expression_from_tuple(expression_tuple) for expression_tuple in expression_tuples]
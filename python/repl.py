@@ -0,0 +1,150 @@
+import re
+from typing import TextIO
+
+from evaluator import *
+from iterative_parser import IterativeParser
+from parser import *
+from resolver import Resolver
+from tokenizer import *
+
+PROMPT = "uwu> "
+CONTINUATION_PROMPT = "...> "
+else_line_pattern = re.compile(rf'\s*{ELSE_KEYWORD}(?![a-zA-Z0-9_])')
+
+
+# Evaluates statements as they are entered, all in the same Evaluator, so variables assigned by earlier input
+# stay available. Every line is tokenized once, when it is entered; input is parsed and evaluated as soon as it
+# ends a statement, that is with no "{" or "[" left open and no unterminated string literal. A "si" whose body has
+# just been closed waits for the next line, which may start with its "sino"; an empty line ends it.
+class Repl:
+    def __init__(self, input_stream: TextIO, output_destination: TextIO, evaluator_class: type[Evaluator] = Evaluator):
+        self.input_stream = input_stream
+        self.output_destination = output_destination
+        self.evaluator = evaluator_class([], output_destination)
+        self.resolver = Resolver()
+        # Functions defined and variables assigned by earlier input, see Parser.define_function
+        self.function_parameter_counts: dict[str, int] = {}
+        self.variable_names: set[str] = set()
+        self.line_number = 0
+        self.reset()
+
+    # Drops the statement entered so far
+    def reset(self):
+        self.pending_tokens: list[Token] = []
+        self.pending_errors: list[TokenizerError] = []
+        self.unscanned_input = ""
+        self.brace_depth = 0
+        self.else_found = False
+        self.awaiting_else = False
+
+    def run(self):
+        interactive = self.input_stream.isatty()
+
+        while True:
+            if interactive:
+                self.output_destination.write(CONTINUATION_PROMPT if self.pending_tokens or self.unscanned_input else PROMPT)
+                self.output_destination.flush()
+
+            try:
+                line = self.input_stream.readline()
+                if line == "":
+                    break
+
+                self.process_line(line)
+            except KeyboardInterrupt:
+                # Abandons the statement being entered or evaluated, the session goes on
+                self.output_destination.write("\n")
+                self.reset()
+
+            self.output_destination.flush()
+
+        self.finish()
+        if interactive:
+            self.output_destination.write("\n")
+
+    # Evaluates a whole script in one go, e.g. to load it before inspecting its variables
+    def process_source(self, source: str):
+        self.finish()
+        self.scan(source, True)
+        self.complete_statement()
+
+    # Returns True when the line completed a statement, which has then been evaluated
+    def process_line(self, line: str) -> bool:
+        if self.awaiting_else:
+            self.awaiting_else = False
+            if not else_line_pattern.match(line):
+                self.complete_statement()
+
+        # Only the start of an unterminated string literal is scanned again, together with the new line
+        self.scan(self.unscanned_input + line, False)
+        if self.unscanned_input or self.brace_depth > 0:
+            return False
+
+        # Only a "si" can go on with a "sino", a "mientras" or "funcion" ends with its body
+        first_token = next((token for token in self.pending_tokens if token.kind != TokenKind.Eol), None)
+        last_token = next((token for token in reversed(self.pending_tokens) if token.kind != TokenKind.Eol), None)
+        if last_token is not None and last_token.kind == TokenKind.RightBrace and not self.else_found and \
+           not (first_token.kind == TokenKind.Keyword and first_token.original in (WHILE_KEYWORD, FUNCTION_KEYWORD)):
+            self.awaiting_else = True
+            return False
+
+        self.complete_statement()
+        return True
+
+    # Evaluates what is left of the input once it has ended, reporting unclosed strings and blocks as errors
+    def finish(self):
+        if self.pending_tokens or self.unscanned_input:
+            self.scan(self.unscanned_input, True)
+            self.complete_statement()
+
+    def scan(self, source: str, final: bool):
+        tokenizer = Tokenizer(source)
+        tokenizer.line_number = self.line_number
+
+        for token_result in tokenizer.scan(final):
+            if not token_result.is_ok:
+                self.pending_errors.append(token_result.error)
+                continue
+
+            token = token_result.value
+            if token.kind == TokenKind.Keyword and token.original == ELSE_KEYWORD and self.brace_depth == 0:
+                self.else_found = True
+            elif token.kind == TokenKind.LeftBrace or token.kind == TokenKind.LeftBracket:
+                self.brace_depth += 1
+            elif token.kind == TokenKind.RightBrace or token.kind == TokenKind.RightBracket:
+                self.brace_depth -= 1
+
+            self.pending_tokens.append(token)
+
+        self.unscanned_input = source[tokenizer.index:]
+        self.line_number = tokenizer.line_number
+
+    def complete_statement(self):
+        tokens = self.pending_tokens
+        errors = self.pending_errors
+        self.reset()
+
+        if errors:
+            for error in errors:
+                print(f'[Line {error.line_number}] {error.error_message}', file = self.output_destination)
+        else:
+            self.evaluate(tokens)
+
+    def evaluate(self, tokens: list[Token]):
+        expressions = []
+        parser = IterativeParser(tokens)
+        parser.function_parameter_counts = self.function_parameter_counts
+        parser.variable_names = self.variable_names
+        for result in parser.process():
+            if not result.is_ok:
+                print(result.error.message, file = self.output_destination)
+                return
+
+            expressions.append(result.value)
+
+        for expression in expressions:
+            self.resolver.resolve(expression)
+
+        self.evaluator.allocate_slots(self.resolver.slot_count)
+        self.evaluator.expressions = expressions
+        self.evaluator.process()
@@ -0,0 +1,178 @@
+from parser import *
+
+
+class ResolverDiagnostic:
+    def __init__(self, variable_name: str, message: str):
+        self.variable_name = variable_name
+        self.message = message
+
+
+# Gives every variable an integer slot and stores it on the Identifier expressions that read or assign it,
+# so the evaluator can keep variables in a list instead of a dictionary keyed by name. Slots stay stable
+# across calls, which lets a program be resolved one top level expression at a time.
+class Resolver:
+    def __init__(self):
+        self.slot_names: dict[str, int] = {}
+        self.assigned_names: set[str] = set()
+        self.read_names: dict[str, None] = {}
+
+    @property
+    def slot_count(self) -> int:
+        return len(self.slot_names)
+
+    def process(self, expressions: Iterable[Expression]) -> list[ResolverDiagnostic]:
+        for expression in expressions:
+            self.resolve(expression)
+
+        return self.diagnostics()
+
+    # Reads of variables that are never assigned anywhere in the resolved expressions are certain to fail
+    # with "Variable X is not defined." if they are ever evaluated.
+    def diagnostics(self) -> list[ResolverDiagnostic]:
+        return [ResolverDiagnostic(name, f'Variable {name} is read but never assigned.')
+                for name in self.read_names if name not in self.assigned_names]
+
+    # Visits the tree in pre-order with an explicit stack, so slots are numbered in source order however deeply
+    # the expression nests
+    def resolve(self, expression: Expression):
+        pending_expressions = [expression]
+        while pending_expressions:
+            expression = pending_expressions.pop()
+            match expression.type:
+                case ExpressionType.Identifier if not is_local(expression):
+                    self.read_names[expression.value] = None
+                    expression.slot = self.slot_for(expression.value)
+
+                case ExpressionType.If:
+                    pending_expressions.extend(reversed(expression.else_body or []))
+                    pending_expressions.extend(reversed(expression.if_body))
+                    pending_expressions.append(expression.condition)
+
+                case ExpressionType.While:
+                    pending_expressions.extend(reversed(expression.if_body))
+                    pending_expressions.append(expression.condition)
+
+                case ExpressionType.Function:
+                    if expression.slot is None:
+                        resolve_locals(expression)
+
+                    pending_expressions.extend(reversed(expression.if_body))
+
+                case ExpressionType.Call:
+                    pending_expressions.extend(reversed(expression.operands))
+
+                case ExpressionType.Operation:
+                    operands = expression.operands
+                    if expression.operator == Operator.Equals and operands[0].type == ExpressionType.Identifier:
+                        if not is_local(operands[0]):
+                            self.assigned_names.add(operands[0].value)
+                            operands[0].slot = self.slot_for(operands[0].value)
+
+                        operands = operands[1:]
+
+                    pending_expressions.extend(reversed(operands))
+
+    def slot_for(self, name: str) -> int:
+        slot = self.slot_names.get(name)
+        if slot is None:
+            slot = self.slot_names[name] = len(self.slot_names)
+
+        return slot
+
+
+def is_local(identifier_expression: Expression) -> bool:
+    return identifier_expression.slot is not None and identifier_expression.slot < 0
+
+
+# Gives the parameters of a function and the variables assigned in its body slots in the function's call frame,
+# and the function itself the size of that frame. Local number i of a frame of n gets slot i - n, which indexes
+# the frame like i does while telling locals apart from global slots. Every other name read in the body is a
+# global, and the bodies of nested functions are left to their own definition.
+def resolve_locals(definition: Expression):
+    local_names: dict[str, None] = {parameter.value: None for parameter in definition.operands}
+    identifier_expressions: list[Expression] = []
+    pending_expressions = list(definition.if_body)
+    while pending_expressions:
+        expression = pending_expressions.pop()
+        match expression.type:
+            case ExpressionType.Identifier:
+                identifier_expressions.append(expression)
+
+            case ExpressionType.If:
+                pending_expressions.extend(expression.else_body or [])
+                pending_expressions.extend(expression.if_body)
+                pending_expressions.append(expression.condition)
+
+            case ExpressionType.While:
+                pending_expressions.extend(expression.if_body)
+                pending_expressions.append(expression.condition)
+
+            case ExpressionType.Call:
+                pending_expressions.extend(expression.operands)
+
+            case ExpressionType.Operation:
+                operands = expression.operands
+                if expression.operator == Operator.Equals and operands[0].type == ExpressionType.Identifier:
+                    local_names[operands[0].value] = None
+
+                pending_expressions.extend(operands)
+
+    frame_size = len(local_names)
+    local_slots = {name: index - frame_size for index, name in enumerate(local_names)}
+    for parameter in definition.operands:
+        parameter.slot = local_slots[parameter.value]
+    for identifier_expression in identifier_expressions:
+        identifier_expression.slot = local_slots.get(identifier_expression.value)
+
+    definition.slot = frame_size
+
+
+# Operations whose result depends on nothing but their operands, along with calls to pure built-ins. Unlike
+# pure_operators in optimizer.py, this includes the ones that can't be folded into a literal.
+pure_function_operators = {
+    Operator.And, Operator.DoubleEquals, Operator.Greater, Operator.GreaterEquals, Operator.Group, Operator.Less,
+    Operator.LessEquals, Operator.Minus, Operator.Or, Operator.Plus, Operator.Slash, Operator.Star,
+}
+
+
+# A function is pure when calling it with the same arguments always gives the same result and does nothing
+# else: its body only reads and assigns its own locals, never prints or defines functions, and calls no
+# function but itself. Expects the locals of the definition to be resolved.
+def is_pure_function(definition: Expression) -> bool:
+    pending_expressions = list(definition.if_body)
+    while pending_expressions:
+        expression = pending_expressions.pop()
+        match expression.type:
+            case ExpressionType.Identifier:
+                if not is_local(expression):
+                    return False
+
+            case ExpressionType.If:
+                pending_expressions.extend(expression.else_body or [])
+                pending_expressions.extend(expression.if_body)
+                pending_expressions.append(expression.condition)
+
+            case ExpressionType.While:
+                pending_expressions.extend(expression.if_body)
+                pending_expressions.append(expression.condition)
+
+            case ExpressionType.Call:
+                if expression.value != definition.value:
+                    return False
+
+                pending_expressions.extend(expression.operands)
+
+            case ExpressionType.Function:
+                return False
+
+            case ExpressionType.Operation:
+                # Assignment targets are checked to be locals with the other identifiers
+                if expression.operator in built_in_operators:
+                    if not built_in_registry.built_ins[built_in_name(expression)].pure:
+                        return False
+                elif expression.operator != Operator.Equals and expression.operator not in pure_function_operators:
+                    return False
+
+                pending_expressions.extend(expression.operands)
+
+    return True
@@ -4,6 +4,8 @@ T = TypeVar('T')
 E = TypeVar('E')
 
 class Result(Generic[T, E]):
+    __slots__ = ("is_ok", "value", "error")
+
     def __init__(self, value: T = None, error: E = None):
         self.is_ok = False
 
@@ -1,16 +1,107 @@
+from contextlib import nullcontext
+from io import StringIO
+from typing import TextIO
+
 from evaluator import *
+from iterative_parser import IterativeParser
+from mapped_source import MappedSource
 from parser import *
+from optimizer import Optimizer
+from parallel_tokenizer import ParallelTokenizer
+from profiler import Profiler
+from program_cache import ProgramCache
+from resolver import *
 from tokenizer import *
 
 
 class Runner:
-    def __init__(self, code: str, output_destination):
+    # The code can also be a MappedSource, which is tokenized in place; it can't be cached, as cache keys are the
+    # source text itself
+    def __init__(self, code: str | TextIO | MappedSource, output_destination, streaming: bool = False,
+                 evaluator_class: type[Evaluator] = Evaluator, cache: ProgramCache | None = None,
+                 diagnostic_destination = None, optimization_level: int = 0, memoization_size: int = 0,
+                 profiler: Profiler | None = None, tokenizer_worker_count: int = 1):
+        if cache is not None and isinstance(code, MappedSource):
+            raise ValueError("Programs read from a MappedSource can't be cached.")
+
         self.code = code
         self.output_destination = output_destination
+        self.streaming = streaming
+        self.evaluator_class = evaluator_class
+        self.cache = cache
+        self.diagnostic_destination = diagnostic_destination
+        self.optimization_level = optimization_level
+        # Number of results cached per pure function, see UserFunction
+        self.memoization_size = memoization_size
+        self.diagnostics: list[ResolverDiagnostic] = []
+        # The evaluator's error when the program stopped on a FATAL ERROR, after which run_code returns 1
+        self.error: EvaluatorError | None = None
+        # Times the phases of run_code when set, see Profiler. Streaming runs aren't profiled.
+        self.profiler = profiler
+        # Number of processes code given as a string is tokenized in, see ParallelTokenizer. Streaming runs and
+        # mapped sources are always tokenized in this process.
+        self.tokenizer_worker_count = tokenizer_worker_count
 
     def run_code(self):
-        tokenizer = Tokenizer(self.code)
-        tokens = tokenizer.process()
+        if self.streaming:
+            return self.run_code_streaming()
+
+        resolved_code = self.resolve_code()
+        if resolved_code is None:
+            return 1
+
+        expressions, resolver = resolved_code
+        evaluator = self.evaluator_class(expressions, self.output_destination, self.memoization_size)
+        evaluator.allocate_slots(resolver.slot_count)
+        if self.profiler is not None:
+            self.profiler.evaluate(evaluator)
+        else:
+            evaluator.process()
+
+        self.error = evaluator.error
+        if self.error is not None:
+            return 1
+
+    # Parses, optimizes and resolves the code, reporting the resolver's diagnostics. Returns None after writing
+    # the errors to the output destination if the code can't be parsed.
+    def resolve_code(self) -> tuple[list[Expression], Resolver] | None:
+        expressions = None
+        if self.cache is not None:
+            with self.phase("load cache"):
+                expressions = self.cache.load(self.code)
+
+        if expressions is None:
+            expressions = self.parse_code()
+            if expressions is None:
+                return None
+
+            if self.cache is not None:
+                with self.phase("store cache"):
+                    self.cache.store(self.code, expressions)
+
+        if self.optimization_level > 0:
+            with self.phase("optimize"):
+                expressions = Optimizer(self.optimization_level).process(expressions)
+
+        resolver = Resolver()
+        with self.phase("resolve"):
+            self.diagnostics = resolver.process(expressions)
+        self.report_diagnostics()
+        return expressions, resolver
+
+    def phase(self, name: str):
+        return self.profiler.phase(name) if self.profiler is not None else nullcontext()
+
+    # Returns None after writing the errors to the output destination if the code can't be parsed
+    def parse_code(self) -> list[Expression] | None:
+        with self.phase("tokenize"):
+            if isinstance(self.code, MappedSource):
+                tokenizer = MappedTokenizer(self.code.buffer)
+            elif self.tokenizer_worker_count > 1:
+                tokenizer = ParallelTokenizer(self.code, self.tokenizer_worker_count)
+            else:
+                tokenizer = Tokenizer(self.code)
+            tokens = tokenizer.process()
 
         errors = False
         for token_result in tokens:
@@ -20,12 +111,13 @@ class Runner:
                 self.output_destination.write(f'[Line {error.line_number}] {error.error_message}')
 
         if errors:
-            return 1
+            return None
 
         tokens = map(lambda t: t.value, tokens)
 
-        parser = Parser(tokens)
-        expression_results = parser.process()
+        with self.phase("parse"):
+            parser = IterativeParser(tokens)
+            expression_results = parser.process()
 
         for result in expression_results:
             if not result.is_ok:
@@ -34,9 +126,72 @@ class Runner:
                 self.output_destination.write(error.message)
 
         if errors:
+            return None
+
+        return [result.value for result in expression_results]
+
+    # Tokenizes, parses and evaluates one top level expression at a time, so memory use is bounded by the
+    # largest expression instead of by the whole program. Unlike run_code, expressions before the first
+    # tokenizer or parser error have already been evaluated by the time the error is reported.
+    def run_code_streaming(self):
+        if isinstance(self.code, MappedSource):
+            token_results = self.code.tokens()
+        else:
+            input_stream = StringIO(self.code) if isinstance(self.code, str) else self.code
+            token_results = StreamTokenizer(input_stream).tokens()
+
+        tokenizer_errors: list[TokenizerError] = []
+        parser_errors: list[ParserError] = []
+
+        def checked_tokens():
+            for token_result in token_results:
+                if not token_result.is_ok:
+                    tokenizer_errors.append(token_result.error)
+                    return
+
+                yield token_result.value
+
+        resolver = Resolver()
+
+        def checked_expressions():
+            for result in IterativeParser(checked_tokens()).expressions():
+                if tokenizer_errors:
+                    return
+
+                if not result.is_ok:
+                    parser_errors.append(result.error)
+                    return
+
+                yield result.value
+
+        def resolved_expressions(expressions):
+            for expression in expressions:
+                resolver.resolve(expression)
+                evaluator.allocate_slots(resolver.slot_count)
+                yield expression
+
+        expressions = checked_expressions()
+        if self.optimization_level > 0:
+            expressions = Optimizer(self.optimization_level).statements(expressions)
+
+        evaluator = self.evaluator_class(resolved_expressions(expressions), self.output_destination, self.memoization_size)
+        evaluator.process()
+        self.error = evaluator.error
+        self.diagnostics = resolver.diagnostics()
+        self.report_diagnostics()
+
+        for error in tokenizer_errors:
+            self.output_destination.write(f'[Line {error.line_number}] {error.error_message}')
+
+        for error in parser_errors:
+            self.output_destination.write(error.message)
+
+        if tokenizer_errors or parser_errors or self.error is not None:
             return 1
 
-        expressions = map(lambda e: e.value, expression_results)
+    def report_diagnostics(self):
+        if self.diagnostic_destination is None:
+            return
 
-        evaluator = Evaluator(expressions, self.output_destination)
-        evaluator.process()
\ No newline at end of file
+        for diagnostic in self.diagnostics:
+            print(f'[Warning] {diagnostic.message}', file = self.diagnostic_destination)
@@ -1,211 +1,375 @@
+import re
+import sys
 from enum import Enum
+from typing import Iterable, Iterator, TextIO
 
 from result import *
+from values import MAXIMUM_INTEGER_BITS
 
 
 class TokenizerError:
+    __slots__ = ("line_number", "error_message")
+
     def __init__(self, line_number: int, error_message: str):
         self.line_number    = line_number
         self.error_message  = error_message
 
 
 TokenKind = Enum("TokenKind", """Bang Minus Plus Slash Star Equals Eol Greater Less BangEquals
-                                             DoubleEquals GreaterEquals LessEquals LeftBrace LeftParenthesis
-                                             RightBrace RightParenthesis Keyword Identifier Number String""")
+                                             DoubleEquals GreaterEquals LessEquals LeftBrace LeftBracket LeftParenthesis
+                                             RightBrace RightBracket RightParenthesis Keyword Identifier Number String""")
 
 AND_KEYWORD = "y"
 OR_KEYWORD = "o"
 IF_KEYWORD = "si"
 ELSE_KEYWORD = "sino"
+WHILE_KEYWORD = "mientras"
+FUNCTION_KEYWORD = "funcion"
 NOT_KEYWORD = "no"
 PRINT_KEYWORD = "impwimir"
 TRUE_KEYWORD = "chi"
 FALSE_KEYWORD = "ño"
 NIL_KEYWORD = "nya"
-no_value_keywords = [AND_KEYWORD, OR_KEYWORD, IF_KEYWORD, ELSE_KEYWORD, NOT_KEYWORD]
+no_value_keywords = [AND_KEYWORD, OR_KEYWORD, IF_KEYWORD, ELSE_KEYWORD, WHILE_KEYWORD, FUNCTION_KEYWORD, NOT_KEYWORD]
 value_keywords = [TRUE_KEYWORD, FALSE_KEYWORD, NIL_KEYWORD]
-built_in_functions = ["UnUReversa", "TwTPotencia", "owoValorTotal", "UwUMaximo", "UnUMinimo",
-                      "UwUCima", "UnUSuelo", "EwEMedia", "TwTSuma", "OwOLazo", "UnUMezcla", PRINT_KEYWORD]
 
 
+# Tokens are never modified after they are created, so tokens with the same text can share one object
 class Token:
+    __slots__ = ("kind", "original", "value")
+
     def __init__(self, kind: TokenKind, original: str, value: float | str | None = None):
         self.kind       = kind
         self.original   = original
         self.value      = value
 
 
+single_symbol_token_kinds = {
+    "(": TokenKind.LeftParenthesis,
+    ")": TokenKind.RightParenthesis,
+    "{": TokenKind.LeftBrace,
+    "}": TokenKind.RightBrace,
+    "[": TokenKind.LeftBracket,
+    "]": TokenKind.RightBracket,
+    "-": TokenKind.Minus,
+    "+": TokenKind.Plus,
+    "*": TokenKind.Star,
+}
+continuation_token_kinds = {
+    "!": (TokenKind.Bang, TokenKind.BangEquals),
+    "=": (TokenKind.Equals, TokenKind.DoubleEquals),
+    ">": (TokenKind.Greater, TokenKind.GreaterEquals),
+    "<": (TokenKind.Less, TokenKind.LessEquals),
+}
+# Names of built-in functions are added by BuiltInRegistry, see add_keyword
+keyword_values = {keyword: None for keyword in no_value_keywords + [PRINT_KEYWORD]}
+keyword_values.update({keyword: keyword for keyword in value_keywords})
+identifier_continuation_pattern = re.compile(r"[a-zA-Z0-9_]*")
+
+# One shared result per token whose text is fixed: symbols, end of line and keywords
+shared_token_results = {character: Result(Token(kind, character)) for character, kind in single_symbol_token_kinds.items()}
+shared_token_results.update({character: Result(Token(kinds[0], character)) for character, kinds in continuation_token_kinds.items()})
+shared_token_results.update({character + "=": Result(Token(kinds[1], character + "="))
+                             for character, kinds in continuation_token_kinds.items()})
+shared_token_results["\n"] = Result(Token(TokenKind.Eol, "\n"))
+shared_token_results["/"] = Result(Token(TokenKind.Slash, "/"))
+keyword_token_results = {keyword: Result(Token(TokenKind.Keyword, keyword, value)) for keyword, value in keyword_values.items()}
+
+
+def add_keyword(keyword: str):
+    if keyword in keyword_token_results:
+        raise ValueError(f'{keyword} is already a keyword.')
+    if not (keyword[:1].isalpha() or keyword[:1] == "_") or identifier_continuation_pattern.fullmatch(keyword, 1) is None:
+        raise ValueError(f'{keyword} is not a valid keyword.')
+
+    keyword_token_results[keyword] = Result(Token(TokenKind.Keyword, keyword))
+
+
 class Tokenizer:
     def __init__(self, input_string: str):
         self.input_string   = input_string
         self.index          = 0
+        self.line_number    = 0
 
     def process(self) -> list[Result[Token, TokenizerError]]:
-        tokens: list[Result[Token, TokenizerError]] = []
-        line_number: int = 0
+        return list(self.tokens())
+
+    def tokens(self) -> Iterator[Result[Token, TokenizerError]]:
+        return self.scan(True)
+
+    # When final is False the input is treated as a prefix of a longer source: scanning stops in front of a
+    # string literal that is not closed yet, leaving self.index on its opening quote so more input can be
+    # appended before resuming.
+    def scan(self, final: bool) -> Iterator[Result[Token, TokenizerError]]:
+        line_number: int = self.line_number
+
+        # A single cursor walks the original string; no slice of the remaining input is ever taken,
+        # so every character is visited a constant number of times.
+        source = self.input_string
+        source_length = len(source)
+        position = self.index
+
+        while position < source_length:
+            current_character = source[position]
+
+            if current_character.isdigit():
+                end_index = position + 1
+                dot_found = False
+
+                while end_index < source_length:
+                    next_character = source[end_index]
+                    if next_character == ".":
+                        if dot_found:
+                            break
+
+                        dot_found = True
+                    elif not (next_character.isdigit() or next_character == "_"):
+                        break
+
+                    end_index += 1
+
+                if source[end_index - 1] == ".":
+                    end_index -= 1
+
+                number_substring = source[position:end_index]
+                number = parse_number(number_substring)
+                yield Result(Token(TokenKind.Number, number_substring, number))
+                position = end_index
+
+            elif current_character.isalpha() or current_character == "_":
+                end_index = identifier_continuation_pattern.match(source, position + 1).end()
+                word = source[position:end_index]
+
+                if word in keyword_token_results:
+                    yield keyword_token_results[word]
+                else:
+                    # Every use of a variable refers to the same string, as do the Identifier expressions built from it
+                    yield Result(Token(TokenKind.Identifier, sys.intern(word)))
+
+                position = end_index
+
+            elif current_character.isspace():
+                if current_character == "\n":
+                    yield shared_token_results["\n"]
+                    line_number += 1
+
+                position += 1
+
+            elif current_character in single_symbol_token_kinds:
+                yield shared_token_results[current_character]
+                position += 1
+
+            elif current_character in continuation_token_kinds:
+                if source.startswith("=", position + 1):
+                    yield shared_token_results[current_character + "="]
+                    position += 2
+                else:
+                    # If there are no more characters or if the character is not the continuation one
+                    yield shared_token_results[current_character]
+                    position += 1
+
+            elif current_character == "/":
+                if source.startswith("/", position + 1):
+                    newline_index = source.find("\n", position)
+                    position = (newline_index + 1) if newline_index != -1 else source_length
+                    line_number += 1
+                    continue
 
-        while True:
-            input_left      = self.input_string[self.index:]
-            input_iterator  = enumerate(input_left, 0)
+                yield shared_token_results["/"]
+                position += 1
+
+            elif current_character == '"':
+                closing_quote_index = source.find('"', position + 1)
+
+                if closing_quote_index != -1:
+                    original = source[position:(closing_quote_index + 1)]
+                    value = original[1:-1]
+                    yield Result(Token(TokenKind.String, original, value))
+                    position = closing_quote_index + 1
+                elif not final:
+                    break
+                else:
+                    yield Result(error = TokenizerError(line_number, "Unterminated string."))
+                    position = source_length
+
+            else:
+                yield Result(error = TokenizerError(line_number, f'Unexpected character: {current_character}'))
+                position += 1
+
+        self.index = position
+        self.line_number = line_number
+
+
+class StreamTokenizer:
+    def __init__(self, input_stream: TextIO):
+        self.input_stream = input_stream
+
+    # Reads the stream one line at a time and yields tokens as soon as their line is complete. Only the line
+    # being scanned (or the lines of a string literal still waiting for its closing quote) is kept in memory.
+    def tokens(self) -> Iterator[Result[Token, TokenizerError]]:
+        tokenizer = Tokenizer("")
+        pending_lines: list[str] = []
+        string_pending = False
+
+        for line in self.input_stream:
+            pending_lines.append(line)
+            if string_pending and '"' not in line:
+                continue
+
+            tokenizer.input_string = tokenizer.input_string[tokenizer.index:] + "".join(pending_lines)
+            tokenizer.index = 0
+            pending_lines.clear()
+
+            yield from tokenizer.scan(False)
+            string_pending = tokenizer.index < len(tokenizer.input_string)
+
+        tokenizer.input_string = tokenizer.input_string[tokenizer.index:] + "".join(pending_lines)
+        tokenizer.index = 0
+        yield from tokenizer.scan(True)
+
+
+# What MappedTokenizer matches at each position, one group per kind of token. Only ASCII is matched here; other
+# characters are decoded one at a time, see MappedTokenizer.scan_character. Line ends are those of files opened
+# in text mode, "\r\n" and a lone "\r" included, and blanks are the ASCII characters str.isspace accepts.
+mapped_token_pattern = re.compile(rb"""
+    (\r\n?|\n)
+  | ([ \t\x0b\x0c\x1c-\x1f]+)
+  | ([0-9][0-9_]*(?:\.(?=[0-9_])[0-9_]*)?)
+  | ([a-zA-Z_][a-zA-Z0-9_]*)
+  | ("[^"]*")
+  | (//[^\r\n]*(?:\r\n?|\n)?)
+  | ([!=<>]=?|[-+*/(){}\[\]])
+""", re.VERBOSE)
+NEWLINE_GROUP, BLANK_GROUP, NUMBER_GROUP, WORD_GROUP, STRING_GROUP, COMMENT_GROUP, SYMBOL_GROUP = range(1, 8)
+mapped_identifier_continuation_pattern = re.compile(rb"[a-zA-Z0-9_]*")
+mapped_shared_token_results = {text.encode(): result for text, result in shared_token_results.items()}
+
+
+# Tokenizes UTF-8 encoded source held in any buffer, such as the mmap of a file (see MappedSource), into the
+# same tokens Tokenizer produces for the decoded text. The buffer is scanned in place and only the text of the
+# tokens is ever decoded, so no copy of the whole source is made.
+class MappedTokenizer:
+    def __init__(self, buffer):
+        self.buffer = buffer
 
-            current_character_tuple = next(input_iterator, None)
-            if current_character_tuple is None:
+    def process(self) -> list[Result[Token, TokenizerError]]:
+        return list(self.tokens())
+
+    def tokens(self) -> Iterator[Result[Token, TokenizerError]]:
+        source = self.buffer
+        source_length = len(source)
+        position = 0
+        line_number = 0
+        # Identifier and keyword results by their bytes, so a name used again is neither decoded nor looked up
+        word_results: dict[bytes, Result[Token, TokenizerError]] = {}
+        match_token = mapped_token_pattern.match
+
+        while position < source_length:
+            match = match_token(source, position)
+            if match is None:
+                token_result, position = self.scan_character(position, line_number)
+                if token_result is not None:
+                    yield token_result
+                continue
+
+            group = match.lastindex
+            text = match.group(group)
+            position = match.end()
+
+            if group == WORD_GROUP:
+                token_result = word_results.get(text)
+                if token_result is None:
+                    token_result = word_results[text] = word_token_result(text.decode("ascii"))
+
+                yield token_result
+            elif group == SYMBOL_GROUP:
+                yield mapped_shared_token_results[text]
+            elif group == NEWLINE_GROUP:
+                yield shared_token_results["\n"]
+                line_number += 1
+            elif group == NUMBER_GROUP:
+                number_substring = text.decode("ascii")
+                # A dot the pattern left out may still be followed by a non-ASCII digit
+                if position < source_length and (source[position] >= 0x80 or source[position] == 0x2E):
+                    number_substring, position = self.continue_number(number_substring, position)
+
+                yield Result(Token(TokenKind.Number, number_substring, parse_number(number_substring)))
+            elif group == STRING_GROUP:
+                original = decode_text(text)
+                yield Result(Token(TokenKind.String, original, original[1:-1]))
+            elif group == COMMENT_GROUP:
+                line_number += 1
+
+    # Handles the character at position when it starts none of the tokens mapped_token_pattern matches: an
+    # unterminated string, a non-ASCII letter, digit or space, or an unexpected character. Returns the token
+    # result, None for a space, and the position after the character or token.
+    def scan_character(self, position: int, line_number: int) -> tuple[Result[Token, TokenizerError] | None, int]:
+        source = self.buffer
+        if source[position] == ord('"'):
+            return Result(error = TokenizerError(line_number, "Unterminated string.")), len(source)
+
+        character, end_index = decode_character(source, position)
+        if character.isalpha():
+            continuation_end = mapped_identifier_continuation_pattern.match(source, end_index).end()
+            word = character + source[end_index:continuation_end].decode("ascii")
+            return word_token_result(word), continuation_end
+        elif character.isdigit():
+            number_substring, end_index = self.continue_number(character, end_index)
+            return Result(Token(TokenKind.Number, number_substring, parse_number(number_substring))), end_index
+        elif character.isspace():
+            return None, end_index
+
+        return Result(error = TokenizerError(line_number, f'Unexpected character: {character}')), end_index
+
+    # Extends a number with the digits, underscores and dot that follow it, decoding them one at a time. Only
+    # needed once a number runs into non-ASCII digits, which str.isdigit accepts just like Tokenizer does.
+    def continue_number(self, number_substring: str, position: int) -> tuple[str, int]:
+        source = self.buffer
+        source_length = len(source)
+        dot_found = "." in number_substring
+
+        while position < source_length:
+            character, end_index = decode_character(source, position)
+            if character == ".":
+                if dot_found:
+                    break
+
+                dot_found = True
+            elif not (character.isdigit() or character == "_"):
                 break
 
-            current_character = current_character_tuple[1]
-            current_index = 0
-            InitialToken = Enum("InitialToken", "Alphabetic ContinuationToken Digit Quote SingleSymbol")
+            number_substring += character
+            position = end_index
 
-            initial_token: InitialToken
-            initial_token_kind: TokenKind
+        if number_substring.endswith("."):
+            return number_substring[:-1], position - 1
 
-            match current_character:
-                case c if c.isdigit():
-                    initial_token = InitialToken.Digit
-                case c if c.isalpha() or c == "_":
-                    initial_token = InitialToken.Alphabetic
-                case c if c.isspace():
-                    if c == "\n":
-                        tokens.append(Result(Token(TokenKind.Eol, "\n")))
-                        line_number += 1
+        return number_substring, position
 
-                    self.index += 1
-                    continue
-                case '(':
-                    initial_token = InitialToken.SingleSymbol
-                    initial_token_kind = TokenKind.LeftParenthesis
-                case ')':
-                    initial_token = InitialToken.SingleSymbol
-                    initial_token_kind = TokenKind.RightParenthesis
-                case '{':
-                    initial_token = InitialToken.SingleSymbol
-                    initial_token_kind = TokenKind.LeftBrace
-                case '}':
-                    initial_token = InitialToken.SingleSymbol
-                    initial_token_kind = TokenKind.RightBrace
-                case '-':
-                    initial_token = InitialToken.SingleSymbol
-                    initial_token_kind = TokenKind.Minus
-                case '!':
-                    initial_token = InitialToken.ContinuationToken
-                    initial_token_kind = TokenKind.Bang
-                case '+':
-                    initial_token = InitialToken.SingleSymbol
-                    initial_token_kind = TokenKind.Plus
-                case '*':
-                    initial_token = InitialToken.SingleSymbol
-                    initial_token_kind = TokenKind.Star
-                case '/':
-                    next_character_tuple = next(input_iterator, None)
-                    if next_character_tuple is not None and next_character_tuple[1] == '/':
-                        newline_index = input_left.find("\n")
-                        self.index += (newline_index + 1) if newline_index != -1 else len(input_left)
-                        line_number += 1
-                        continue
-
-                    initial_token = InitialToken.SingleSymbol
-                    initial_token_kind = TokenKind.Slash
-                case '=':
-                    initial_token = InitialToken.ContinuationToken
-                    initial_token_kind = TokenKind.Equals
-                case '>':
-                    initial_token = InitialToken.ContinuationToken
-                    initial_token_kind = TokenKind.Greater
-                case '<':
-                    initial_token = InitialToken.ContinuationToken
-                    initial_token_kind = TokenKind.Less
-                case '"':
-                    initial_token = InitialToken.Quote
-                case _:
-                    tokens.append(Result(error = TokenizerError(line_number, f'Unexpected character: {current_character}')))
-                    self.index += 1
-                    continue
 
-            match initial_token:
-                case InitialToken.SingleSymbol:
-                    tokens.append(Result(value = Token(initial_token_kind, input_left[:1])))
-                    self.index += 1
-                case InitialToken.ContinuationToken:
-                    next_character_tuple = next(input_iterator, None)
-                    continuation_token_kind: TokenKind
-                    match initial_token_kind:
-                        case TokenKind.Bang:
-                            continuation_token_kind = TokenKind.BangEquals
-                        case TokenKind.Equals:
-                            continuation_token_kind = TokenKind.DoubleEquals
-                        case TokenKind.Greater:
-                            continuation_token_kind = TokenKind.GreaterEquals
-                        case TokenKind.Less:
-                            continuation_token_kind = TokenKind.LessEquals
-
-                    if next_character_tuple is not None and next_character_tuple[1] == "=":
-                        tokens.append(Result(Token(continuation_token_kind, input_left[:2])))
-                        self.index += 2
-                    else:
-                        # If there are no more characters or if the character is not the continuation one
-                        tokens.append(Result(Token(initial_token_kind, input_left[:1])))
-                        self.index += 1
-
-                case InitialToken.Alphabetic:
-                    def invalid_character(character_tuple):
-                        c = character_tuple[1]
-                        return not ((c >= "a" and c <= "z") or (c >= "A" and c <= "Z") or (c >= "0" and c <= "9") or c == "_")
-
-                    identifier_end_index = next(filter(invalid_character, input_iterator), None)
-                    identifier_end_index = identifier_end_index[0] if identifier_end_index is not None else len(input_left)
-                    word = input_left[:identifier_end_index]
-                    
-                    match word:
-                        case c if c in no_value_keywords or c in built_in_functions:
-                            tokens.append(Result(Token(TokenKind.Keyword, word)))
-                        case c if c in value_keywords:
-                            tokens.append(Result(Token(TokenKind.Keyword, word, word)))
-                        case _:
-                            tokens.append(Result(Token(TokenKind.Identifier, word)))
-
-                    self.index += len(word)
-
-                case InitialToken.Digit:
-                    end_index = current_index
-                    dot_found = False
-
-                    for next_character_tuple in input_iterator:
-                        next_character = next_character_tuple[1]
-                        if next_character == '.':
-                            if dot_found:
-                                break
-
-                            dot_found = True
-                            end_index += 1
-                        elif next_character.isdigit() or next_character == '_':
-                            end_index += 1
-                        else:
-                            break
+def word_token_result(word: str) -> Result[Token, TokenizerError]:
+    if word in keyword_token_results:
+        return keyword_token_results[word]
+
+    return Result(Token(TokenKind.Identifier, sys.intern(word)))
 
-                    if input_left[end_index] == '.':
-                        end_index -= 1
 
-                    number_substring = input_left[:(end_index + 1)]
-                    number = parse_number(number_substring)
-                    tokens.append(Result(Token(TokenKind.Number, number_substring, number)))
-                    self.index += len(number_substring)
+# Decodes the UTF-8 character starting at position, returning it and the position after it
+def decode_character(source, position: int) -> tuple[str, int]:
+    lead_byte = source[position]
+    length = 1 if lead_byte < 0x80 else 2 if lead_byte < 0xE0 else 3 if lead_byte < 0xF0 else 4
+    return source[position:position + length].decode("utf-8"), position + length
 
-                case InitialToken.Quote:
-                    closing_quote_index = input_left.find('"', 1)
 
-                    if closing_quote_index != -1:
-                        original = input_left[current_index:(closing_quote_index + 1)]
-                        value = original[1:-1]
-                        tokens.append(Result(Token(TokenKind.String, original, value)))
-                        self.index += len(original)
-                    else:
-                        tokens.append(Result(error = TokenizerError(line_number, "Unterminated string.")))
-                        self.index += len(input_left)
+# String literals keep their line ends the way reading the file in text mode would have left them
+def decode_text(text: bytes) -> str:
+    if b"\r" in text:
+        text = text.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
 
-        return tokens
+    return text.decode("utf-8")
 
 
-def print_tokens(tokens: list[Result[Token, TokenizerError]]):
+def print_tokens(tokens: Iterable[Result[Token, TokenizerError]]):
     for token_result in tokens:
         if not token_result.is_ok:
             error_value = token_result.error
@@ -225,30 +389,20 @@ def print_token(token: Token):
     print(f'{token_kind_name} {token.original} {token_value}')
 
 
-def parse_number(string_value: str) -> float | None:
-    decimal_places: int = 0
-    digit_count:    int = 0
-    exponent:       int = 0
-    number:         float = 0
-    iterator = enumerate(reversed(string_value))
-
-    for number_character_tuple in iterator:
-        number_character = number_character_tuple[1]
-        if number_character.isdigit():
-            if number_character != "0" or decimal_places != 0:
-                digit = int(number_character)
-                number += digit * pow(10, exponent)
-
-            exponent += 1
-        elif number_character == ".":
-            decimal_places = digit_count
-            continue
-        elif number_character == "_":
-            continue
-        else:
-            return None
+# Number tokens are digits with at most one dot, and underscores anywhere after the first digit. Literals
+# without a dot are ints, so integer arithmetic stays exact until it meets a float or outgrows
+# MAXIMUM_INTEGER_BITS; the others are floats.
+# Either way the digits are converted by Python in one go.
+def parse_number(string_value: str) -> int | float:
+    if "_" in string_value:
+        string_value = string_value.replace("_", "")
+    if "." in string_value:
+        return float(string_value)
 
-        digit_count += 1
+    try:
+        number = int(string_value)
+    except ValueError:
+        # More digits than int conversion allows, see sys.get_int_max_str_digits
+        return float(string_value)
 
-    number /= pow(10, decimal_places)
-    return number
+    return number if number.bit_length() <= MAXIMUM_INTEGER_BITS else float(string_value)
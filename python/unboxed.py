@@ -0,0 +1,375 @@
+from closure_compiler import *
+
+
+# "+" types its result as a Number whatever its operands are, so adding strings makes a Number valued string
+class NumberString(str):
+    pass
+
+
+# The result of "no" is a bare Python value that Evaluator never wraps in ValueData. Like there, using it as
+# an operand fails; it has no entry in value_types.
+class UntypedValue:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+
+value_types = {
+    float:          ValueType.Number,
+    int:            ValueType.Number,
+    NumberString:   ValueType.Number,
+    bool:           ValueType.Boolean,
+    str:            ValueType.String,
+    type(Nya):      ValueType.Nya,
+}
+value_types.update({array_type: ValueType.Array for array_type in array_types})
+
+
+def value_type(value) -> ValueType:
+    return value_types[type(value)]
+
+
+def unboxed_UnUReversa(value):
+    if value_type(value) == ValueType.Number:
+        return UnUReversa_number(value)
+
+    return UnUReversa_string(value)
+
+
+def unboxed_UwUMaximo(*numbers):
+    max_value = 0
+    for number in numbers:
+        if is_array(number):
+            number = array_maximum(number)
+            if number is None:
+                continue
+
+        if number > max_value:
+            max_value = number
+
+    return max_value
+
+
+def unboxed_UnUMinimo(*numbers):
+    min_value = sys.float_info.max
+    for number in numbers:
+        if is_array(number):
+            number = array_minimum(number)
+            if number is None:
+                continue
+
+        if number < min_value:
+            min_value = number
+
+    return min_value
+
+
+def unboxed_EwEMedia(*numbers):
+    values = []
+    count = 0
+    for number in numbers:
+        if is_array(number):
+            values.append(array_sum(number))
+            count += array_length(number)
+        else:
+            values.append(number)
+            count += 1
+
+    return number_sum(values) / count
+
+
+def unboxed_TwTSuma(*numbers):
+    return number_sum([array_sum(number) if is_array(number) else number for number in numbers])
+
+
+def unboxed_TwTPotencia(number, power):
+    if is_array(number) or is_array(power):
+        return array_power(number, power)
+
+    return number_power(number, power)
+
+
+# Applies a built-in on numbers to every element of an array
+def unboxed_elementwise(number_function, array_function):
+    def built_in_function(value):
+        if is_array(value):
+            return array_function(value)
+
+        return number_function(value)
+
+    return built_in_function
+
+
+# The language's built-ins on values instead of ValueData, by name in built_in_registry
+unboxed_built_in_functions = {
+    "Not":              lambda value: UntypedValue(False),
+    "UnUReversa":       unboxed_UnUReversa,
+    "TwTPotencia":      unboxed_TwTPotencia,
+    "owoValorTotal":    unboxed_elementwise(abs, array_absolute),
+    "UwUMaximo":        unboxed_UwUMaximo,
+    "UnUMinimo":        unboxed_UnUMinimo,
+    "UwUCima":          unboxed_elementwise(math.ceil, array_ceiling),
+    "UnUSuelo":         unboxed_elementwise(math.floor, array_floor),
+    "EwEMedia":         unboxed_EwEMedia,
+    "TwTSuma":          unboxed_TwTSuma,
+    "OwOLazo":          lambda value: value.lower() == value[::-1].lower(),
+    "UnUMezcla":        lambda first, second: sorted(first.lower()) == sorted(second.lower()),
+    "Array":            lambda *numbers: create_array(numbers),
+    "UwURango":         number_range,
+}
+
+
+# Runs a built-in that only has a ValueData version on values
+def unboxed_adapter(built_in_function):
+    def native_function(*values):
+        value_data = built_in_function(*[ValueData(value, value_type(value)) for value in values])
+        value = value_data.value
+        if isinstance(value, str) and value_data.type != ValueType.String:
+            return NumberString(value)
+
+        return value
+
+    return native_function
+
+
+def unboxed_built_in_function(built_in: BuiltIn):
+    if built_in.name in unboxed_built_in_functions:
+        return unboxed_built_in_functions[built_in.name]
+    if built_in.native_function is not None:
+        return built_in.native_function
+
+    return unboxed_adapter(built_in.function)
+
+
+# Same as memo_key, on values instead of ValueData. The Python type of a value stands for its ValueType.
+def unboxed_memo_key(arguments: list) -> tuple | None:
+    key = []
+    for argument in arguments:
+        argument_type = type(argument)
+        if argument_type in array_types:
+            return None
+        if argument_type is float and argument == 0:
+            argument = str(argument)
+
+        key += (argument_type, argument)
+
+    return tuple(key)
+
+
+# Compiles closures that pass plain Python values around (float, int, str, bool and the Nya sentinel) instead
+# of ValueData. The ValueType of a value is recovered from its Python type through value_types.
+class UnboxedCompiler(ClosureCompiler):
+    argument_key = staticmethod(unboxed_memo_key)
+
+    def compile_literal(self, expression: Expression) -> CompiledExpression:
+        if expression.type == ExpressionType.Nya:
+            return self.compile_constant(Nya)
+
+        return self.compile_constant(expression.value)
+
+    def compile_missing_operation(self, expression: Expression) -> CompiledExpression:
+        return self.compile_constant(UntypedValue(None))
+
+    def compile_negation(self, expression: Expression) -> CompiledExpression:
+        operand_expression = self.compile(expression.operands[0])
+        number_type = ValueType.Number
+
+        def negation():
+            operand_value = operand_expression()
+            if value_types[type(operand_value)] != number_type:
+                raise ClosureEvaluationError(EvaluatorError("Can only negate numbers."))
+
+            return - operand_value
+
+        return negation
+
+    def compile_binary_operation(self, expression: Expression, operator, result_type: ValueType) -> CompiledExpression:
+        operand_count = len(expression.operands)
+        if operand_count != 2:
+            return self.compile_error(f'Invalid number of operands for binary operation {expression.type}. Expected 2, got {operand_count}.')
+
+        left_expression = self.compile(expression.operands[0])
+        right_expression = self.compile(expression.operands[1])
+        # Only "+" can turn its operands into a string, and it has to be typed as a Number
+        makes_strings = result_type == ValueType.Number and operator is number_add
+        array_type = ValueType.Array
+
+        def binary_operation():
+            left_value = left_expression()
+            right_value = right_expression()
+            # Values of the same Python type always have the same ValueType
+            if type(left_value) is not type(right_value) or type(left_value) in array_types:
+                left_type = value_types[type(left_value)]
+                right_type = value_types[type(right_value)]
+                if left_type == array_type or right_type == array_type:
+                    result = array_binary_operation(operator, ValueData(left_value, left_type), ValueData(right_value, right_type))
+                    if not result.is_ok:
+                        raise ClosureEvaluationError(result.error)
+
+                    return result.value.value
+                if left_type != right_type:
+                    raise ClosureEvaluationError(EvaluatorError(f'Operand types do not match for binary operation. Got {left_type.name} and {right_type.name}.'))
+
+            result = operator(left_value, right_value)
+            if makes_strings and isinstance(result, str):
+                return NumberString(result)
+
+            return result
+
+        return binary_operation
+
+    def compile_built_in(self, expression: Expression, built_in: BuiltIn) -> CompiledExpression:
+        operand_count = len(expression.operands)
+        if built_in.parameter_count is not None and operand_count != built_in.parameter_count:
+            return self.compile_error(f'Invalid number of arguments for {expression.type.name}. Expected {built_in.parameter_count}, got {operand_count}.')
+
+        operand_expressions = [self.compile(operand) for operand in expression.operands]
+        native_function = unboxed_built_in_function(built_in)
+        expected_operand_types = built_in.parameter_types
+        nya_message = f'nya~~ value passed through 0th parameter to {expression.type.name} function.'
+        nya_type = ValueType.Nya
+
+        def argument_type_error(operand_type: ValueType) -> ClosureEvaluationError:
+            type_names_joined = " or ".join(expected_operand_types)
+            return ClosureEvaluationError(EvaluatorError(f'Invalid argument type for {expression.type.name} function. Expected {type_names_joined}, got {operand_type}.'))
+
+        if operand_count == 1:
+            operand_expression = operand_expressions[0]
+
+            def single_argument_built_in():
+                operand_value = operand_expression()
+                operand_type = value_types[type(operand_value)]
+                if operand_type == nya_type:
+                    raise ClosureEvaluationError(EvaluatorError(nya_message))
+                if operand_type not in expected_operand_types:
+                    raise argument_type_error(operand_type)
+
+                return native_function(operand_value)
+
+            return single_argument_built_in
+
+        def built_in_call():
+            operand_values = []
+            for operand_expression in operand_expressions:
+                operand_value = operand_expression()
+                operand_type = value_types[type(operand_value)]
+                if operand_type == nya_type:
+                    raise ClosureEvaluationError(EvaluatorError(nya_message))
+                if operand_type not in expected_operand_types:
+                    raise argument_type_error(operand_type)
+
+                operand_values.append(operand_value)
+
+            return native_function(*operand_values)
+
+        return built_in_call
+
+    def compile_if(self, expression: Expression) -> CompiledExpression:
+        condition_expression = self.compile(expression.condition)
+        if_body = [self.compile(body_expression) for body_expression in expression.if_body]
+        else_body = [self.compile(body_expression) for body_expression in expression.else_body] \
+            if expression.else_body is not None else []
+        boolean_type = ValueType.Boolean
+
+        def if_expression():
+            condition_value = condition_expression()
+            condition_type = value_types[type(condition_value)]
+            if condition_type != boolean_type:
+                raise ClosureEvaluationError(EvaluatorError(f'Invalid value type for if condition. Expected Boolean, got {condition_type.name}.'))
+
+            body_value = Nya
+            for body_expression in (if_body if condition_value else else_body):
+                body_value = body_expression()
+
+            return body_value
+
+        return if_expression
+
+    def compile_while(self, expression: Expression) -> CompiledExpression:
+        condition_expression = self.compile(expression.condition)
+        body = [self.compile(body_expression) for body_expression in expression.if_body]
+        boolean_type = ValueType.Boolean
+
+        def condition_error(condition_value):
+            condition_type = value_types[type(condition_value)]
+            return ClosureEvaluationError(EvaluatorError(f'Invalid value type for loop condition. Expected Boolean, got {condition_type.name}.'))
+
+        if len(body) == 1:
+            body_expression = body[0]
+
+            def single_expression_loop():
+                body_value = Nya
+                while True:
+                    condition_value = condition_expression()
+                    if value_types[type(condition_value)] != boolean_type:
+                        raise condition_error(condition_value)
+                    if not condition_value:
+                        return body_value
+
+                    body_value = body_expression()
+
+            return single_expression_loop
+
+        def loop():
+            body_value = Nya
+            while True:
+                condition_value = condition_expression()
+                if value_types[type(condition_value)] != boolean_type:
+                    raise condition_error(condition_value)
+                if not condition_value:
+                    return body_value
+
+                for body_expression in body:
+                    body_value = body_expression()
+
+        return loop
+
+    def compile_print(self, expression: Expression) -> CompiledExpression:
+        argument_expressions = [self.compile(argument) for argument in expression.operands]
+        line = self.evaluator.line
+        write_line = self.evaluator.write_line
+        boolean_type = ValueType.Boolean
+        array_type = ValueType.Array
+
+        def print_expression():
+            for argument_expression in argument_expressions:
+                # Errors in arguments stop the statement but are not fatal, matching Evaluator.process_print
+                try:
+                    value = argument_expression()
+                except ClosureEvaluationError:
+                    write_line("")
+                    return Nya
+
+                argument_type = value_types[type(value)]
+                if argument_type == boolean_type:
+                    value = "chi" if value else "ño"
+                elif argument_type == array_type:
+                    value = array_string(value)
+
+                line.append(str(value))
+
+            write_line("\n")
+            return Nya
+
+        return print_expression
+
+
+class UnboxedEvaluator(ClosureEvaluator):
+    def __init__(self, expressions: Iterable[Expression], output_destination, memoization_size: int = 0):
+        super().__init__(expressions, output_destination, memoization_size)
+        self.compiler = UnboxedCompiler(self)
+
+    def assign_global(self, name: str, slot: int | None, value_data: ValueData):
+        super().assign_global(name, slot, value_data.value)
+
+    def global_value(self, name: str, slot: int | None) -> ValueData | None:
+        return self.value_data(super().global_value(name, slot))
+
+    def value_data(self, value) -> ValueData | None:
+        if isinstance(value, UntypedValue):
+            return value.value
+        if value is None:
+            return None
+
+        return ValueData(value, value_type(value))
@@ -0,0 +1,75 @@
+import math
+from enum import Enum
+
+Nya = object()
+
+ValueType = Enum("ValueType", "Array Boolean Number Nya String")
+
+
+class ValueData:
+    __slots__ = ("value", "type")
+
+    def __init__(self, value, type: ValueType):
+        self.value = value
+        self.type = type
+
+    @staticmethod
+    def array_value(value):
+        return ValueData(value, ValueType.Array)
+
+    @staticmethod
+    def boolean_value(value):
+        return ValueData(value, ValueType.Boolean)
+
+    @staticmethod
+    def number_value(value):
+        return ValueData(value, ValueType.Number)
+
+    @staticmethod
+    def nya_value():
+        return ValueData(Nya, ValueType.Nya)
+
+    @staticmethod
+    def string_value(value):
+        return ValueData(value, ValueType.String)
+
+
+# Ints stay exact only while they have at most this many bits, so every int converts to a float without
+# overflowing. Results of + - * and powers past it are turned into floats, giving inf like floats always did
+# instead of a number too long to even print.
+MAXIMUM_INTEGER_BITS = 1023
+
+
+def bounded_number(number):
+    if type(number) is not int or number.bit_length() <= MAXIMUM_INTEGER_BITS:
+        return number
+
+    try:
+        return float(number)
+    except OverflowError:
+        return math.inf if number > 0 else -math.inf
+
+
+# "+" also joins strings, which pass through unchanged
+def number_add(left, right):
+    result = left + right
+    if type(result) is int and result.bit_length() > MAXIMUM_INTEGER_BITS:
+        return bounded_number(result)
+
+    return result
+
+
+def number_subtract(left, right):
+    result = left - right
+    if type(result) is int and result.bit_length() > MAXIMUM_INTEGER_BITS:
+        return bounded_number(result)
+
+    return result
+
+
+def number_multiply(left, right):
+    result = left * right
+    if type(result) is int and result.bit_length() > MAXIMUM_INTEGER_BITS:
+        return bounded_number(result)
+
+    return result
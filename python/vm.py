@@ -0,0 +1,302 @@
+from bytecode import *
+
+LOAD_CONSTANT   = OpCode.LoadConstant.value
+LOAD_VARIABLE   = OpCode.LoadVariable.value
+STORE_VARIABLE  = OpCode.StoreVariable.value
+NEGATE          = OpCode.Negate.value
+CHECK_ARGUMENT  = OpCode.CheckArgument.value
+CALL            = OpCode.Call.value
+PRINT_VALUE     = OpCode.PrintValue.value
+PRINT_NEWLINE   = OpCode.PrintNewline.value
+PUSH_HANDLER    = OpCode.PushHandler.value
+POP_HANDLER     = OpCode.PopHandler.value
+JUMP            = OpCode.Jump.value
+BRANCH_IF_FALSE = OpCode.BranchIfFalse.value
+LOOP_IF_FALSE   = OpCode.LoopIfFalse.value
+RAISE           = OpCode.Raise.value
+LOAD_LOCAL      = OpCode.LoadLocal.value
+STORE_LOCAL     = OpCode.StoreLocal.value
+DEFINE_FUNCTION = OpCode.DefineFunction.value
+LOAD_FUNCTION   = OpCode.LoadFunction.value
+CALL_FUNCTION   = OpCode.CallFunction.value
+RETURN          = OpCode.Return.value
+
+binary_operations = {
+    binary_operator_opcodes[operator].value: operation for operator, operation in binary_operators.items()
+}
+
+
+class VirtualMachineError(Exception):
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+class VirtualMachine:
+    def __init__(self, program: BytecodeProgram, output_destination, memoization_size: int = 0):
+        self.program = program
+        self.output_destination = output_destination
+        self.memoization_size = memoization_size
+        self.variables: dict[str, ValueData] = {}
+        self.functions: dict[str, UserFunction] = {}
+        # Error that stopped the program, set by run
+        self.error: VirtualMachineError | None = None
+        # The instructions and call sites converted by earlier runs, when statements are added to the program
+        # between runs, see BytecodeEvaluator.process
+        self.code: list[int] = []
+        self.call_sites: list[tuple[list[ValueType], int, any]] = []
+
+    # Runs the program from program_counter. Returns the value of the last top level expression, None if the
+    # program stopped on an error.
+    def run(self, program_counter: int = 0) -> ValueData | None:
+        program = self.program
+        # Indexing a list hands back existing int objects, while indexing the array boxes a new one every time
+        code = self.code
+        code.extend(program.instructions[len(code):].tolist())
+        code_length = len(code)
+        constants = program.constants
+        names = program.names
+        call_sites = self.call_sites
+        for name, operand_count in program.call_sites[len(call_sites):]:
+            built_in = built_in_registry.built_ins[name]
+            call_sites.append((built_in.parameter_types, operand_count, built_in.function))
+
+        messages = program.messages
+        function_definitions = program.functions
+        function_call_sites = program.function_call_sites
+        memoization_size = self.memoization_size
+        registers: list[ValueData | None] = [None] * program.register_count
+        variables = self.variables
+        functions = self.functions
+        output_destination = self.output_destination
+        # Text of the current print statement, written in one call like Evaluator.write_line does
+        line: list[str] = []
+        # Address of the handler and number of calls in progress when it was pushed
+        handlers: list[tuple[int, int]] = []
+        # (return address, caller registers, result register, function, frame, memo key) of the calls in
+        # progress. The frame of a call, which holds its locals and temporaries, becomes its registers.
+        call_stack: list[tuple] = []
+
+        number_type = ValueType.Number
+        boolean_type = ValueType.Boolean
+        nya_type = ValueType.Nya
+        array_type = ValueType.Array
+        operation_name = ExpressionType.Operation.name
+
+        try:
+            while True:
+                try:
+                    while program_counter < code_length:
+                        opcode, first, second, third = code[program_counter:(program_counter + INSTRUCTION_WIDTH)]
+                        program_counter += INSTRUCTION_WIDTH
+
+                        if opcode == LOAD_CONSTANT:
+                            registers[first] = constants[second]
+
+                        elif opcode == LOAD_VARIABLE:
+                            value = variables.get(names[second], None)
+                            if value is None:
+                                raise VirtualMachineError(f'Variable {names[second]} is not defined.')
+
+                            registers[first] = value
+
+                        elif opcode == LOAD_LOCAL:
+                            value = registers[second]
+                            if value is None:
+                                raise VirtualMachineError(f'Variable {names[third]} is not defined.')
+
+                            registers[first] = value
+
+                        elif opcode in binary_operations:
+                            left_value_data = registers[second]
+                            right_value_data = registers[third]
+                            if left_value_data.type == array_type or right_value_data.type == array_type:
+                                result = array_binary_operation(binary_operations[opcode][0], left_value_data, right_value_data)
+                                if not result.is_ok:
+                                    raise VirtualMachineError(result.error.message)
+
+                                registers[first] = result.value
+                                continue
+
+                            if left_value_data.type != right_value_data.type:
+                                raise VirtualMachineError(f'Operand types do not match for binary operation. Got {left_value_data.type.name} and {right_value_data.type.name}.')
+
+                            operation, result_type = binary_operations[opcode]
+                            registers[first] = ValueData(operation(left_value_data.value, right_value_data.value), result_type)
+
+                        elif opcode == STORE_VARIABLE:
+                            variables[names[second]] = registers[first]
+
+                        elif opcode == CHECK_ARGUMENT:
+                            operand_value_data = registers[first]
+                            expected_operand_types = call_sites[second][0]
+                            if operand_value_data.type == nya_type:
+                                raise VirtualMachineError(f'nya~~ value passed through 0th parameter to {operation_name} function.')
+                            if operand_value_data.type not in expected_operand_types:
+                                type_names_joined = " or ".join(expected_operand_types)
+                                raise VirtualMachineError(f'Invalid argument type for {operation_name} function. Expected {type_names_joined}, got {operand_value_data.type}.')
+
+                        elif opcode == CALL:
+                            _, operand_count, built_in_function = call_sites[second]
+                            registers[first] = built_in_function(*registers[third:(third + operand_count)])
+
+                        elif opcode == BRANCH_IF_FALSE:
+                            condition_value_data = registers[first]
+                            if condition_value_data.type != boolean_type:
+                                raise VirtualMachineError(f'Invalid value type for if condition. Expected Boolean, got {condition_value_data.type.name}.')
+
+                            if not condition_value_data.value:
+                                program_counter = second
+
+                        elif opcode == JUMP:
+                            program_counter = first
+
+                        elif opcode == LOOP_IF_FALSE:
+                            condition_value_data = registers[first]
+                            if condition_value_data.type != boolean_type:
+                                raise VirtualMachineError(f'Invalid value type for loop condition. Expected Boolean, got {condition_value_data.type.name}.')
+
+                            if not condition_value_data.value:
+                                program_counter = second
+
+                        elif opcode == STORE_LOCAL:
+                            registers[second] = registers[first]
+
+                        elif opcode == LOAD_FUNCTION:
+                            function_name, argument_count = function_call_sites[second]
+                            function = functions.get(function_name)
+                            if function is None or function.parameter_count != argument_count:
+                                raise VirtualMachineError(user_function_error_result(function, function_name, argument_count).error.message)
+
+                            registers[first] = function
+
+                        elif opcode == CALL_FUNCTION:
+                            function = registers[first]
+                            arguments = registers[second:(second + function.parameter_count)]
+                            key = memo_key(arguments) if function.memo is not None else None
+                            if key is not None and (value := function.recall(key)) is not None:
+                                registers[first] = value
+                                continue
+
+                            frame = function.take_frame(arguments)
+                            call_stack.append((program_counter, registers, first, function, frame, key))
+                            registers = frame
+                            program_counter = function.body
+
+                        elif opcode == RETURN:
+                            value = registers[first]
+                            program_counter, registers, result_register, function, frame, key = call_stack.pop()
+                            function.release_frame(frame)
+                            registers[result_register] = value
+                            if key is not None:
+                                function.remember(key, value)
+
+                        elif opcode == DEFINE_FUNCTION:
+                            function_name, parameter_count, frame_size, body_address, pure = function_definitions[first]
+                            functions[function_name] = UserFunction(function_name, parameter_count, frame_size, body_address,
+                                                                    memoization_size if pure else 0)
+
+                        elif opcode == NEGATE:
+                            operand_value_data = registers[second]
+                            if operand_value_data.type != number_type:
+                                raise VirtualMachineError("Can only negate numbers.")
+
+                            registers[first] = ValueData(- operand_value_data.value, number_type)
+
+                        elif opcode == PRINT_VALUE:
+                            value_data = registers[first]
+                            value = value_data.value
+                            if value_data.type == boolean_type:
+                                value = "chi" if value else "ño"
+                            elif value_data.type == array_type:
+                                value = array_string(value)
+
+                            line.append(str(value))
+
+                        elif opcode == PRINT_NEWLINE:
+                            line.append("\n")
+                            output_destination.write("".join(line))
+                            line.clear()
+
+                        elif opcode == PUSH_HANDLER:
+                            handlers.append((first, len(call_stack)))
+
+                        elif opcode == POP_HANDLER:
+                            handlers.pop()
+
+                        elif opcode == RAISE:
+                            raise VirtualMachineError(messages[first])
+
+                    # Top level expressions are all evaluated into the first register
+                    return registers[0] if registers else None
+
+                except VirtualMachineError as error:
+                    if not handlers:
+                        self.error = error
+                        print(f'FATAL ERROR: {error.message}', file = output_destination)
+                        return None
+
+                    # Handlers only guard print arguments; the ones printed before the error are still written
+                    if line:
+                        output_destination.write("".join(line))
+                        line.clear()
+
+                    program_counter, call_depth = handlers.pop()
+                    # Returns from the calls made since the handler was pushed
+                    while len(call_stack) > call_depth:
+                        _, registers, _, function, frame, _ = call_stack.pop()
+                        function.release_frame(frame)
+        finally:
+            # Text of a print statement interrupted by a Python exception is still written
+            if line:
+                output_destination.write("".join(line))
+
+
+class BytecodeEvaluator(Evaluator):
+    def __init__(self, expressions: list[Expression], output_destination, memoization_size: int = 0):
+        super().__init__(expressions, output_destination, memoization_size)
+        # Set by prepare. Without it, expressions are compiled every time they are processed.
+        self.program: BytecodeProgram | None = None
+
+    def prepare(self):
+        self.program = BytecodeCompiler().compile_program(self.expressions)
+
+    # The virtual machine keeps every global variable by name
+    def assign_global(self, name: str, slot: int | None, value_data: ValueData):
+        self.variables[name] = value_data
+
+    def global_value(self, name: str, slot: int | None) -> ValueData | None:
+        return self.variables.get(name, None)
+
+    # Expressions that aren't a list, as when streaming, are compiled and run one top level expression at a
+    # time. Their code stays in the program, since the functions they define are called by address.
+    def process(self):
+        if self.program is not None or isinstance(self.expressions, list):
+            program = self.program if self.program is not None else BytecodeCompiler().compile_program(self.expressions)
+            self.run(self.virtual_machine(program), 0)
+            return
+
+        virtual_machine = None
+        for program, address in BytecodeCompiler().compile_statements(self.expressions):
+            if virtual_machine is None:
+                virtual_machine = self.virtual_machine(program)
+            else:
+                virtual_machine.program = program
+
+            if not self.run(virtual_machine, address):
+                return
+
+    def virtual_machine(self, program: BytecodeProgram) -> VirtualMachine:
+        virtual_machine = VirtualMachine(program, self.output_destination, self.memoization_size)
+        virtual_machine.variables = self.variables
+        virtual_machine.functions = self.functions
+        return virtual_machine
+
+    # Returns whether the code ran without a fatal error
+    def run(self, virtual_machine: VirtualMachine, program_counter: int) -> bool:
+        self.last_value = virtual_machine.run(program_counter)
+        if virtual_machine.error is not None:
+            self.error = EvaluatorError(virtual_machine.error.message)
+            return False
+
+        return True